@@ -0,0 +1,81 @@
+'''
+Реестр действий admin-auth: имя действия -> модуль actions/<module>.py с функцией того же имени.
+Модуль импортируется при первом вызове действия, поэтому холодный старт не тянет
+зависимости остальных действий (telegram_api/requests, аналитика и т.д.)
+'''
+
+import importlib
+import time
+from typing import Any, Callable, Dict
+
+ACTIONS: Dict[str, str] = {
+    'register': 'auth',
+    'login': 'auth',
+    'send_reset_code': 'auth',
+    'reset_password': 'auth',
+    'get_stats': 'stats',
+    'get_user_analytics': 'stats',
+    'get_users': 'users',
+    'get_all_users': 'users',
+    'update_user_status': 'users',
+    'update_profile': 'users',
+    'update_role_status': 'users',
+    'get_deliveries': 'deliveries',
+    'update_delivery_status': 'deliveries',
+    'update_telegram_chat_id': 'admins',
+    'delete_admin': 'admins',
+    'change_password': 'admins',
+    'delete_test_users': 'cleanup',
+    'delete_table_data': 'cleanup',
+    'clear_all_test_data': 'cleanup',
+    'get_purge_jobs': 'cleanup',
+    'get_roles': 'roles',
+    'get_user_roles': 'roles',
+    'assign_role': 'roles',
+    'remove_role': 'roles',
+}
+
+# Действия, которые перебирают пароли и коды: перед ними проверяется лимит попыток по IP
+RATE_LIMITED_ACTIONS = {'register', 'login', 'send_reset_code', 'verify_reset_code', 'reset_password'}
+
+ActionHandler = Callable[[Any, Any, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+_resolved: Dict[str, ActionHandler] = {}
+
+# Статистика по тёплому экземпляру: вызовы, суммарное и максимальное время выполнения
+STATS: Dict[str, Dict[str, float]] = {}
+
+
+def client_ip(event: Dict[str, Any]) -> str:
+    return event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'unknown')
+
+
+def resolve(action: str) -> ActionHandler:
+    handler = _resolved.get(action)
+    if handler is None:
+        module = importlib.import_module(f'{__name__}.{ACTIONS[action]}')
+        handler = _resolved[action] = getattr(module, action)
+    return handler
+
+
+def dispatch(action: str, conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Вызывает действие и логирует время загрузки модуля и выполнения
+    '''
+    started = time.perf_counter()
+    handler = resolve(action)
+    loaded = time.perf_counter()
+
+    try:
+        return handler(conn, cur, body_data, event)
+    finally:
+        finished = time.perf_counter()
+        run_ms = (finished - loaded) * 1000
+
+        stats = STATS.setdefault(action, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['calls'] += 1
+        stats['total_ms'] += run_ms
+        stats['max_ms'] = max(stats['max_ms'], run_ms)
+
+        print(f"[DEBUG] Action {action}: load {(loaded - started) * 1000:.1f}ms, run {run_ms:.1f}ms, "
+              f"avg {stats['total_ms'] / stats['calls']:.1f}ms over {stats['calls']} calls")
@@ -0,0 +1,88 @@
+'''
+Учётная запись администратора: Telegram Chat ID, смена пароля, удаление
+'''
+
+from concurrent.futures import TimeoutError as VerifyTimeout
+from typing import Dict, Any
+
+import db
+import passwords
+from http_helpers import json_response, error_response
+from validators import ValidationError, Schema, Field, password_policy
+from actions.common import generate_token, require_admin
+
+CHANGE_PASSWORD_SCHEMA = Schema(
+    current_password=Field(password_policy(min_length=1), required_message='Password is required'),
+    new_password=Field(password_policy(), required_message='Password is required'),
+)
+
+
+def update_telegram_chat_id(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    token_check = require_admin(event, conn)
+
+    telegram_chat_id = body_data.get('telegram_chat_id')
+
+    if not telegram_chat_id:
+        return error_response(400, 'Telegram Chat ID обязателен')
+
+    admin_id = token_check['admin_id']
+
+    db.execute(cur, 'update_admin_telegram_chat_id', (admin_id, int(telegram_chat_id)))
+    conn.commit()
+
+    return json_response(200, {'message': 'Telegram Chat ID обновлен'})
+
+
+def delete_admin(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    token_check = require_admin(event, conn)
+
+    admin_email = body_data.get('email')
+
+    if not admin_email:
+        return error_response(400, 'Email is required')
+
+    if admin_email == token_check['email']:
+        return error_response(400, 'Нельзя удалить свою учётную запись')
+
+    db.execute(cur, 'delete_admin_by_email', (admin_email,))
+    deleted_count = cur.rowcount
+    conn.commit()
+
+    return json_response(200, {
+        'success': True,
+        'deleted_count': deleted_count,
+        'message': f'Администратор {admin_email} удалён'
+    })
+
+
+def change_password(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    token_check = require_admin(event, conn)
+
+    try:
+        data = CHANGE_PASSWORD_SCHEMA.check(body_data)
+    except ValidationError as e:
+        return error_response(400, str(e), errors=e.errors)
+    current_password, new_password = data['current_password'], data['new_password']
+
+    admin = db.fetch_one(cur, 'admin_password_hash', (token_check['admin_id'],))
+
+    try:
+        valid = passwords.verify_password(current_password, admin['password_hash'] if admin else None)
+    except VerifyTimeout:
+        return error_response(503, 'Сервис перегружен, повторите позже')
+
+    if not valid:
+        return error_response(401, 'Неверный текущий пароль')
+
+    new_password_hash = passwords.hash_password(new_password)
+
+    db.execute(cur, 'update_admin_password', (token_check['admin_id'], new_password_hash))
+    conn.commit()
+
+    new_token = generate_token(token_check['admin_id'], token_check['email'])
+
+    return json_response(200, {
+        'success': True,
+        'message': 'Пароль успешно изменён',
+        'token': new_token
+    })
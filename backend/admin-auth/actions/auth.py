@@ -0,0 +1,202 @@
+'''
+Регистрация, вход и восстановление пароля администратора
+'''
+
+import os
+import secrets
+from concurrent.futures import TimeoutError as VerifyTimeout
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+import db
+import passwords
+from http_helpers import json_response, error_response
+from rate_limiter import rate_limiter
+from validators import ValidationError, Schema, Field, validate_email, validate_full_name, password_policy, string
+from actions import client_ip
+from actions.common import generate_token
+
+EMAIL_FIELD = Field(validate_email, required_message='Email is required')
+
+REGISTER_SCHEMA = Schema(
+    email=EMAIL_FIELD,
+    password=Field(password_policy(), required_message='Password is required'),
+    full_name=Field(validate_full_name, required_message='Full name is required'),
+)
+
+LOGIN_SCHEMA = Schema(
+    email=EMAIL_FIELD,
+    password=Field(password_policy(min_length=1), required_message='Password is required'),
+)
+
+EMAIL_SCHEMA = Schema(email=EMAIL_FIELD)
+
+RESET_PASSWORD_SCHEMA = Schema(
+    email=EMAIL_FIELD,
+    code=Field(string(min_length=1, max_length=16), required_message='Email, code, and new password are required'),
+    new_password=Field(password_policy(), required_message='Email, code, and new password are required'),
+)
+
+
+def send_telegram(chat_id: str, code: str) -> bool:
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+
+    if not bot_token:
+        print("Telegram bot token not configured")
+        return False
+
+    # requests тянется только сюда: остальным действиям он не нужен
+    from telegram_api import get_client
+
+    message = f"""
+🔐 *Код восстановления пароля администратора*
+
+Ваш код: `{code}`
+
+⏱ Код действителен 15 минут.
+
+🚛 ГрузКлик
+    """
+
+    try:
+        response = get_client(bot_token).send_message(chat_id, message, parse_mode='Markdown')
+        result = response.json()
+        if result.get('ok'):
+            print(f"Telegram message sent successfully to chat_id {chat_id}")
+            return True
+        else:
+            print(f"Telegram API error: {result}")
+            return False
+    except Exception as e:
+        print(f"Failed to send Telegram message: {str(e)}")
+        return False
+
+
+def register(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        data = REGISTER_SCHEMA.check(body_data)
+    except ValidationError as e:
+        return error_response(400, str(e), errors=e.errors)
+    email, password, full_name = data['email'], data['password'], data['full_name']
+
+    if db.fetch_one(cur, 'admin_by_email', (email,)):
+        return error_response(400, 'Admin with this email already exists')
+
+    password_hash = passwords.hash_password(password)
+    two_factor_secret = secrets.token_hex(16)
+
+    admin = db.fetch_one(cur, 'insert_admin', (email, password_hash, full_name, two_factor_secret))
+    conn.commit()
+
+    token = generate_token(admin['id'], admin['email'])
+
+    return json_response(200, {
+        'token': token,
+        'admin': {
+            'id': admin['id'],
+            'email': admin['email'],
+            'full_name': admin['full_name'],
+            'created_at': admin['created_at']
+        }
+    })
+
+
+def login(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        data = LOGIN_SCHEMA.check(body_data)
+    except ValidationError as e:
+        print(f"Validation error: {e}")
+        return error_response(400, str(e), errors=e.errors)
+    email, password = data['email'], data['password']
+
+    ip = client_ip(event)
+    print(f"Login attempt: email={email}")
+
+    admin = db.fetch_one(cur, 'admin_login', (email,))
+    print(f"Found admin: {admin is not None}")
+
+    try:
+        valid = passwords.verify_password(password, admin['password_hash'] if admin else None)
+    except VerifyTimeout:
+        print(f"[ERROR] Password verification timed out for {email}")
+        return error_response(503, 'Сервис перегружен, повторите вход позже')
+
+    if not valid:
+        rate_limiter.check_rate_limit(ip, max_attempts=5, window_seconds=300)
+        return error_response(401, 'Invalid email or password')
+
+    if not admin['is_active']:
+        return error_response(403, 'Admin account is deactivated')
+
+    # Старый sha256 или устаревшая стоимость: пароль известен, пересчитываем хеш сейчас
+    if passwords.needs_rehash(admin['password_hash']):
+        db.execute(cur, 'update_admin_password', (admin['id'], passwords.hash_password(password)))
+        conn.commit()
+        print(f"[DEBUG] Password hash upgraded for admin {admin['id']}")
+
+    token = generate_token(admin['id'], admin['email'])
+
+    rate_limiter.clear_attempts(ip)
+
+    return json_response(200, {
+        'token': token,
+        'admin': {
+            'id': admin['id'],
+            'email': admin['email'],
+            'full_name': admin['full_name']
+        }
+    })
+
+
+def send_reset_code(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        email = EMAIL_SCHEMA.check(body_data)['email']
+    except ValidationError as e:
+        return error_response(400, str(e), errors=e.errors)
+
+    admin = db.fetch_one(cur, 'admin_by_email', (email,))
+
+    if not admin:
+        return error_response(404, 'Администратор не найден')
+
+    if not admin.get('telegram_chat_id'):
+        return error_response(400, 'Telegram не подключен. Привяжите Chat ID в настройках.')
+
+    code = ''.join([str(secrets.randbelow(10)) for _ in range(6)])
+    expires_at = datetime.now() + timedelta(minutes=15)
+
+    db.execute(cur, 'insert_reset_code', (email, code, expires_at))
+    conn.commit()
+
+    telegram_sent = send_telegram(str(admin['telegram_chat_id']), code)
+
+    if not telegram_sent:
+        return error_response(500, 'Не удалось отправить код в Telegram. Проверьте настройки бота.')
+
+    return json_response(200, {
+        'message': 'Код отправлен в Telegram',
+        'sent': True
+    })
+
+
+def reset_password(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        data = RESET_PASSWORD_SCHEMA.check(body_data)
+    except ValidationError as e:
+        return error_response(400, str(e), errors=e.errors)
+    email, code, new_password = data['email'], data['code'], data['new_password']
+
+    reset_code = db.fetch_one(cur, 'find_reset_code', (email, code))
+
+    if not reset_code:
+        return error_response(400, 'Invalid or expired reset code')
+
+    password_hash = passwords.hash_password(new_password)
+
+    db.execute(cur, 'update_admin_password_by_email', (email, password_hash))
+
+    db.execute(cur, 'use_reset_code', (reset_code['id'],))
+
+    conn.commit()
+
+    return json_response(200, {'message': 'Password reset successfully'})
@@ -0,0 +1,104 @@
+'''
+Очистка тестовых данных. Все действия требуют токен администратора.
+Таблицы очищаются заданиями purge.py: пачками по первичному ключу или TRUNCATE;
+что не успело выполниться за запрос, добирает db-maintenance (run_purge_jobs)
+'''
+
+import time
+from typing import Dict, Any
+
+import db
+import purge
+from http_helpers import json_response, error_response
+from actions.common import require_admin
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+TEST_EMAILS = [
+    'test@example.com',
+    'newuser@example.com',
+    'client@test.ru',
+    'carrier@test.ru',
+    'company@test.ru'
+]
+
+# Порядок важен: сначала таблицы, которые ссылаются на users
+CLEARABLE_TABLES = list(purge.PURGEABLE_TABLES)
+
+# Сколько времени запрос админки тратит на очистку, остальное — фоновой задаче
+INLINE_BUDGET_SECONDS = 15
+
+
+def delete_test_users(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    require_admin(event, conn)
+
+    db.execute(cur, 'delete_users_by_emails', (TEST_EMAILS,))
+    deleted_count = cur.rowcount
+    conn.commit()
+
+    return json_response(200, {
+        'message': f'Удалено {deleted_count} тестовых пользователей'
+    })
+
+
+def _run_inline(conn, jobs, background: bool):
+    deadline = time.monotonic() + (0 if background else INLINE_BUDGET_SECONDS)
+    return [purge.run_job(conn, job, deadline) if time.monotonic() < deadline else job for job in jobs]
+
+
+def _status_code(jobs) -> int:
+    # 200 — всё очищено, 202 — задания продолжит db-maintenance, 409 — очистка упёрлась в ошибку
+    if any(job['status'] == 'failed' for job in jobs):
+        return 409
+    return 200 if all(job['status'] == 'done' for job in jobs) else 202
+
+
+def delete_table_data(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    token_check = require_admin(event, conn)
+
+    table = body_data.get('table')
+
+    if table not in CLEARABLE_TABLES:
+        return error_response(400, f'Invalid table. Allowed: {", ".join(CLEARABLE_TABLES)}')
+
+    job = purge.create_job(conn, table, token_check.get('admin_id'))
+    job = _run_inline(conn, [job], bool(body_data.get('background')))[0]
+
+    return json_response(_status_code([job]), {
+        'success': job['status'] != 'failed',
+        'deleted_count': job['deleted_rows'],
+        'table': table,
+        'job': job,
+        'complete': job['status'] == 'done'
+    })
+
+
+def clear_all_test_data(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    token_check = require_admin(event, conn)
+
+    jobs = [purge.create_job(conn, table, token_check.get('admin_id')) for table in CLEARABLE_TABLES]
+    jobs = _run_inline(conn, jobs, bool(body_data.get('background')))
+
+    cur.execute(f"DELETE FROM {SCHEMA}.admins WHERE email = 'admin@test.com'")
+    deleted_admins = cur.rowcount
+    conn.commit()
+
+    deleted_counts = {job['table_name']: job['deleted_rows'] for job in jobs}
+    deleted_counts['admins'] = deleted_admins
+
+    return json_response(_status_code(jobs), {
+        'success': not any(job['status'] == 'failed' for job in jobs),
+        'deleted': deleted_counts,
+        'jobs': jobs,
+        'complete': all(job['status'] == 'done' for job in jobs)
+    })
+
+
+def get_purge_jobs(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    require_admin(event, conn)
+
+    job_ids = body_data.get('job_ids')
+    if job_ids is not None and (not isinstance(job_ids, list) or not all(isinstance(i, int) for i in job_ids)):
+        return error_response(400, 'job_ids must be a list of integers')
+
+    return json_response(200, {'jobs': purge.get_jobs(conn, job_ids)})
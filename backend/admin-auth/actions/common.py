@@ -0,0 +1,47 @@
+'''
+Общие функции действий admin-auth: токены администратора (хеши паролей — passwords.py)
+'''
+
+import hashlib
+import os
+from typing import Dict, Any
+
+import db
+from http_helpers import HttpError, get_header
+
+
+def generate_token(admin_id: int, email: str) -> str:
+    secret = os.environ.get('JWT_SECRET', 'default-secret-key')
+    data = f"{admin_id}:{email}"
+    return hashlib.sha256(f"{data}:{secret}".encode()).hexdigest()
+
+
+def verify_admin_token(token: str, conn) -> Dict[str, Any]:
+    if not token:
+        return {'valid': False, 'error': 'Требуется токен администратора'}
+
+    cur = conn.cursor()
+    admins = db.fetch_all(cur, 'active_admins')
+
+    for admin in admins:
+        if token == generate_token(admin['id'], admin['email']):
+            return {
+                'valid': True,
+                'admin_id': admin['id'],
+                'email': admin['email'],
+                'full_name': admin['full_name']
+            }
+
+    return {'valid': False, 'error': 'Недействительный токен администратора'}
+
+
+def require_admin(event: Dict[str, Any], conn) -> Dict[str, Any]:
+    '''
+    Проверяет X-Auth-Token; без валидного токена действие завершается ответом 401
+    '''
+    token_check = verify_admin_token(get_header(event, 'X-Auth-Token'), conn)
+
+    if not token_check['valid']:
+        raise HttpError(401, token_check.get('error', 'Недействительный токен'))
+
+    return token_check
@@ -0,0 +1,43 @@
+'''
+Доставки: список для админки и смена статуса
+'''
+
+from typing import Dict, Any
+
+import db
+from http_helpers import json_response, error_response
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+
+def get_deliveries(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(f"SELECT delivery_id, client_id, carrier_id, status, pickup_address, delivery_address, delivery_price, created_at FROM {SCHEMA}.deliveries ORDER BY created_at DESC")
+    deliveries_data = cur.fetchall()
+
+    deliveries_list = []
+    for delivery in deliveries_data:
+        deliveries_list.append({
+            'id': delivery['delivery_id'],
+            'user_id': delivery['client_id'],
+            'driver_id': delivery['carrier_id'],
+            'status': delivery['status'],
+            'pickup_address': delivery['pickup_address'],
+            'delivery_address': delivery['delivery_address'],
+            'delivery_price': float(delivery['delivery_price']) if delivery['delivery_price'] else 0,
+            'created_at': delivery['created_at']
+        })
+
+    return json_response(200, {'deliveries': deliveries_list})
+
+
+def update_delivery_status(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    delivery_id = body_data.get('delivery_id')
+    status = body_data.get('status')
+
+    if not delivery_id or not status:
+        return error_response(400, 'Delivery ID and status are required')
+
+    db.execute(cur, 'update_delivery_status', (str(delivery_id), status))
+    conn.commit()
+
+    return json_response(200, {'message': 'Delivery status updated'})
@@ -0,0 +1,90 @@
+'''
+Справочник ролей и назначение ролей пользователям
+'''
+
+from typing import Dict, Any
+
+from http_helpers import json_response, error_response
+from actions.common import require_admin
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+
+def serialize_roles(roles) -> list:
+    return [{
+        'id': r['id'],
+        'name': r['name'],
+        'description': r['description'],
+        'level': r['level']
+    } for r in roles]
+
+
+def get_roles(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(f"""
+        SELECT id, name, description, level
+        FROM {SCHEMA}.roles
+        ORDER BY level DESC
+    """)
+
+    return json_response(200, {'roles': serialize_roles(cur.fetchall())})
+
+
+def get_user_roles(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = body_data.get('user_id')
+    if not user_id:
+        return error_response(400, 'user_id is required')
+
+    cur.execute(f"""
+        SELECT r.id, r.name, r.description, r.level
+        FROM {SCHEMA}.user_roles ur
+        JOIN {SCHEMA}.roles r ON ur.role_id = r.id
+        WHERE ur.user_id = %s AND ur.is_active = true
+        ORDER BY r.level DESC
+    """, (user_id,))
+
+    return json_response(200, {'roles': serialize_roles(cur.fetchall())})
+
+
+def assign_role(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    token_check = require_admin(event, conn)
+
+    user_id = body_data.get('user_id')
+    role_id = body_data.get('role_id')
+
+    if not user_id or not role_id:
+        return error_response(400, 'user_id and role_id are required')
+
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.user_roles (user_id, role_id, assigned_by)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (user_id, role_id)
+        DO UPDATE SET is_active = true, assigned_at = CURRENT_TIMESTAMP
+    """, (user_id, role_id, token_check['admin_id']))
+    conn.commit()
+
+    return json_response(200, {
+        'success': True,
+        'message': 'Роль успешно назначена'
+    })
+
+
+def remove_role(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    require_admin(event, conn)
+
+    user_id = body_data.get('user_id')
+    role_id = body_data.get('role_id')
+
+    if not user_id or not role_id:
+        return error_response(400, 'user_id and role_id are required')
+
+    cur.execute(f"""
+        UPDATE {SCHEMA}.user_roles
+        SET is_active = false
+        WHERE user_id = %s AND role_id = %s
+    """, (user_id, role_id))
+    conn.commit()
+
+    return json_response(200, {
+        'success': True,
+        'message': 'Роль успешно удалена'
+    })
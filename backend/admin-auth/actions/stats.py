@@ -0,0 +1,107 @@
+'''
+Сводная статистика и аналитика пользователей для дашборда
+'''
+
+from typing import Dict, Any
+
+from http_helpers import json_response
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+DAY_NAMES = ['ВС', 'ПН', 'ВТ', 'СР', 'ЧТ', 'ПТ', 'СБ']
+MONTH_NAMES = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек']
+
+
+def get_stats(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(f"SELECT COUNT(*) as total FROM {SCHEMA}.users")
+    users_count = cur.fetchone()['total']
+
+    cur.execute(f"SELECT COUNT(*) as total FROM {SCHEMA}.deliveries WHERE status = 'active'")
+    active_orders = cur.fetchone()['total']
+
+    cur.execute(f"SELECT COALESCE(SUM(delivery_price), 0) as total FROM {SCHEMA}.deliveries WHERE status = 'completed'")
+    total_revenue = cur.fetchone()['total']
+
+    cur.execute(f"SELECT COUNT(*) as total FROM {SCHEMA}.carriers")
+    active_drivers = cur.fetchone()['total']
+
+    cur.execute(f"SELECT COUNT(*) as total FROM {SCHEMA}.users WHERE created_at >= NOW() - INTERVAL '7 days'")
+    new_users_this_week = cur.fetchone()['total']
+
+    average_session_time = 12.5
+
+    return json_response(200, {
+        'stats': {
+            'totalUsers': users_count,
+            'activeOrders': active_orders,
+            'totalRevenue': float(total_revenue),
+            'activeDrivers': active_drivers,
+            'newUsersThisWeek': new_users_this_week,
+            'averageSessionTime': average_session_time
+        }
+    })
+
+
+def get_user_analytics(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(f"""
+        SELECT
+            EXTRACT(DOW FROM created_at) as day_of_week,
+            COUNT(*) as user_count
+        FROM {SCHEMA}.users
+        WHERE created_at >= NOW() - INTERVAL '30 days'
+        GROUP BY EXTRACT(DOW FROM created_at)
+        ORDER BY day_of_week
+    """)
+    activity_by_day = cur.fetchall()
+
+    cur.execute(f"""
+        SELECT
+            DATE_TRUNC('month', created_at) as month,
+            COUNT(*) as user_count
+        FROM {SCHEMA}.users
+        WHERE created_at >= NOW() - INTERVAL '6 months'
+        GROUP BY DATE_TRUNC('month', created_at)
+        ORDER BY month
+    """)
+    growth_by_month = cur.fetchall()
+
+    cur.execute(f"""
+        SELECT
+            user_type,
+            COUNT(*) as count
+        FROM {SCHEMA}.users
+        GROUP BY user_type
+    """)
+    user_types = cur.fetchall()
+
+    activity_data = []
+    for day in activity_by_day:
+        day_index = int(day['day_of_week'])
+        activity_data.append({
+            'day': DAY_NAMES[day_index],
+            'users': day['user_count']
+        })
+
+    growth_data = []
+    for month in growth_by_month:
+        month_date = month['month']
+        if month_date:
+            month_index = month_date.month - 1
+            growth_data.append({
+                'month': MONTH_NAMES[month_index],
+                'users': month['user_count']
+            })
+
+    type_data = []
+    for user_type in user_types:
+        type_name = 'Заказчики' if user_type['user_type'] == 'client' else 'Водители'
+        type_data.append({
+            'name': type_name,
+            'value': user_type['count']
+        })
+
+    return json_response(200, {
+        'userActivity': activity_data,
+        'userGrowth': growth_data,
+        'userTypes': type_data
+    })
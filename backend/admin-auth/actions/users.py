@@ -0,0 +1,189 @@
+'''
+Списки пользователей, статусы, профиль и роль перевозчика/заказчика
+'''
+
+from typing import Dict, Any
+
+import db
+from http_helpers import json_response, error_response
+from validators import ValidationError, validate_uuid
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+
+def get_users(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(f"SELECT user_id, phone, full_name, email, user_type, email_verified, created_at FROM {SCHEMA}.users ORDER BY created_at DESC")
+    users_data = cur.fetchall()
+
+    users_list = []
+    for user in users_data:
+        users_list.append({
+            'id': user['user_id'],
+            'phone_number': user['phone'] or '-',
+            'full_name': user['full_name'],
+            'email': user['email'],
+            'role': user['user_type'],
+            'status': 'active' if user['email_verified'] else 'inactive',
+            'created_at': user['created_at']
+        })
+
+    return json_response(200, {'users': users_list})
+
+
+def get_all_users(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(f"""
+        SELECT user_id, phone, full_name, email, user_type, entity_type,
+               email_verified, phone_verified, created_at, updated_at
+        FROM {SCHEMA}.users
+        ORDER BY created_at DESC
+    """)
+    users_data = cur.fetchall()
+
+    users_list = []
+    for user in users_data:
+        cur.execute(f"""
+            SELECT r.id
+            FROM {SCHEMA}.user_roles ur
+            JOIN {SCHEMA}.roles r ON ur.role_id = r.id
+            WHERE ur.user_id = %s AND ur.is_active = true
+        """, (user['user_id'],))
+        user_roles = [r['id'] for r in cur.fetchall()]
+
+        users_list.append({
+            'id': str(user['user_id']),
+            'email': user['email'],
+            'full_name': user['full_name'],
+            'phone': user['phone'] or 'Не указан',
+            'user_type': user['user_type'],
+            'entity_type': user['entity_type'],
+            'email_verified': user['email_verified'],
+            'phone_verified': user['phone_verified'],
+            'status': 'active' if user['email_verified'] else 'inactive',
+            'created_at': user['created_at'],
+            'updated_at': user['updated_at'],
+            'roles': user_roles
+        })
+
+    return json_response(200, {
+        'users': users_list,
+        'total': len(users_list)
+    })
+
+
+def update_user_status(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = body_data.get('user_id')
+    status = body_data.get('status')
+
+    if not user_id or not status:
+        return error_response(400, 'User ID and status are required')
+
+    email_verified = True if status == 'active' else False
+    db.execute(cur, 'update_user_status', (str(user_id), email_verified))
+    conn.commit()
+
+    return json_response(200, {'message': 'User status updated'})
+
+
+def update_profile(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = body_data.get('user_id')
+    phone_number = body_data.get('phone_number')
+    full_name = body_data.get('full_name')
+    telegram = body_data.get('telegram')
+    company = body_data.get('company')
+    inn = body_data.get('inn')
+    avatar = body_data.get('avatar')
+    current_lat = body_data.get('current_lat')
+    current_lng = body_data.get('current_lng')
+
+    if not user_id and not phone_number:
+        return error_response(400, 'user_id or phone_number is required')
+
+    try:
+        if phone_number:
+            result = db.fetch_one(cur, 'user_id_by_phone', (phone_number,))
+            if not result:
+                return error_response(404, 'User not found')
+            user_id = str(result['user_id'])
+        else:
+            # Сравнение по uuid, а не user_id::text — иначе индекс по первичному ключу не используется
+            try:
+                user_id = validate_uuid(str(user_id))
+            except ValidationError as e:
+                return error_response(400, str(e))
+
+        has_coordinates = current_lat is not None and current_lng is not None
+
+        if all(value is None for value in (full_name, phone_number, telegram, company, inn, avatar)) \
+                and not has_coordinates:
+            return error_response(400, 'No fields to update')
+
+        db.execute(cur, 'update_profile', (
+            str(user_id),
+            full_name,
+            phone_number,
+            telegram,
+            company,
+            inn,
+            avatar,
+            float(current_lat) if has_coordinates else None,
+            float(current_lng) if has_coordinates else None
+        ))
+        conn.commit()
+
+        return json_response(200, {
+            'success': True,
+            'message': 'Профиль успешно обновлен'
+        })
+    except Exception as e:
+        print(f"Error updating profile: {e}")
+        return error_response(500, f'Database error: {str(e)}')
+
+
+def update_role_status(conn, cur, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = body_data.get('user_id')
+    phone_number = body_data.get('phone_number')
+    role = body_data.get('role')
+    carrier_status = body_data.get('carrier_status')
+    client_status = body_data.get('client_status')
+    client_ready_date = body_data.get('client_ready_date')
+
+    print(f"update_role_status: user_id={user_id}, phone={phone_number}, role={role}")
+
+    if not user_id and not phone_number:
+        return error_response(400, 'user_id or phone_number is required')
+
+    if not role or role not in ['carrier', 'logist', 'client']:
+        return error_response(400, 'Invalid role')
+
+    try:
+        if phone_number:
+            print(f"Looking for user with phone: {phone_number}")
+            result = db.fetch_one(cur, 'user_id_by_phone', (phone_number,))
+            print(f"User lookup result: {result}")
+            if not result:
+                print(f"User not found for phone: {phone_number}")
+                return error_response(404, 'User not found', phone=phone_number)
+            user_id = str(result['user_id'])
+            print(f"Found user_id: {user_id}")
+        else:
+            try:
+                user_id = validate_uuid(str(user_id))
+            except ValidationError as e:
+                return error_response(400, str(e))
+
+        db.execute(cur, 'update_role_status', (
+            str(user_id),
+            role,
+            carrier_status if carrier_status in ['free', 'has_space'] else None,
+            client_status if client_status in ['ready_now', 'ready_later'] else None,
+            client_ready_date or None
+        ))
+        conn.commit()
+
+        return json_response(200, {
+            'success': True,
+            'message': 'Роль и статус успешно обновлены'
+        })
+    except Exception as e:
+        print(f"Error updating role status: {e}")
+        return error_response(500, f'Database error: {str(e)}')
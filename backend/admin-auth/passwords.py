@@ -0,0 +1,124 @@
+'''
+Хеши паролей администраторов: scrypt (hashlib.scrypt) с солью и настраиваемой стоимостью.
+Формат: scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>. Старые хеши — голый sha256 hex;
+они принимаются при входе и сразу пересчитываются в scrypt (как и хеши с устаревшей стоимостью).
+Проверка выполняется в пуле потоков: hashlib.scrypt отпускает GIL, поэтому пачка входов
+не выстраивается в очередь за одним ядром, а ожидание ограничено VERIFY_TIMEOUT_SECONDS
+'''
+
+import base64
+import hashlib
+import hmac
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+SCHEME = 'scrypt'
+
+# Стоимость подобрана scripts/bench_password_hash.py под бюджет p99 входа
+SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+
+# Хеш с параметрами выше этих не проверяется: одна проверка не должна съесть функцию
+MAX_SCRYPT_N = 2 ** 17
+MAX_SCRYPT_R = 16
+MAX_SCRYPT_P = 4
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 4))
+VERIFY_TIMEOUT_SECONDS = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', 5))
+
+LEGACY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+_pool = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix='password')
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def hash_password(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> str:
+    salt = os.urandom(SALT_BYTES)
+    return '$'.join([SCHEME, str(n), str(r), str(p), _b64(salt), _b64(_scrypt(password, salt, n, r, p))])
+
+
+def _parse(stored: str) -> Optional[Tuple[int, int, int, bytes, bytes]]:
+    parts = stored.split('$')
+    if len(parts) != 6 or parts[0] != SCHEME:
+        return None
+    try:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        salt, expected = _unb64(parts[4]), _unb64(parts[5])
+    except ValueError:
+        return None
+    if n < 2 or n & (n - 1) or n > MAX_SCRYPT_N or not 0 < r <= MAX_SCRYPT_R or not 0 < p <= MAX_SCRYPT_P:
+        return None
+    return n, r, p, salt, expected
+
+
+def needs_rehash(stored: str) -> bool:
+    params = _parse(stored or '')
+    return params is None or params[:3] != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# Для несуществующего email тоже считаем scrypt, чтобы время ответа не выдавало, есть ли такой админ.
+# Хеш-заглушка создаётся при первой такой проверке, а не при холодном старте
+_dummy_hash: Optional[str] = None
+
+
+def _dummy() -> str:
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(os.urandom(8).hex())
+    return _dummy_hash
+
+
+def _burn(password: str):
+    '''
+    Холостой scrypt со стоимостью заглушки — время проверки как у настоящего хеша
+    '''
+    n, r, p, salt, _ = _parse(_dummy())
+    _scrypt(password, salt, n, r, p)
+
+
+def check_password(password: str, stored: Optional[str]) -> bool:
+    '''
+    Синхронная проверка; сравнение — за постоянное время
+    '''
+    if not stored:
+        return False
+
+    if LEGACY_RE.match(stored):
+        # sha256 считается за микросекунды: без scrypt время ответа выдавало бы аккаунт со старым хешем
+        _burn(password)
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+
+    params = _parse(stored)
+    if params is None:
+        print(f"[ERROR] Unsupported password hash format: {stored.split('$', 1)[0]}")
+        _burn(password)
+        return False
+
+    n, r, p, salt, expected = params
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p), expected)
+
+
+def verify_password(password: str, stored: Optional[str], timeout: float = VERIFY_TIMEOUT_SECONDS) -> bool:
+    '''
+    Проверка в пуле потоков. При переполнении пула дольше timeout бросает
+    concurrent.futures.TimeoutError — вызывающий отвечает 503, а не висит до таймаута функции
+    '''
+    return _pool.submit(check_password, password, stored or _dummy()).result(timeout=timeout) and bool(stored)
@@ -0,0 +1,199 @@
+'''
+Очистка таблиц пачками. Одним DELETE на миллионах строк держатся блокировки, растёт WAL
+и функция упирается в таймаут, поэтому строки удаляются порциями по первичному ключу,
+каждая порция — отдельная транзакция вместе с записью прогресса в purge_jobs.
+Если на таблицу не ссылается ни один внешний ключ, она очищается через TRUNCATE.
+Общий модуль admin-auth и db-maintenance: админка создаёт задание и выполняет его,
+пока хватает времени, остаток добирает задача run_purge_jobs
+'''
+
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from psycopg2 import extensions
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+# Таблица -> первичный ключ. Имя таблицы подставляется в SQL только из этого словаря
+PURGEABLE_TABLES: Dict[str, str] = {
+    'deliveries': 'delivery_id',
+    'login_logs': 'log_id',
+    'cargo': 'id',
+    'drivers': 'id',
+    'users': 'user_id',
+}
+
+PURGE_BATCH_SIZE = 5000
+
+# Пространство ключей pg_try_advisory_lock: одно задание выполняет один процесс
+PURGE_LOCK_NAMESPACE = 41001
+
+JOB_COLUMNS = ('id', 'table_name', 'mode', 'status', 'deleted_rows', 'batches', 'last_error',
+               'created_at', 'updated_at', 'finished_at')
+
+
+def _job(row) -> Dict[str, Any]:
+    return dict(zip(JOB_COLUMNS, row))
+
+
+def _cursor(conn):
+    # Обычный курсор независимо от cursor_factory соединения (admin-auth ставит RealDictCursor)
+    return conn.cursor(cursor_factory=extensions.cursor)
+
+
+def is_referenced(cur, table: str) -> bool:
+    '''
+    Ссылаются ли на таблицу внешние ключи других таблиц: тогда TRUNCATE без CASCADE невозможен
+    '''
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = %s::regclass AND conrelid <> confrelid
+        )
+    """, (f"{SCHEMA}.{table}",))
+    return cur.fetchone()[0]
+
+
+def create_job(conn, table: str, requested_by: Optional[int] = None) -> Dict[str, Any]:
+    if table not in PURGEABLE_TABLES:
+        raise ValueError(f'Table {table} cannot be purged')
+
+    with _cursor(conn) as cur:
+        mode = 'delete' if is_referenced(cur, table) else 'truncate'
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.purge_jobs (table_name, mode, requested_by)
+            VALUES (%s, %s, %s)
+            RETURNING {', '.join(JOB_COLUMNS)}
+        """, (table, mode, requested_by))
+        job = _job(cur.fetchone())
+    conn.commit()
+    return job
+
+
+def get_jobs(conn, job_ids: Optional[List[int]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    with _cursor(conn) as cur:
+        if job_ids:
+            cur.execute(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM {SCHEMA}.purge_jobs
+                WHERE id = ANY(%s) ORDER BY id
+            """, (list(job_ids),))
+        else:
+            cur.execute(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM {SCHEMA}.purge_jobs
+                ORDER BY id DESC LIMIT %s
+            """, (limit,))
+        return [_job(row) for row in cur.fetchall()]
+
+
+def _finish(cur, job_id: int, status: str, error: Optional[str] = None):
+    cur.execute(f"""
+        UPDATE {SCHEMA}.purge_jobs
+        SET status = %s, last_error = %s, updated_at = NOW(),
+            finished_at = CASE WHEN %s IN ('done', 'failed') THEN NOW() END
+        WHERE id = %s
+    """, (status, error, status, job_id))
+
+
+def _run_locked(conn, job: Dict[str, Any], deadline: float, batch_size: int) -> Dict[str, Any]:
+    table = job['table_name']
+    pk = PURGEABLE_TABLES[table]
+
+    with _cursor(conn) as cur:
+        if job['mode'] == 'truncate':
+            # COUNT(*) читал бы всю таблицу, которую TRUNCATE освобождает мгновенно:
+            # в deleted_rows идёт оценка планировщика (-1 у ни разу не анализированной таблицы)
+            cur.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = %s::regclass",
+                        (f"{SCHEMA}.{table}",))
+            count = cur.fetchone()[0]
+            cur.execute(f"TRUNCATE {SCHEMA}.{table}")
+            cur.execute(f"""
+                UPDATE {SCHEMA}.purge_jobs
+                SET deleted_rows = deleted_rows + %s, batches = batches + 1
+                WHERE id = %s
+            """, (count, job['id']))
+            _finish(cur, job['id'], 'done')
+            conn.commit()
+            return get_jobs(conn, [job['id']])[0]
+
+        _finish(cur, job['id'], 'running')
+        conn.commit()
+
+        while time.monotonic() < deadline:
+            cur.execute(f"""
+                DELETE FROM {SCHEMA}.{table}
+                WHERE {pk} IN (
+                    SELECT {pk} FROM {SCHEMA}.{table}
+                    ORDER BY {pk}
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, (batch_size,))
+            deleted = cur.rowcount
+            cur.execute(f"""
+                UPDATE {SCHEMA}.purge_jobs
+                SET deleted_rows = deleted_rows + %s, batches = batches + 1, updated_at = NOW()
+                WHERE id = %s
+            """, (deleted, job['id']))
+            if deleted < batch_size:
+                _finish(cur, job['id'], 'done')
+                conn.commit()
+                break
+            conn.commit()
+
+    return get_jobs(conn, [job['id']])[0]
+
+
+def run_job(conn, job: Dict[str, Any], deadline: float, batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, Any]:
+    '''
+    Выполняет задание до конца или до deadline (time.monotonic()). Задание, которое уже
+    выполняет другой процесс, возвращается как есть
+    '''
+    with _cursor(conn) as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (PURGE_LOCK_NAMESPACE, job['id']))
+        locked = cur.fetchone()[0]
+    conn.commit()
+    if not locked:
+        return job
+
+    started = time.monotonic()
+    try:
+        result = _run_locked(conn, job, deadline, batch_size)
+    except psycopg2.Error as e:
+        conn.rollback()
+        message = str(e).strip().splitlines()[0]
+        print(f"[ERROR] Purge job {job['id']} ({job['table_name']}): {message}")
+        with _cursor(conn) as cur:
+            _finish(cur, job['id'], 'failed', message)
+        conn.commit()
+        result = get_jobs(conn, [job['id']])[0]
+    finally:
+        with _cursor(conn) as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s, %s)", (PURGE_LOCK_NAMESPACE, job['id']))
+        conn.commit()
+
+    print(f"[DEBUG] Purge job {job['id']} ({job['table_name']}, {job['mode']}): {result['status']}, "
+          f"{result['deleted_rows']} rows in {result['batches']} batches, "
+          f"{(time.monotonic() - started) * 1000:.0f}ms")
+    return result
+
+
+def run_pending_jobs(conn, deadline: float) -> List[Dict[str, Any]]:
+    '''
+    Добирает незавершённые задания по порядку создания, пока есть время
+    '''
+    with _cursor(conn) as cur:
+        cur.execute(f"""
+            SELECT {', '.join(JOB_COLUMNS)} FROM {SCHEMA}.purge_jobs
+            WHERE status IN ('pending', 'running')
+            ORDER BY created_at
+        """)
+        jobs = [_job(row) for row in cur.fetchall()]
+    conn.commit()
+
+    results = []
+    for job in jobs:
+        if time.monotonic() >= deadline:
+            break
+        results.append(run_job(conn, job, deadline))
+    return results
@@ -0,0 +1,103 @@
+'''
+Именованные запросы admin-auth. Готовятся через PREPARE один раз на соединение (см. db.py)
+'''
+
+from db import register
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+register('active_admins', f"""
+    SELECT id, email, full_name, is_active FROM {SCHEMA}.admins WHERE is_active = true
+""")
+
+register('admin_by_email', f"""
+    SELECT id, telegram_chat_id FROM {SCHEMA}.admins WHERE email = $1
+""")
+
+register('admin_login', f"""
+    SELECT id, email, full_name, is_active, password_hash
+    FROM {SCHEMA}.admins
+    WHERE email = $1
+""")
+
+register('admin_password_hash', f"""
+    SELECT id, email, password_hash FROM {SCHEMA}.admins
+    WHERE id = $1 AND is_active = true
+""")
+
+register('insert_admin', f"""
+    INSERT INTO {SCHEMA}.admins (email, password_hash, full_name, two_factor_secret)
+    VALUES ($1, $2, $3, $4)
+    RETURNING id, email, full_name, created_at
+""")
+
+register('update_admin_password_by_email', f"""
+    UPDATE {SCHEMA}.admins SET password_hash = $2, updated_at = NOW() WHERE email = $1
+""")
+
+register('update_admin_password', f"""
+    UPDATE {SCHEMA}.admins SET password_hash = $2 WHERE id = $1
+""")
+
+register('update_admin_telegram_chat_id', f"""
+    UPDATE {SCHEMA}.admins SET telegram_chat_id = $2 WHERE id = $1
+""")
+
+register('delete_admin_by_email', f"""
+    DELETE FROM {SCHEMA}.admins WHERE email = $1
+""")
+
+register('insert_reset_code', f"""
+    INSERT INTO {SCHEMA}.password_reset_codes (email, code, expires_at) VALUES ($1, $2, $3)
+""")
+
+register('find_reset_code', f"""
+    SELECT id FROM {SCHEMA}.password_reset_codes
+    WHERE email = $1 AND code = $2 AND used = false AND expires_at > NOW()
+    ORDER BY created_at DESC LIMIT 1
+""")
+
+register('use_reset_code', f"""
+    UPDATE {SCHEMA}.password_reset_codes SET used = true WHERE id = $1
+""")
+
+register('user_id_by_phone', f"""
+    SELECT user_id FROM {SCHEMA}.users WHERE phone = $1
+""")
+
+register('update_user_status', f"""
+    UPDATE {SCHEMA}.users SET email_verified = $2 WHERE user_id = $1
+""")
+
+register('update_delivery_status', f"""
+    UPDATE {SCHEMA}.deliveries SET status = $2 WHERE delivery_id = $1
+""")
+
+register('delete_users_by_emails', f"""
+    DELETE FROM {SCHEMA}.users WHERE email = ANY($1)
+""")
+
+# Неуказанные поля (NULL) остаются прежними, поэтому один план на любой набор полей
+register('update_profile', f"""
+    UPDATE {SCHEMA}.users
+    SET full_name = COALESCE($2, full_name),
+        phone = COALESCE($3, phone),
+        telegram = COALESCE($4, telegram),
+        organization_name = COALESCE($5, organization_name),
+        inn = COALESCE($6, inn),
+        avatar = COALESCE($7, avatar),
+        current_lat = COALESCE($8, current_lat),
+        current_lng = COALESCE($9, current_lng),
+        updated_at = NOW()
+    WHERE user_id = $1::uuid
+""")
+
+register('update_role_status', f"""
+    UPDATE {SCHEMA}.users
+    SET role = $2,
+        role_status_set = TRUE,
+        carrier_status = COALESCE($3, carrier_status),
+        client_status = COALESCE($4, client_status),
+        client_ready_date = $5
+    WHERE user_id = $1::uuid
+""")
@@ -0,0 +1,179 @@
+'''
+Клиент Telegram Bot API: одна keep-alive сессия на процесс, пул соединений,
+повторы с backoff, таймауты и метрики задержек/ошибок. Методы чтения (get*) повторяются
+на 429/5xx и обрывах; отправка — только если запрос точно не ушёл (соединение не
+установлено) или Telegram ответил 429 с retry_after, иначе сообщение может прийти дважды.
+Одинаковая копия лежит в каждой функции, которая ходит в Telegram.
+requests импортируется при создании первого клиента: это самый тяжёлый импорт функций
+(~140 мс), а многие вызовы до Telegram не доходят.
+'''
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CONNECT_TIMEOUT = 3.05
+
+
+def is_idempotent(method: str, http_method: str) -> bool:
+    return http_method == 'GET' or method.startswith('get')
+
+
+def is_unsent(error: Exception) -> bool:
+    '''
+    Ошибка случилась до отправки запроса: не удалось установить соединение
+    '''
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    from urllib3.exceptions import MaxRetryError, NewConnectionError
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)
+
+
+class TelegramClient:
+    def __init__(self, bot_token: str, pool_size: int = 10, max_retries: int = 3,
+                 backoff: float = 0.5, max_retry_after: float = 5.0):
+        self.bot_token = bot_token
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+
+        global requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._metrics_lock = threading.Lock()
+
+    def method_url(self, method: str) -> str:
+        return f'{API_URL}/bot{self.bot_token}/{method}'
+
+    def file_url(self, file_path: str) -> str:
+        return f'{API_URL}/file/bot{self.bot_token}/{file_path}'
+
+    def request(self, method: str, payload: Optional[Dict[str, Any]] = None,
+                http_method: str = 'POST', timeout: float = 10) -> requests.Response:
+        '''
+        Вызывает метод Bot API. После исчерпания попыток возвращается последний ответ
+        или пробрасывается ошибка. Read-таймаут не повторяется ни для какого метода
+        '''
+        url = self.method_url(method)
+        kwargs: Dict[str, Any] = {'timeout': (CONNECT_TIMEOUT, timeout)}
+        if http_method == 'GET':
+            kwargs['params'] = payload
+        else:
+            kwargs['json'] = payload
+
+        idempotent = is_idempotent(method, http_method)
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            try:
+                response = self.session.request(http_method, url, **kwargs)
+            except requests.ConnectionError as e:
+                if attempt >= self.max_retries or not (idempotent or is_unsent(e)):
+                    self._record(method, started, attempt, failed=True)
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+                continue
+            except requests.RequestException:
+                self._record(method, started, attempt, failed=True)
+                raise
+
+            delay = self._retry_delay(response, attempt, idempotent) if attempt < self.max_retries else None
+            if delay is not None:
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._record(method, started, attempt, failed=not response.ok)
+            return response
+
+    def send_message(self, chat_id: Any, text: str, timeout: float = 10, **extra) -> requests.Response:
+        payload = {'chat_id': chat_id, 'text': text}
+        payload.update(extra)
+        return self.request('sendMessage', payload, timeout=timeout)
+
+    def _retry_delay(self, response: requests.Response, attempt: int, idempotent: bool) -> Optional[float]:
+        '''
+        Пауза перед повтором или None, если ответ повторять нельзя
+        '''
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        delay = self.backoff * (2 ** attempt)
+        retry_after = self._retry_after(response) if response.status_code == 429 else None
+        if retry_after is not None:
+            # Повтор раньше retry_after снова получит 429
+            return max(delay, retry_after) if retry_after <= self.max_retry_after else None
+        # 5xx и 429 без retry_after: отправка могла пройти, повторяем только чтение
+        return min(delay, self.max_retry_after) if idempotent else None
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        retry_after = response.headers.get('Retry-After')
+        try:
+            retry_after = retry_after or response.json().get('parameters', {}).get('retry_after')
+        except (ValueError, AttributeError):
+            pass
+        try:
+            return float(retry_after) if retry_after else None
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, method: str, started: float, retries: int, failed: bool):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            stats = self._metrics.setdefault(method, {
+                'calls': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            stats['calls'] += 1
+            stats['retries'] += retries
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if failed:
+                stats['errors'] += 1
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        with self._metrics_lock:
+            return {
+                method: dict(stats, avg_ms=round(stats['total_ms'] / stats['calls'], 1))
+                for method, stats in self._metrics.items()
+            }
+
+    def log_metrics(self):
+        for method, stats in self.get_metrics().items():
+            print(f"[METRICS] telegram.{method}: calls={stats['calls']} errors={stats['errors']} "
+                  f"retries={stats['retries']} avg={stats['avg_ms']}ms max={stats['max_ms']:.1f}ms")
+
+
+_clients: Dict[str, TelegramClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(bot_token: str) -> TelegramClient:
+    '''
+    Клиент живёт между вызовами тёплого инстанса, поэтому TLS-соединения переиспользуются
+    '''
+    with _clients_lock:
+        client = _clients.get(bot_token)
+        if client is None:
+            client = TelegramClient(bot_token)
+            _clients[bot_token] = client
+        return client
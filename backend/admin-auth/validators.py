@@ -1,107 +1,284 @@
 '''
-Input validation and sanitization utilities
+Input validation and sanitization utilities.
+Шаблоны компилируются один раз при импорте. Schema описывает поля запроса декларативно
+и проверяет их за один проход, собирая все ошибки, а не только первую, — в том числе
+для списков (validate_many), поэтому большие пакеты проверяются дёшево и одинаково.
+Общий модуль admin-auth, orders и vehicles-unified
 '''
 
+import math
 import re
-from typing import Dict, Any, Optional
+from datetime import date, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+LETTER_RE = re.compile(r'[a-zA-Z]')
+DIGIT_RE = re.compile(r'\d')
+FULL_NAME_RE = re.compile(r'^[a-zA-Zа-яА-ЯёЁ\s\-]+$')
+UUID_RE = re.compile(r'^[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}$')
+PHONE_SEPARATORS_RE = re.compile(r'[\s\-\(\)]')
+PHONE_RE = re.compile(r'^\+\d{10,15}$')
+SCRIPT_RE = re.compile(r'<script[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r'<[^>]+>')
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+TIME_RE = re.compile(r'^\d{2}:\d{2}(:\d{2})?$')
 
 class ValidationError(Exception):
-    pass
+    def __init__(self, message: str, errors: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.errors = errors or {}
 
 def validate_email(email: str) -> str:
     if not email or not isinstance(email, str):
         raise ValidationError('Email is required')
-    
+
     email = email.strip().lower()
-    
+
     if len(email) > 254:
         raise ValidationError('Email is too long')
-    
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_pattern, email):
+
+    if not EMAIL_RE.match(email):
         raise ValidationError('Invalid email format')
-    
+
     return email
 
 def validate_password(password: str, min_length: int = 8) -> str:
     if not password or not isinstance(password, str):
         raise ValidationError('Password is required')
-    
+
     if len(password) < min_length:
         raise ValidationError(f'Password must be at least {min_length} characters')
-    
+
     if len(password) > 128:
         raise ValidationError('Password is too long')
-    
-    has_letter = re.search(r'[a-zA-Z]', password)
-    has_digit = re.search(r'\d', password)
-    
-    if not has_letter or not has_digit:
-        raise ValidationError('Password must contain both letters and numbers')
-    
+
+    if min_length > 1:
+        if not LETTER_RE.search(password) or not DIGIT_RE.search(password):
+            raise ValidationError('Password must contain both letters and numbers')
+
     return password
 
 def validate_full_name(name: str) -> str:
     if not name or not isinstance(name, str):
         raise ValidationError('Full name is required')
-    
+
     name = name.strip()
-    
+
     if len(name) < 2:
         raise ValidationError('Full name is too short')
-    
+
     if len(name) > 100:
         raise ValidationError('Full name is too long')
-    
-    if not re.match(r'^[a-zA-Zа-яА-ЯёЁ\s\-]+$', name):
+
+    if not FULL_NAME_RE.match(name):
         raise ValidationError('Full name contains invalid characters')
-    
+
     return name
 
 def sanitize_string(text: str, max_length: int = 1000) -> str:
     if not text or not isinstance(text, str):
         return ''
-    
+
     text = text.strip()
-    
-    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<[^>]+>', '', text)
-    
+
+    text = SCRIPT_RE.sub('', text)
+    text = TAG_RE.sub('', text)
+
     text = text.replace('<', '&lt;').replace('>', '&gt;')
-    
+
     if len(text) > max_length:
         text = text[:max_length]
-    
+
     return text
 
 def validate_uuid(uuid_str: str) -> str:
     if not uuid_str or not isinstance(uuid_str, str):
         raise ValidationError('UUID is required')
-    
-    uuid_pattern = r'^[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}$'
-    if not re.match(uuid_pattern, uuid_str.lower()):
+
+    uuid_str = uuid_str.lower()
+    if not UUID_RE.match(uuid_str):
         raise ValidationError('Invalid UUID format')
-    
-    return uuid_str.lower()
+
+    return uuid_str
 
 def validate_phone(phone: str) -> str:
     if not phone or not isinstance(phone, str):
         raise ValidationError('Phone is required')
-    
-    phone = re.sub(r'[\s\-\(\)]', '', phone)
-    
-    phone = re.sub(r'^\+?', '+', phone)
-    
-    if not re.match(r'^\+\d{10,15}$', phone):
+
+    phone = PHONE_SEPARATORS_RE.sub('', phone)
+
+    if not phone.startswith('+'):
+        phone = '+' + phone
+
+    if not PHONE_RE.match(phone):
         raise ValidationError('Invalid phone format')
-    
+
     return phone
 
 def validate_action(action: str, allowed_actions: list) -> str:
     if not action or not isinstance(action, str):
         raise ValidationError('Action is required')
-    
+
     if action not in allowed_actions:
         raise ValidationError(f'Invalid action. Allowed: {", ".join(allowed_actions)}')
-    
+
     return action
+
+# --- схемы ---------------------------------------------------------------------------
+
+Check = Callable[[Any], Any]
+
+def password_policy(min_length: int = 8) -> Check:
+    return lambda value: validate_password(value, min_length=min_length)
+
+def string(min_length: int = 1, max_length: int = 255, pattern: Optional['re.Pattern'] = None,
+           message: str = 'Invalid format') -> Check:
+    def check(value):
+        if not isinstance(value, str):
+            raise ValidationError('Must be a string')
+        value = value.strip()
+        if len(value) < min_length:
+            raise ValidationError(f'Must be at least {min_length} characters')
+        if len(value) > max_length:
+            raise ValidationError(f'Must be at most {max_length} characters')
+        if pattern is not None and not pattern.match(value):
+            raise ValidationError(message)
+        return value
+    return check
+
+def integer(min_value: Optional[int] = None, max_value: Optional[int] = None) -> Check:
+    def check(value):
+        if isinstance(value, bool):
+            raise ValidationError('Must be an integer')
+        try:
+            result = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError('Must be an integer')
+        if isinstance(value, float) and value != result:
+            raise ValidationError('Must be an integer')
+        if min_value is not None and result < min_value:
+            raise ValidationError(f'Must be at least {min_value}')
+        if max_value is not None and result > max_value:
+            raise ValidationError(f'Must be at most {max_value}')
+        return result
+    return check
+
+def number(min_value: Optional[float] = None, max_value: Optional[float] = None) -> Check:
+    def check(value):
+        if isinstance(value, bool):
+            raise ValidationError('Must be a number')
+        try:
+            result = float(value)
+        except (TypeError, ValueError):
+            raise ValidationError('Must be a number')
+        if not math.isfinite(result):
+            raise ValidationError('Must be a number')
+        if min_value is not None and result < min_value:
+            raise ValidationError(f'Must be at least {min_value}')
+        if max_value is not None and result > max_value:
+            raise ValidationError(f'Must be at most {max_value}')
+        return result
+    return check
+
+def one_of(*choices: Any) -> Check:
+    allowed = frozenset(choices)
+    message = f'Must be one of: {", ".join(map(str, choices))}'
+
+    def check(value):
+        try:
+            valid = value in allowed
+        except TypeError:
+            valid = False
+        if not valid:
+            raise ValidationError(message)
+        return value
+    return check
+
+def iso_date(value: Any) -> date:
+    if not isinstance(value, str) or not DATE_RE.match(value):
+        raise ValidationError('Must be a date YYYY-MM-DD')
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError('Must be a date YYYY-MM-DD')
+
+def time_of_day(value: Any) -> time:
+    if not isinstance(value, str) or not TIME_RE.match(value):
+        raise ValidationError('Must be a time HH:MM')
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        raise ValidationError('Must be a time HH:MM')
+
+class Field:
+    '''
+    Правило для одного поля: check нормализует значение или бросает ValidationError
+    '''
+    __slots__ = ('check', 'required', 'default', 'required_message')
+
+    def __init__(self, check: Check, required: bool = True, default: Any = None,
+                 required_message: Optional[str] = None):
+        self.check = check
+        self.required = required
+        self.default = default
+        self.required_message = required_message
+
+class Schema:
+    '''
+    Схема тела запроса: Schema(email=Field(validate_email), ...).
+    validate() возвращает (очищенные данные, {поле: ошибка}); check() бросает
+    ValidationError с первой ошибкой в сообщении и всеми в .errors
+    '''
+
+    def __init__(self, **fields: Field):
+        self.fields: Dict[str, Field] = fields
+        # Плоские кортежи вместо обращений к атрибутам Field в горячем цикле
+        self._rules: Tuple[Tuple[str, Check, bool, Any, str], ...] = tuple(
+            (name, field.check, field.required, field.default, field.required_message or f'{name} is required')
+            for name, field in fields.items()
+        )
+
+    def validate(self, data: Any, prefix: str = '') -> Tuple[Dict[str, Any], Dict[str, str]]:
+        if not isinstance(data, dict):
+            return {}, {prefix.rstrip('.') or 'body': 'Must be an object'}
+
+        clean: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        get = data.get
+        for name, check, required, default, required_message in self._rules:
+            value = get(name)
+            if value is None or value == '':
+                if required:
+                    errors[prefix + name] = required_message
+                else:
+                    clean[name] = default
+                continue
+            try:
+                clean[name] = check(value)
+            except ValidationError as e:
+                errors[prefix + name] = str(e)
+        return clean, errors
+
+    def validate_many(self, items: Any, name: str) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        '''
+        Проверяет список объектов целиком; ошибки адресуются как name[i].field
+        '''
+        if not isinstance(items, list) or not items:
+            return [], {name: f'{name} must be a non-empty list'}
+
+        cleaned: List[Dict[str, Any]] = []
+        errors: Dict[str, str] = {}
+        for index, item in enumerate(items):
+            clean, item_errors = self.validate(item, f'{name}[{index}].')
+            cleaned.append(clean)
+            errors.update(item_errors)
+        return cleaned, errors
+
+    def check(self, data: Any) -> Dict[str, Any]:
+        clean, errors = self.validate(data)
+        raise_errors(errors)
+        return clean
+
+def raise_errors(errors: Dict[str, str]):
+    if errors:
+        raise ValidationError(next(iter(errors.values())), errors)
@@ -0,0 +1,161 @@
+import os
+import hmac
+import time
+from datetime import datetime, timedelta
+import psycopg2
+from typing import Dict, Any, List, Callable
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, exception_response, get_header
+import purge
+import location_history
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+CORS_HEADERS = cors_headers('GET, POST, OPTIONS', 'Content-Type, X-Maintenance-Token')
+
+# Сколько строк удаляем за одну транзакцию — короткие блокировки, небольшой WAL
+REAP_BATCH_SIZE = 1000
+
+# Общий бюджет времени на один запуск, чтобы не упереться в таймаут функции
+TIME_BUDGET_SECONDS = 20
+
+# Истёкшие строки держим ещё час: verify успевает ответить «Session expired»,
+# а записи, созданные с локальным временем вместо UTC, не удаляются раньше срока
+REAP_GRACE = timedelta(hours=1)
+
+# Таблицы с одноразовыми кодами и сессиями. Использованные строки тоже истекают
+# (5–15 минут), поэтому одного условия по expires_at хватает, и оно идёт по индексу.
+# license_checks — кеш проверок ВУ (verify-license), срок задаётся TTL результата
+REAP_TARGETS = [
+    {'table': 'telegram_auth_sessions', 'pk': 'session_token'},
+    {'table': 'telegram_verification_codes', 'pk': 'id'},
+    {'table': 'password_reset_codes', 'pk': 'id'},
+    {'table': 'license_checks', 'pk': 'id'},
+]
+
+def reap_table(conn, table: str, pk: str, cutoff: datetime, deadline: float) -> Dict[str, Any]:
+    '''
+    Удаляет истёкшие строки пачками по первичному ключу, каждая пачка — отдельная транзакция
+    '''
+    deleted = 0
+    batches = 0
+
+    with conn.cursor() as cur:
+        while time.monotonic() < deadline:
+            cur.execute(f"""
+                DELETE FROM {SCHEMA}.{table}
+                WHERE {pk} IN (
+                    SELECT {pk} FROM {SCHEMA}.{table}
+                    WHERE expires_at < %s
+                    ORDER BY expires_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, (cutoff, REAP_BATCH_SIZE))
+            conn.commit()
+
+            deleted += cur.rowcount
+            batches += 1
+
+            if cur.rowcount < REAP_BATCH_SIZE:
+                return {'deleted': deleted, 'batches': batches, 'complete': True}
+
+    return {'deleted': deleted, 'batches': batches, 'complete': False}
+
+def reap_expired_auth(conn, deadline: float) -> Dict[str, Any]:
+    cutoff = datetime.utcnow() - REAP_GRACE
+    results = {}
+
+    for target in REAP_TARGETS:
+        results[target['table']] = reap_table(conn, target['table'], target['pk'], cutoff, deadline)
+
+    return results
+
+def run_purge_jobs(conn, deadline: float) -> Dict[str, Any]:
+    '''
+    Добирает задания очистки таблиц, которые админка не успела выполнить за свой запрос
+    '''
+    jobs = purge.run_pending_jobs(conn, deadline)
+    return {
+        'jobs': len(jobs),
+        'done': sum(1 for job in jobs if job['status'] == 'done'),
+        'failed': sum(1 for job in jobs if job['status'] == 'failed'),
+        'deleted': sum(job['deleted_rows'] for job in jobs),
+    }
+
+def rotate_driver_locations(conn, deadline: float) -> Dict[str, Any]:
+    '''
+    Готовит суточные секции истории координат вперёд и удаляет секции старше срока хранения
+    '''
+    return location_history.rotate(conn, datetime.utcnow().date())
+
+# Задачи обслуживания по имени; запуск без списка выполняет все по порядку
+TASKS: Dict[str, Callable[[Any, float], Dict[str, Any]]] = {
+    'reap_expired_auth': reap_expired_auth,
+    'run_purge_jobs': run_purge_jobs,
+    'rotate_driver_locations': rotate_driver_locations,
+}
+
+def is_authorized(event: Dict[str, Any], secret: str) -> bool:
+    token = get_header(event, 'X-Maintenance-Token', '')
+    return hmac.compare_digest(token, secret)
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Плановое обслуживание БД — удаляет истёкшие сессии авторизации и одноразовые коды,
+              выполняет отложенные задания очистки таблиц, ведёт секции истории координат
+    Args: event with httpMethod GET/POST, optional body with tasks list,
+          header X-Maintenance-Token equal to MAINTENANCE_SECRET
+          context with request_id attribute
+    Returns: HTTP response with per-task results
+    '''
+    method: str = event.get('httpMethod', 'GET')
+
+    if method == 'OPTIONS':
+        return preflight_response(CORS_HEADERS)
+
+    if method not in ('GET', 'POST'):
+        return error_response(405, 'Method not allowed')
+
+    # Без секрета функцию мог бы вызвать кто угодно — не запускаемся вовсе
+    secret = os.environ.get('MAINTENANCE_SECRET')
+    if not secret:
+        print("[ERROR] MAINTENANCE_SECRET is not set, refusing to run maintenance")
+        return error_response(500, 'Maintenance secret not configured')
+
+    if not is_authorized(event, secret):
+        return error_response(401, 'Unauthorized')
+
+    try:
+        body_data = parse_body(event) if method == 'POST' else {}
+        requested: List[str] = body_data.get('tasks') or list(TASKS.keys())
+
+        unknown = [name for name in requested if name not in TASKS]
+        if unknown:
+            return error_response(400, f'Unknown tasks: {", ".join(unknown)}')
+
+        dsn = os.environ.get('DATABASE_URL')
+        if not dsn:
+            return error_response(500, 'Database not configured')
+
+        started = time.monotonic()
+        deadline = started + TIME_BUDGET_SECONDS
+
+        conn = psycopg2.connect(dsn)
+        results = {}
+
+        try:
+            for name in requested:
+                task_started = time.monotonic()
+                results[name] = TASKS[name](conn, deadline)
+                print(f"[DEBUG] Maintenance task {name}: {results[name]} "
+                      f"in {(time.monotonic() - task_started) * 1000:.0f}ms")
+        finally:
+            conn.close()
+
+        return json_response(200, {
+            'success': True,
+            'results': results,
+            'elapsed_ms': round((time.monotonic() - started) * 1000)
+        })
+
+    except Exception as e:
+        return exception_response(e, 'Maintenance error')
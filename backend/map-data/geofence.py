@@ -0,0 +1,142 @@
+'''
+Проверка геозон на пачке координат водителя (update_location). Из базы читаются только
+активные зоны этого водителя рядом с пачкой или те, в которых он сейчас находится
+(индекс idx_geofences_driver_active), так что точка не сравнивается со всеми зонами.
+Расстояния точек до зон считаются одной матрицей NumPy. Вход — точка не дальше radius_m,
+выход — дальше radius_m * EXIT_FACTOR: GPS-шум у границы не даёт серии вход/выход.
+События пишутся в geofence_events, по ним обновляется заявка отправителя:
+выход из зоны забора — груз забран (picked_up_at), вход в зону склада после забора —
+груз доставлен (status = completed), и зоны заказа выключаются
+'''
+
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+EARTH_RADIUS_M = 6371000.0
+EXIT_FACTOR = 1.3
+
+# Наибольший радиус зоны (orders/geofences.py) с запасом на выход — поле поиска вокруг пачки
+MAX_RADIUS_M = 300 * EXIT_FACTOR
+
+
+def _load(cur, driver_id: str, lat: np.ndarray, lng: np.ndarray) -> List[Any]:
+    margin_lat = math.degrees(MAX_RADIUS_M / EARTH_RADIUS_M)
+    margin_lng = margin_lat / max(math.cos(math.radians(float(np.max(np.abs(lat))))), 0.01)
+    # FOR UPDATE: параллельные пачки одного водителя считают переходы по очереди
+    cur.execute(f"""
+        SELECT id, kind, shipper_order_id, latitude, longitude, radius_m, inside
+        FROM {SCHEMA}.geofences
+        WHERE driver_id = %s AND active
+          AND (inside OR (latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s))
+        ORDER BY id
+        FOR UPDATE
+    """, (driver_id, float(lat.min()) - margin_lat, float(lat.max()) + margin_lat,
+          float(lng.min()) - margin_lng, float(lng.max()) + margin_lng))
+    return cur.fetchall()
+
+
+def distances(lat: np.ndarray, lng: np.ndarray, fence_lat: np.ndarray, fence_lng: np.ndarray) -> np.ndarray:
+    '''
+    Матрица точки × зоны в метрах (равнопромежуточная проекция: на сотнях метров точна)
+    '''
+    d_lat = np.radians(lat[:, None] - fence_lat[None, :])
+    d_lng = np.radians(lng[:, None] - fence_lng[None, :]) * np.cos(np.radians(fence_lat))[None, :]
+    return EARTH_RADIUS_M * np.hypot(d_lat, d_lng)
+
+
+def presence(matrix: np.ndarray, radius: np.ndarray, initial: np.ndarray) -> np.ndarray:
+    '''
+    Нахождение в зоне после каждой точки. Между порогами входа и выхода состояние не
+    меняется: оно протягивается от последней точки, где было определено, или от initial
+    '''
+    inside = matrix <= radius[None, :]
+    outside = matrix > (radius * EXIT_FACTOR)[None, :]
+    decided = inside | outside
+
+    rows = np.arange(1, len(matrix) + 1)[:, None]
+    last = np.maximum.accumulate(np.where(decided, rows, 0), axis=0)
+    states = np.vstack((initial[None, :], inside))
+    return states[last, np.arange(matrix.shape[1])[None, :]]
+
+
+def evaluate(cur, driver_id: str, points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    '''
+    События входа и выхода по пачке (точки по возрастанию времени) в транзакции вызывающего
+    '''
+    lat = np.array([point['lat'] for point in points], dtype=np.float64)
+    lng = np.array([point['lng'] for point in points], dtype=np.float64)
+    fences = _load(cur, driver_id, lat, lng)
+    if not fences:
+        return []
+
+    initial = np.array([fence[6] for fence in fences], dtype=bool)
+    state = presence(
+        distances(lat, lng, np.array([fence[3] for fence in fences]), np.array([fence[4] for fence in fences])),
+        np.array([fence[5] for fence in fences], dtype=np.float64),
+        initial,
+    )
+    changes = np.vstack((initial[None, :], state))
+    steps, columns = np.nonzero(changes[1:] != changes[:-1])
+
+    events = []
+    for step, column in sorted(zip(steps.tolist(), columns.tolist())):
+        fence = fences[column]
+        events.append({
+            'geofence_id': fence[0],
+            'kind': fence[1],
+            'shipper_order_id': str(fence[2]),
+            'event': 'enter' if state[step, column] else 'exit',
+            'recorded_at': points[step]['recorded_at'],
+            'lat': points[step]['lat'],
+            'lng': points[step]['lng'],
+        })
+    if not events:
+        return []
+
+    execute_values(cur, f"""
+        INSERT INTO {SCHEMA}.geofence_events
+            (geofence_id, driver_id, shipper_order_id, kind, event, recorded_at, latitude, longitude)
+        VALUES %s
+    """, [(event['geofence_id'], driver_id, event['shipper_order_id'], event['kind'], event['event'],
+           event['recorded_at'], event['lat'], event['lng']) for event in events])
+
+    final = {fences[column][0]: (bool(state[-1, column]), points[-1]['recorded_at'])
+             for column in set(columns.tolist())}
+    execute_values(cur, f"""
+        UPDATE {SCHEMA}.geofences g SET inside = v.inside, changed_at = v.changed_at
+        FROM (VALUES %s) AS v(id, inside, changed_at)
+        WHERE g.id = v.id
+    """, [(fence_id, inside, changed_at) for fence_id, (inside, changed_at) in final.items()],
+        template='(%s, %s, %s::timestamp)')
+
+    _apply(cur, events)
+    return events
+
+
+def _apply(cur, events: List[Dict[str, Any]]):
+    '''
+    Переходы статусов заявки отправителя по событиям, в порядке времени
+    '''
+    for event in events:
+        if event['kind'] == 'pickup' and event['event'] == 'exit':
+            cur.execute(f"""
+                UPDATE {SCHEMA}.orders_shipper SET picked_up_at = %s, updated_at = NOW()
+                WHERE id = %s AND status = 'active' AND picked_up_at IS NULL
+            """, (event['recorded_at'], event['shipper_order_id']))
+        elif event['kind'] == 'warehouse' and event['event'] == 'enter':
+            cur.execute(f"""
+                UPDATE {SCHEMA}.orders_shipper SET status = 'completed', delivered_at = %s, updated_at = NOW()
+                WHERE id = %s AND status = 'active' AND picked_up_at IS NOT NULL
+                RETURNING id
+            """, (event['recorded_at'], event['shipper_order_id']))
+            if cur.fetchone():
+                cur.execute(f"""
+                    UPDATE {SCHEMA}.geofences SET active = FALSE
+                    WHERE shipper_order_id = %s AND active
+                """, (event['shipper_order_id'],))
+                print(f"[DEBUG] Shipper order {event['shipper_order_id']} delivered at {event['recorded_at']}")
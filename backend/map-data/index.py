@@ -1,30 +1,46 @@
-import json
 import os
 import psycopg2
+from datetime import datetime
 from typing import Dict, Any, List
 
+import db
+import tracking
+import geofence
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, HttpError
+
+CORS_HEADERS = cors_headers('GET, POST, OPTIONS', 'Content-Type, X-User-Id')
+
+db.register('update_driver_location', """
+    UPDATE t_p93479485_cargo_map_integratio.drivers
+    SET lat = $2, lng = $3, updated_at = CURRENT_TIMESTAMP
+    WHERE driver_id = $1
+""")
+
+db.register('update_driver_status', """
+    UPDATE t_p93479485_cargo_map_integratio.drivers
+    SET status = $2, updated_at = CURRENT_TIMESTAMP
+    WHERE driver_id = $1
+""")
+
+db.register('accept_cargo', """
+    UPDATE t_p93479485_cargo_map_integratio.cargo
+    SET status = 'accepted', driver_id = $2, updated_at = CURRENT_TIMESTAMP
+    WHERE cargo_id = $1
+""")
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Get real-time map data with cargo and drivers positions + user statistics
-    Args: event - dict with httpMethod (GET, POST, OPTIONS), path for /stats endpoint
+    Args: event - dict with httpMethod (GET, POST, OPTIONS), path for /stats endpoint,
+                  ?action=track&driver_id=... for a driver's location history
           context - object with request_id attribute
-    Returns: HTTP response with markers data or user statistics (updated)
+    Returns: HTTP response with markers data, user statistics or a driver track
     '''
     method: str = event.get('httpMethod', 'GET')
     path: str = event.get('path', '/')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
     database_url = os.environ.get('DATABASE_URL')
     
@@ -55,25 +71,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'verified': int(row[4]) if row[4] else 0
             }
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps(result),
-                'isBase64Encoded': False
-            }
+            return json_response(200, result)
         except Exception as e:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': str(e)}),
-                'isBase64Encoded': False
-            }
+            return error_response(500, str(e))
     
     database_url = os.environ.get('DATABASE_URL')
     
@@ -113,30 +113,30 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'phone': phone or '',
                     'carrierStatus': carrier_status,
                     'clientStatus': client_status,
-                    'clientReadyDate': client_ready_date.isoformat() if client_ready_date else None,
+                    'clientReadyDate': client_ready_date,
                     'vehicleStatus': carrier_status if carrier_status else 'free',
                     'readyStatus': 'ready' if client_status == 'ready_now' else 'scheduled'
                 })
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'markers': markers}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {'markers': markers})
         except Exception as e:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': str(e), 'markers': []}),
-                'isBase64Encoded': False
-            }
+            return error_response(500, str(e), markers=[])
+    
+    query_params = event.get('queryStringParameters') or {}
+    if method == 'GET' and query_params.get('action') == 'track':
+        conn = None
+        try:
+            conn = db.get_connection()
+            return json_response(200, tracking.track(conn, query_params))
+        except HttpError as e:
+            return error_response(e.status, e.message, success=False)
+        except Exception as e:
+            if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                db.discard_connection()
+            return error_response(500, str(e), success=False)
+        finally:
+            if conn is not None:
+                db.release(conn)
     
     if method == 'GET':
         try:
@@ -154,11 +154,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             """)
             cargo_rows = cur.fetchall()
             
-            # Get drivers (Simple Query Protocol - no parameters)
+            # Get drivers (Simple Query Protocol - no parameters).
+            # Свободное место берётся из остатка активной заявки перевозчика (capacity_ledger
+            # поддерживает его при назначении грузов): одна проба покрывающего индекса
+            # idx_orders_carrier_active_lookup на водителя; без заявки — прежний free_space
             cur.execute("""
-                SELECT driver_id, name, vehicle_type, capacity, lat, lng, status, vehicle_category,
-                       rating, free_space, destination_warehouse, phone
-                FROM t_p93479485_cargo_map_integratio.drivers
+                SELECT d.driver_id, d.name, d.vehicle_type, d.capacity, d.lat, d.lng, d.status, d.vehicle_category,
+                       d.rating, d.free_space, d.destination_warehouse, d.phone,
+                       o.capacity_boxes, o.capacity_pallets, o.remaining_boxes, o.remaining_pallets
+                FROM t_p93479485_cargo_map_integratio.drivers d
+                LEFT JOIN LATERAL (
+                    SELECT capacity_boxes, capacity_pallets, remaining_boxes, remaining_pallets
+                    FROM t_p93479485_cargo_map_integratio.orders_carrier
+                    WHERE user_id = d.driver_id AND status = 'active'
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                ) o ON TRUE
                 LIMIT 100
             """)
             driver_rows = cur.fetchall()
@@ -172,129 +183,103 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 markers.append({
                     'id': row[0],
                     'type': 'cargo',
-                    'lat': float(row[4]) if row[4] else 55.7558,
-                    'lng': float(row[5]) if row[5] else 37.6173,
+                    'lat': row[4] or 55.7558,
+                    'lng': row[5] or 37.6173,
                     'name': row[1] or 'Груз',
                     'details': f"{row[2] or 'Описание отсутствует'}, {row[3] or 0}кг",
                     'status': 'Ожидает',
-                    'cargoType': row[7] if row[7] else 'box',
-                    'readyStatus': row[8] if row[8] else 'ready',
-                    'readyTime': row[9].isoformat() if row[9] else None,
+                    'cargoType': row[7] or 'box',
+                    'readyStatus': row[8] or 'ready',
+                    'readyTime': row[9],
                     'quantity': int(row[10]) if row[10] else 0,
-                    'weight': float(row[3]) if row[3] else 0,
-                    'destinationWarehouse': row[11] if row[11] else 'Не указан',
-                    'clientAddress': row[12] if row[12] else 'Не указан',
-                    'clientRating': float(row[13]) if row[13] else 5.0
+                    'weight': row[3] or 0,
+                    'destinationWarehouse': row[11] or 'Не указан',
+                    'clientAddress': row[12] or 'Не указан',
+                    'clientRating': row[13] or 5.0
                 })
             
             for row in driver_rows:
                 vehicle_status = row[6] if row[6] in ['free', 'has_space', 'full'] else 'free'
+                free_space = row[9] or 0
+                if row[14] is not None:
+                    capacity = (row[12] or 0) + (row[13] or 0)
+                    free_space = row[14] + row[15]
+                    if free_space == 0:
+                        vehicle_status = 'full'
+                    elif free_space < capacity:
+                        vehicle_status = 'has_space'
+                    else:
+                        vehicle_status = 'free'
                 markers.append({
                     'id': row[0],
                     'type': 'driver',
-                    'lat': float(row[4]) if row[4] else 55.7558,
-                    'lng': float(row[5]) if row[5] else 37.6173,
+                    'lat': row[4] or 55.7558,
+                    'lng': row[5] or 37.6173,
                     'name': row[1] or 'Водитель',
                     'details': f"{row[2] or 'Грузовик'}, грузоподъёмность {row[3] or 0}т",
                     'status': 'Свободен' if row[6] == 'free' else 'Занят',
-                    'vehicleCategory': row[7] if row[7] else 'car',
+                    'vehicleCategory': row[7] or 'car',
                     'vehicleStatus': vehicle_status,
-                    'rating': float(row[8]) if row[8] else 5.0,
-                    'capacity': float(row[3]) if row[3] else 0,
-                    'freeSpace': float(row[9]) if row[9] else 0,
-                    'destinationWarehouse': row[10] if row[10] else 'Не указан',
-                    'phone': row[11] if row[11] else ''
+                    'rating': row[8] or 5.0,
+                    'capacity': row[3] or 0,
+                    'freeSpace': free_space,
+                    'freeBoxes': row[14],
+                    'freePallets': row[15],
+                    'destinationWarehouse': row[10] or 'Не указан',
+                    'phone': row[11] or ''
                 })
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'markers': markers}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {'markers': markers})
         except Exception as e:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': str(e), 'markers': []}),
-                'isBase64Encoded': False
-            }
+            return error_response(500, str(e), markers=[])
     
     if method == 'POST':
+        conn = None
         try:
-            body_data = json.loads(event.get('body', '{}'))
+            body_data = parse_body(event)
             action = body_data.get('action')
             
-            conn = psycopg2.connect(database_url)
+            conn = db.get_connection()
             cur = conn.cursor()
+            result: Dict[str, Any] = {'success': True}
             
             if action == 'update_location':
                 user_id = body_data.get('user_id', '')
-                lat = body_data.get('lat', 0)
-                lng = body_data.get('lng', 0)
+                if not user_id:
+                    raise HttpError(400, 'user_id is required')
+                points = tracking.parse_points(body_data, datetime.utcnow())
                 
-                # Simple Query - embed values directly
-                cur.execute(f"""
-                    UPDATE t_p93479485_cargo_map_integratio.drivers 
-                    SET lat = {lat}, lng = {lng}, updated_at = CURRENT_TIMESTAMP 
-                    WHERE driver_id = '{user_id}'
-                """)
+                if points:
+                    # Сначала история: при отсутствии секции append откатывает транзакцию и повторяет вставку
+                    tracking.append(conn, cur, user_id, points)
+                    db.execute(cur, 'update_driver_location', (user_id, points[-1]['lat'], points[-1]['lng']))
+                    # Входы и выходы из геозон назначенных грузов — в той же транзакции, что и точки
+                    result['geofence_events'] = geofence.evaluate(cur, user_id, points)
                 
             elif action == 'update_status':
                 user_id = body_data.get('user_id', '')
                 status = body_data.get('status', 'free')
                 
-                # Simple Query - embed values directly
-                cur.execute(f"""
-                    UPDATE t_p93479485_cargo_map_integratio.drivers 
-                    SET status = '{status}', updated_at = CURRENT_TIMESTAMP 
-                    WHERE driver_id = '{user_id}'
-                """)
+                db.execute(cur, 'update_driver_status', (user_id, status))
                 
             elif action == 'accept_cargo':
                 cargo_id = body_data.get('cargo_id', '')
                 driver_id = body_data.get('driver_id', '')
                 
-                # Simple Query - embed values directly
-                cur.execute(f"""
-                    UPDATE t_p93479485_cargo_map_integratio.cargo 
-                    SET status = 'accepted', driver_id = '{driver_id}', updated_at = CURRENT_TIMESTAMP 
-                    WHERE cargo_id = '{cargo_id}'
-                """)
+                db.execute(cur, 'accept_cargo', (cargo_id, driver_id))
             
             conn.commit()
             cur.close()
-            conn.close()
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'success': True}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, result)
+        except HttpError as e:
+            return error_response(e.status, e.message, success=False)
         except Exception as e:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': str(e), 'success': False}),
-                'isBase64Encoded': False
-            }
+            if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                db.discard_connection()
+            return error_response(500, str(e), success=False)
+        finally:
+            if conn is not None:
+                db.release(conn)
     
-    return {
-        'statusCode': 405,
-        'headers': {'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    return error_response(405, 'Method not allowed')
\ No newline at end of file
@@ -0,0 +1,129 @@
+'''
+История координат водителей в driver_locations, секционированной по суткам (UTC) по
+recorded_at. Строки только добавляются, старые сутки удаляются целой секцией (DROP TABLE),
+а не DELETE. Секции создаются заранее задачей rotate_driver_locations (db-maintenance);
+если запись пришла в сутки без секции, map-data создаёт её сама и повторяет вставку.
+Общий модуль map-data и db-maintenance
+'''
+
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List
+
+from psycopg2 import errors
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+TABLE = 'driver_locations'
+
+# Сколько суток истории храним и на сколько суток вперёд готовим секции
+RETENTION_DAYS = int(os.environ.get('LOCATION_RETENTION_DAYS', 30))
+PARTITIONS_AHEAD = 2
+
+# Пространство ключей advisory lock (purge.py — 41001, verify-license — 44001)
+PARTITION_LOCK_NAMESPACE = 48001
+
+# DROP секции берёт блокировку родительской таблицы: не ждём дольше, чтобы не задерживать запись
+DROP_LOCK_TIMEOUT_MS = 2000
+
+PARTITION_RE = re.compile(rf'^{TABLE}_(\d{{8}})$')
+
+
+def partition_name(day: date) -> str:
+    return f"{TABLE}_{day:%Y%m%d}"
+
+
+def _partitions(cur) -> List[str]:
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (f"{SCHEMA}.{TABLE}",))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _bound(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+def ensure_partitions(cur, days: Iterable[date]) -> List[str]:
+    '''
+    Создаёт недостающие суточные секции; возвращает имена созданных.
+    Advisory lock до конца транзакции вызывающего: параллельные вызовы не создают одну секцию дважды
+    '''
+    cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (PARTITION_LOCK_NAMESPACE, TABLE))
+    existing = set(_partitions(cur))
+
+    created = []
+    for day in sorted(set(days)):
+        name = partition_name(day)
+        if name in existing:
+            continue
+        cur.execute(f"""
+            CREATE TABLE {SCHEMA}.{name} PARTITION OF {SCHEMA}.{TABLE}
+            FOR VALUES FROM (%s) TO (%s)
+        """, (_bound(day), _bound(day + timedelta(days=1))))
+        created.append(name)
+    return created
+
+
+def drop_expired(conn, today: date, retention_days: int = RETENTION_DAYS) -> Dict[str, Any]:
+    '''
+    Удаляет секции за сутки старше retention_days, каждую в своей транзакции.
+    Если родительская таблица занята дольше DROP_LOCK_TIMEOUT_MS, остаток ждёт следующего запуска
+    '''
+    cutoff = today - timedelta(days=retention_days)
+    dropped = []
+    with conn.cursor() as cur:
+        expired = [
+            name for name in _partitions(cur)
+            if PARTITION_RE.match(name) and datetime.strptime(name[-8:], '%Y%m%d').date() < cutoff
+        ]
+        conn.commit()
+        for name in expired:
+            try:
+                cur.execute("SET LOCAL lock_timeout = %s", (DROP_LOCK_TIMEOUT_MS,))
+                cur.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{name}")
+                conn.commit()
+            except errors.LockNotAvailable:
+                conn.rollback()
+                return {'dropped': dropped, 'complete': False}
+            dropped.append(name)
+    return {'dropped': dropped, 'complete': True}
+
+
+def rotate(conn, today: date) -> Dict[str, Any]:
+    '''
+    Секции на сегодня и PARTITIONS_AHEAD суток вперёд плюс удаление просроченных
+    '''
+    with conn.cursor() as cur:
+        created = ensure_partitions(cur, (today + timedelta(days=offset) for offset in range(PARTITIONS_AHEAD + 1)))
+    conn.commit()
+    return {'created': created, **drop_expired(conn, today)}
+
+
+def track(cur, driver_id: str, since: datetime, until: datetime, limit: int) -> Dict[str, Any]:
+    '''
+    Точки водителя за [since, until) по возрастанию времени, столбцами:
+    t — секунды от начала трека, lat/lng — координаты. Читаются только секции нужных суток
+    '''
+    cur.execute(f"""
+        SELECT recorded_at, lat, lng FROM {SCHEMA}.{TABLE}
+        WHERE driver_id = %s AND recorded_at >= %s AND recorded_at < %s
+        ORDER BY recorded_at
+        LIMIT %s
+    """, (driver_id, since, until, limit + 1))
+    rows = cur.fetchall()
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+
+    start = rows[0][0] if rows else since
+    return {
+        'driver_id': driver_id,
+        'start': start,
+        'points': len(rows),
+        'truncated': truncated,
+        't': [round((row[0] - start).total_seconds(), 3) for row in rows],
+        'lat': [row[1] for row in rows],
+        'lng': [row[2] for row in rows],
+    }
@@ -0,0 +1,156 @@
+'''
+Приём координат водителя и трек за период. update_location принимает одну точку (lat, lng)
+или пачку points, накопленную клиентом без связи: последняя точка обновляет drivers,
+все точки дописываются в историю driver_locations одной вставкой
+'''
+
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from psycopg2 import errors
+
+import db
+import location_history
+import trajectory
+from http_helpers import HttpError
+
+MAX_POINTS_PER_BATCH = 500
+
+# Точки старше суток не принимаем (секция могла быть удалена), из будущего — прижимаем к «сейчас»
+MAX_POINT_AGE = timedelta(hours=24)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+DEFAULT_TRACK_HOURS = 24
+MAX_TRACK_HOURS = 72
+# Сырой ответ — около 45 байт JSON на точку, 50 000 точек — уже пара мегабайт
+MAX_TRACK_POINTS = 50000
+# С encoding=polyline точки упрощаются на сервере, поэтому читаем сутки при отправке
+# раз в секунду (86 400 точек) целиком
+MAX_POLYLINE_TRACK_POINTS = 100000
+
+# encoding=polyline: допуск упрощения по умолчанию и верхние границы параметров
+DEFAULT_TOLERANCE_M = 10
+MAX_TOLERANCE_M = 1000
+MAX_BUCKET_S = 3600
+
+db.register('append_driver_locations', """
+    INSERT INTO t_p93479485_cargo_map_integratio.driver_locations
+        (driver_id, recorded_at, lat, lng, accuracy, speed, heading)
+    SELECT $1, * FROM unnest($2::timestamp[], $3::float8[], $4::float8[], $5::real[], $6::real[], $7::real[])
+""")
+
+
+def _number(value: Any, name: str, low: float, high: float, required: bool = True) -> Optional[float]:
+    if value is None or value == '':
+        if required:
+            raise HttpError(400, f'{name} is required')
+        return None
+    if isinstance(value, bool):
+        raise HttpError(400, f'{name} must be a number')
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f'{name} must be a number')
+    if not math.isfinite(result) or not low <= result <= high:
+        raise HttpError(400, f'{name} must be between {low:g} and {high:g}')
+    return result
+
+
+def parse_time(value: Any, name: str) -> datetime:
+    '''
+    Время в UTC без таймзоны: число — миллисекунды эпохи (position.timestamp), строка — ISO 8601.
+    Строка из цифр — тоже миллисекунды: так приходят from/to в query-параметрах ?action=track
+    '''
+    try:
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc).replace(tzinfo=None)
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise HttpError(400, f'{name} must be epoch milliseconds or ISO 8601')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_points(body: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    '''
+    Точки по возрастанию времени; слишком старые отбрасываются
+    '''
+    raw = body.get('points')
+    if raw is None:
+        raw = [{'lat': body.get('lat'), 'lng': body.get('lng')}]
+    if not isinstance(raw, list) or not raw:
+        raise HttpError(400, 'points must be a non-empty list')
+    if len(raw) > MAX_POINTS_PER_BATCH:
+        raise HttpError(400, f'Не больше {MAX_POINTS_PER_BATCH} точек за запрос')
+
+    points = []
+    for index, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise HttpError(400, f'points[{index}] must be an object')
+        recorded_at = now
+        if item.get('recorded_at') not in (None, ''):
+            recorded_at = min(parse_time(item['recorded_at'], f'points[{index}].recorded_at'), now + MAX_CLOCK_SKEW)
+        if recorded_at < now - MAX_POINT_AGE:
+            continue
+        points.append({
+            'recorded_at': min(recorded_at, now),
+            'lat': _number(item.get('lat'), f'points[{index}].lat', -90, 90),
+            'lng': _number(item.get('lng'), f'points[{index}].lng', -180, 180),
+            'accuracy': _number(item.get('accuracy'), f'points[{index}].accuracy', 0, 1e6, required=False),
+            'speed': _number(item.get('speed'), f'points[{index}].speed', 0, 1e4, required=False),
+            'heading': _number(item.get('heading'), f'points[{index}].heading', 0, 360, required=False),
+        })
+    points.sort(key=lambda point: point['recorded_at'])
+    return points
+
+
+def append(conn, cur, driver_id: str, points: List[Dict[str, Any]]):
+    '''
+    Дописывает точки в историю в транзакции вызывающего. Если суточной секции ещё нет,
+    создаёт её и повторяет вставку — поэтому перед вызовом не должно быть незакоммиченных изменений
+    '''
+    params = (driver_id, *([point[column] for point in points]
+                           for column in ('recorded_at', 'lat', 'lng', 'accuracy', 'speed', 'heading')))
+    try:
+        db.execute(cur, 'append_driver_locations', params)
+    except errors.CheckViolation:
+        # no partition of relation found for row
+        conn.rollback()
+        created = location_history.ensure_partitions(cur, (point['recorded_at'].date() for point in points))
+        print(f"[DEBUG] Created location partitions on write: {created}")
+        db.execute(cur, 'append_driver_locations', params)
+
+
+def track(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    driver_id = query_params.get('driver_id')
+    if not driver_id:
+        raise HttpError(400, 'driver_id is required')
+
+    now = datetime.utcnow()
+    until = parse_time(query_params['to'], 'to') if query_params.get('to') else now
+    since = (parse_time(query_params['from'], 'from') if query_params.get('from')
+             else until - timedelta(hours=DEFAULT_TRACK_HOURS))
+    if since >= until:
+        raise HttpError(400, 'from must be earlier than to')
+    if until - since > timedelta(hours=MAX_TRACK_HOURS):
+        raise HttpError(400, f'Период трека не больше {MAX_TRACK_HOURS} часов')
+
+    encoding = query_params.get('encoding') or 'raw'
+    if encoding not in ('raw', 'polyline'):
+        raise HttpError(400, 'encoding must be raw or polyline')
+    max_points = MAX_POLYLINE_TRACK_POINTS if encoding == 'polyline' else MAX_TRACK_POINTS
+    limit = int(_number(query_params.get('limit'), 'limit', 1, max_points, required=False) or max_points)
+    tolerance_m = _number(query_params.get('tolerance_m'), 'tolerance_m', 0, MAX_TOLERANCE_M, required=False)
+    bucket_s = _number(query_params.get('bucket_s'), 'bucket_s', 0, MAX_BUCKET_S, required=False) or 0
+
+    with conn.cursor() as cur:
+        result = location_history.track(cur, driver_id, since, until, limit)
+    if encoding == 'polyline':
+        # Сотни килобайт сырых точек за сутки превращаются в единицы килобайт
+        result = trajectory.compact(result, DEFAULT_TOLERANCE_M if tolerance_m is None else tolerance_m, bucket_s)
+    result['success'] = True
+    return result
@@ -0,0 +1,191 @@
+'''
+Упрощение и компактная выдача треков водителей. Суточный трек при отправке раз в секунду —
+86 400 точек, поэтому перед выдачей он прореживается: сначала по времени (не больше одной
+точки на интервал bucket_s), затем алгоритмом Дугласа — Пекера с допуском tolerance_m
+в метрах. Оба шага векторизованы на NumPy, цикла по точкам нет. Координаты кодируются в Google Encoded Polyline
+(точность 1e-5, около метра), время — целыми секундами с дельта-кодированием
+'''
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+POLYLINE_PRECISION = 1e5
+
+# Разность координат в единицах 1e-5 градуса после zigzag меньше 2^27: хватает 7 групп по 5 бит
+_CHUNK_SHIFTS = np.arange(7, dtype=np.int64) * 5
+
+
+def bucket(t: np.ndarray, bucket_s: float) -> np.ndarray:
+    '''
+    Индексы точек, оставляющие первую точку каждого интервала bucket_s и последнюю точку трека
+    '''
+    if len(t) == 0 or bucket_s <= 0:
+        return np.arange(len(t))
+    slots = np.floor(t / bucket_s).astype(np.int64)
+    keep = np.empty(len(t), dtype=bool)
+    keep[0] = True
+    keep[1:] = slots[1:] != slots[:-1]
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+def _project(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    '''
+    Равнопромежуточная проекция вокруг средней широты: на длине трека ошибка доли процента
+    '''
+    origin = np.radians(np.mean(lat))
+    return np.column_stack((
+        np.radians(lng) * np.cos(origin) * EARTH_RADIUS_M,
+        np.radians(lat) * EARTH_RADIUS_M,
+    ))
+
+
+def douglas_peucker(lat: np.ndarray, lng: np.ndarray, tolerance_m: float) -> np.ndarray:
+    '''
+    Индексы точек, оставшихся после упрощения с допуском tolerance_m. Вместо рекурсии по
+    отрезкам все отрезки одного уровня делятся за один проход: каждая ещё не решённая точка
+    знает границы своего отрезка, расстояния до хорд считаются одним векторным выражением,
+    а максимум по отрезку — через reduceat. Проходов столько, какова глубина рекурсии
+    '''
+    count = len(lat)
+    if count < 3 or tolerance_m <= 0:
+        return np.arange(count)
+
+    points = _project(lat, lng)
+    x, y = np.ascontiguousarray(points[:, 0]), np.ascontiguousarray(points[:, 1])
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Нерешённые точки по возрастанию и границы их отрезков
+    inner = np.arange(1, count - 1)
+    first = np.zeros(len(inner), dtype=np.int64)
+    last = np.full(len(inner), count - 1, dtype=np.int64)
+
+    while len(inner):
+        start_x, start_y = x[first], y[first]
+        chord_x, chord_y = x[last] - start_x, y[last] - start_y
+        offset_x, offset_y = x[inner] - start_x, y[inner] - start_y
+        length = np.hypot(chord_x, chord_y)
+        closed = length == 0
+        length[closed] = 1
+        distances = np.abs(chord_x * offset_y - chord_y * offset_x) / length
+        if closed.any():
+            # Замкнутый отрезок (стоянка): расстояние до точки, а не до прямой
+            distances[closed] = np.hypot(offset_x[closed], offset_y[closed])
+
+        new_segment = np.empty(len(inner), dtype=bool)
+        new_segment[0] = True
+        new_segment[1:] = first[1:] != first[:-1]
+        segment = np.cumsum(new_segment) - 1
+        farthest = np.maximum.reduceat(distances, np.flatnonzero(new_segment))
+
+        # Первая точка с максимальным расстоянием в каждом отрезке, как у argmax
+        candidates = np.flatnonzero(distances == farthest[segment])
+        first_candidate = np.empty(len(candidates), dtype=bool)
+        first_candidate[0] = True
+        first_candidate[1:] = segment[candidates[1:]] != segment[candidates[:-1]]
+        split = np.full(len(farthest), -1, dtype=np.int64)
+        split[segment[candidates[first_candidate]]] = inner[candidates[first_candidate]]
+
+        splitting = farthest > tolerance_m
+        if not splitting.any():
+            break
+        keep[split[splitting]] = True
+
+        at = split[segment]
+        active = splitting[segment] & (inner != at)
+        first = np.where(inner > at, at, first)[active]
+        last = np.where(inner < at, at, last)[active]
+        inner = inner[active]
+
+    return np.flatnonzero(keep)
+
+
+def encode_polyline(lat: np.ndarray, lng: np.ndarray) -> str:
+    '''
+    Google Encoded Polyline: разности округлённых координат, zigzag, группы по 5 бит с битом
+    продолжения. Все шаги — операции над массивами, цикла по точкам нет
+    '''
+    if len(lat) == 0:
+        return ''
+    scaled = np.column_stack((
+        np.round(np.asarray(lat, dtype=np.float64) * POLYLINE_PRECISION),
+        np.round(np.asarray(lng, dtype=np.float64) * POLYLINE_PRECISION),
+    )).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = (deltas << 1) ^ (deltas >> 63)
+
+    chunks = (values[:, None] >> _CHUNK_SHIFTS) & 0x1f
+    lengths = 1 + (values[:, None] >= (np.int64(1) << _CHUNK_SHIFTS[1:])).sum(axis=1)
+    present = _CHUNK_SHIFTS[None, :] < (lengths[:, None] * 5)
+    continued = _CHUNK_SHIFTS[None, :] < ((lengths[:, None] - 1) * 5)
+    codes = chunks + np.where(continued, 0x20, 0) + 63
+    return codes[present].astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode_polyline(encoded: str) -> List[List[float]]:
+    '''
+    Обратное преобразование — для проверки и скриптов; клиент декодирует сам
+    '''
+    coordinates: List[List[float]] = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        pair = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            pair.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += pair[0]
+        lng += pair[1]
+        coordinates.append([lat / POLYLINE_PRECISION, lng / POLYLINE_PRECISION])
+    return coordinates
+
+
+def delta_encode(values: Sequence[float]) -> List[int]:
+    '''
+    Целые секунды: первое значение как есть, дальше разности с предыдущим
+    '''
+    rounded = np.round(np.asarray(values, dtype=np.float64)).astype(np.int64)
+    return np.diff(rounded, prepend=0).tolist()
+
+
+def simplify(t: Sequence[float], lat: Sequence[float], lng: Sequence[float],
+             tolerance_m: float = 0, bucket_s: float = 0) -> np.ndarray:
+    '''
+    Индексы точек исходного трека после прореживания по времени и упрощения формы
+    '''
+    t = np.asarray(t, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+
+    selected = bucket(t, bucket_s)
+    kept = douglas_peucker(lat[selected], lng[selected], tolerance_m)
+    return selected[kept]
+
+
+def compact(track: Dict[str, Any], tolerance_m: float = 0, bucket_s: float = 0) -> Dict[str, Any]:
+    '''
+    Трек из location_history.track в виде polyline + дельты времени
+    '''
+    t = np.asarray(track['t'], dtype=np.float64)
+    lat = np.asarray(track['lat'], dtype=np.float64)
+    lng = np.asarray(track['lng'], dtype=np.float64)
+    kept = simplify(t, lat, lng, tolerance_m, bucket_s)
+
+    result = {key: value for key, value in track.items() if key not in ('t', 'lat', 'lng')}
+    result.update({
+        'encoding': 'polyline',
+        'source_points': track['points'],
+        'points': int(len(kept)),
+        'polyline': encode_polyline(lat[kept], lng[kept]),
+        't': delta_encode(t[kept]),
+    })
+    return result
@@ -0,0 +1,211 @@
+'''
+Учёт вместимости заявок перевозчиков. Назначение груза отправителя на заявку перевозчика
+уменьшает remaining_boxes / remaining_pallets условным UPDATE (... WHERE remaining >= n):
+параллельные назначения на одну заявку выстраиваются на блокировке её строки, и каждое
+перепроверяет остаток после ожидания, поэтому место не продаётся дважды. Каждое движение
+пишется в capacity_ledger в той же транзакции, там же создаются и выключаются геозоны груза.
+Все операции сначала блокируют строку заявки перевозчика, затем строки грузов: назначение,
+снятие и удаление любой из заявок не ждут друг друга по кругу, а удаление заявки
+перевозчика не пропускает груз, который назначается в этот же момент
+'''
+
+from typing import Any, Dict, Optional
+
+import geofences
+from http_helpers import HttpError
+
+# Тип груза -> столбец остатка в orders_carrier
+REMAINING = {
+    'box': 'remaining_boxes',
+    'pallet': 'remaining_pallets',
+}
+
+
+def _ledger(cur, kind: str, carrier_order_id, shipper_order_id, cargo_type: str, delta: int, user_id: str):
+    cur.execute('''
+        INSERT INTO capacity_ledger (carrier_order_id, shipper_order_id, kind, cargo_type, delta, user_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    ''', (carrier_order_id, shipper_order_id, kind, cargo_type, delta, user_id))
+
+
+def _remaining(row) -> Dict[str, int]:
+    return {'remaining_boxes': row[0], 'remaining_pallets': row[1]}
+
+
+def restore(cur, carrier_order_id, shipper_order_id, cargo_type: str, quantity: int,
+            user_id: str) -> Optional[Dict[str, int]]:
+    '''
+    Возвращает место груза в заявку перевозчика и выключает его геозоны; None, если заявки уже нет
+    '''
+    column = REMAINING[cargo_type]
+    cur.execute(f'''
+        UPDATE orders_carrier
+        SET {column} = {column} + %s, updated_at = NOW()
+        WHERE id = %s
+        RETURNING remaining_boxes, remaining_pallets
+    ''', (quantity, carrier_order_id))
+    row = cur.fetchone()
+    _ledger(cur, 'release', carrier_order_id, shipper_order_id, cargo_type, quantity, user_id)
+    geofences.deactivate(cur, [shipper_order_id])
+    return _remaining(row) if row else None
+
+
+def _lock_assigned_carrier(cur, shipper_order_id: str) -> Optional[tuple]:
+    '''
+    Блокирует заявку перевозчика, на которую назначен груз. Возвращает (carrier_order_id,)
+    или None, если груза нет; carrier_order_id — None у неназначенного груза.
+    Назначение могло смениться до блокировки — вызывающий проверяет его в своём UPDATE/DELETE
+    '''
+    cur.execute('SELECT carrier_order_id FROM orders_shipper WHERE id = %s', (shipper_order_id,))
+    row = cur.fetchone()
+    if row and row[0]:
+        cur.execute('SELECT 1 FROM orders_carrier WHERE id = %s FOR UPDATE', (row[0],))
+    return row
+
+
+def close(cur, user_id: str, carrier_order_id: str) -> bool:
+    '''
+    Закрывает заявку перевозчика перед удалением. Блокировка строки дожидается назначений,
+    которые уже держат заявку, а новые не проходят проверку status = 'active' в reserve
+    '''
+    cur.execute('''
+        UPDATE orders_carrier SET status = 'closed', updated_at = NOW()
+        WHERE id = %s AND user_id = %s
+        RETURNING id
+    ''', (carrier_order_id, user_id))
+    return cur.fetchone() is not None
+
+
+def detach(cur, user_id: str, carrier_order_id: str) -> int:
+    '''
+    Возвращает грузы закрытой (close) заявки перевозчика в ожидание. Вызывается отдельным
+    запросом после close: в его снимке уже видны назначения, завершившиеся за время ожидания
+    '''
+    cur.execute('''
+        WITH released AS (
+            UPDATE orders_shipper
+            SET carrier_order_id = NULL, status = 'pending', updated_at = NOW()
+            WHERE carrier_order_id = %(order_id)s
+            RETURNING id, cargo_type, quantity
+        )
+        INSERT INTO capacity_ledger (carrier_order_id, shipper_order_id, kind, cargo_type, delta, user_id)
+        SELECT %(order_id)s, id, 'release', cargo_type, quantity, %(user_id)s FROM released
+        RETURNING shipper_order_id
+    ''', {'order_id': carrier_order_id, 'user_id': user_id})
+    released = [row[0] for row in cur.fetchall()]
+    geofences.deactivate(cur, released)
+    return len(released)
+
+
+def remove(cur, user_id: str, shipper_order_id: str) -> Optional[tuple]:
+    '''
+    Удаляет заявку отправителя и возвращает место в заявку перевозчика, на которую был назначен груз.
+    None — заявки нет или она чужая
+    '''
+    assigned = _lock_assigned_carrier(cur, shipper_order_id)
+    if not assigned:
+        return None
+    cur.execute('''
+        DELETE FROM orders_shipper
+        WHERE id = %s AND user_id = %s AND carrier_order_id IS NOT DISTINCT FROM %s
+        RETURNING id, carrier_order_id, cargo_type, quantity
+    ''', (shipper_order_id, user_id, assigned[0]))
+    deleted = cur.fetchone()
+    if not deleted:
+        cur.execute('SELECT 1 FROM orders_shipper WHERE id = %s AND user_id = %s', (shipper_order_id, user_id))
+        if cur.fetchone():
+            raise HttpError(409, 'Груз только что назначен или снят, повторите удаление')
+        return None
+    if deleted[1]:
+        restore(cur, deleted[1], deleted[0], deleted[2], deleted[3], user_id)
+    return deleted
+
+
+def reserve(conn, user_id: str, carrier_order_id: str, shipper_order_id: str) -> Dict[str, Any]:
+    '''
+    Назначает груз отправителя на активную заявку перевозчика user_id
+    '''
+    cur = conn.cursor()
+    try:
+        cur.execute('''
+            SELECT 1 FROM orders_carrier
+            WHERE id = %s AND user_id = %s AND status = 'active'
+            FOR UPDATE
+        ''', (carrier_order_id, user_id))
+        if not cur.fetchone():
+            raise HttpError(409, 'Заявка перевозчика не найдена или закрыта')
+
+        cur.execute('''
+            UPDATE orders_shipper
+            SET carrier_order_id = %s, status = 'active', updated_at = NOW()
+            WHERE id = %s AND status = 'pending' AND carrier_order_id IS NULL
+            RETURNING cargo_type, quantity
+        ''', (carrier_order_id, shipper_order_id))
+        cargo = cur.fetchone()
+        if not cargo:
+            raise HttpError(409, 'Груз не найден или уже назначен')
+        cargo_type, quantity = cargo
+
+        column = REMAINING[cargo_type]
+        cur.execute(f'''
+            UPDATE orders_carrier
+            SET {column} = {column} - %s, updated_at = NOW()
+            WHERE id = %s AND {column} >= %s
+            RETURNING remaining_boxes, remaining_pallets
+        ''', (quantity, carrier_order_id, quantity))
+        row = cur.fetchone()
+        if not row:
+            raise HttpError(409, 'В заявке перевозчика недостаточно места')
+
+        _ledger(cur, 'reserve', carrier_order_id, shipper_order_id, cargo_type, -quantity, user_id)
+        geofences.create(cur, carrier_order_id, shipper_order_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    print(f"[DEBUG] Reserved {quantity} {cargo_type} of {carrier_order_id} for {shipper_order_id}")
+    return {
+        'success': True,
+        'carrier_order_id': carrier_order_id,
+        'shipper_order_id': shipper_order_id,
+        **_remaining(row),
+    }
+
+
+def release(conn, user_id: str, shipper_order_id: str) -> Dict[str, Any]:
+    '''
+    Снимает груз с заявки перевозчика: может перевозчик этой заявки или владелец груза
+    '''
+    cur = conn.cursor()
+    try:
+        assigned = _lock_assigned_carrier(cur, shipper_order_id)
+        cur.execute('''
+            UPDATE orders_shipper s
+            SET carrier_order_id = NULL, status = 'pending', updated_at = NOW()
+            FROM orders_carrier c
+            WHERE s.id = %s AND s.carrier_order_id = %s AND c.id = s.carrier_order_id
+              AND (s.user_id = %s OR c.user_id = %s)
+            RETURNING c.id, s.cargo_type, s.quantity
+        ''', (shipper_order_id, assigned[0] if assigned else None, user_id, user_id))
+        row = cur.fetchone()
+        if not row:
+            raise HttpError(404, 'Назначение не найдено')
+        carrier_order_id, cargo_type, quantity = row
+
+        remaining = restore(cur, carrier_order_id, shipper_order_id, cargo_type, quantity, user_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return {
+        'success': True,
+        'carrier_order_id': str(carrier_order_id),
+        'shipper_order_id': shipper_order_id,
+        **(remaining or {}),
+    }
@@ -0,0 +1,224 @@
+'''
+Поиск открытых заявок вокруг точки: перевозчик ищет грузы, отправитель — машины.
+Кандидаты отбираются по bounding box (индекс по latitude, longitude), точное расстояние
+считается по формуле гаверсинуса. Если при миграции был доступен PostGIS и создан
+GiST-индекс по geography, используется ST_DWithin. Страницы — keyset по (distance_km, id).
+Заявки перевозчиков можно отфильтровать по свободному месту (boxes, pallets): остаток
+хранится в самой заявке (capacity.py), соединять с назначенными грузами не нужно
+'''
+
+import math
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from http_helpers import HttpError
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_RADIUS_KM = 20.0
+MAX_RADIUS_KM = 500.0
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+# Что ищем -> таблица, открытые статусы, отдаваемые столбцы и GiST-индекс (если есть PostGIS)
+TARGETS: Dict[str, Dict[str, Any]] = {
+    'shipper': {
+        'table': 'orders_shipper',
+        'statuses': "status IN ('pending', 'active')",
+        'columns': ['id', 'cargo_type', 'quantity', 'warehouse_marketplace', 'warehouse_city',
+                    'warehouse_address', 'pickup_address', 'pickup_date', 'pickup_time',
+                    'latitude', 'longitude', 'status', 'created_at'],
+        'gist_index': 'idx_orders_shipper_open_geog',
+    },
+    'carrier': {
+        'table': 'orders_carrier',
+        'statuses': "status = 'active'",
+        'columns': ['id', 'warehouse_marketplace', 'warehouse_city', 'warehouse_address',
+                    'capacity_boxes', 'capacity_pallets', 'remaining_boxes', 'remaining_pallets',
+                    'latitude', 'longitude', 'status', 'created_at'],
+        'gist_index': 'idx_orders_carrier_active_geog',
+        # Параметр запроса -> столбец остатка
+        'remaining': {'boxes': 'remaining_boxes', 'pallets': 'remaining_pallets'},
+    },
+}
+
+HAVERSINE_KM = f"""
+    2 * {EARTH_RADIUS_KM} * ASIN(SQRT(
+        POWER(SIN(RADIANS(latitude - %(lat)s) / 2), 2) +
+        COS(RADIANS(%(lat)s)) * COS(RADIANS(latitude)) * POWER(SIN(RADIANS(longitude - %(lng)s) / 2), 2)
+    ))
+"""
+
+# Выражение должно совпадать с выражением GiST-индекса из V0036, иначе индекс не используется
+GEOGRAPHY = "(ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326)::geography)"
+ORIGIN = "(ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography)"
+
+# Наличие GiST-индексов проверяется один раз на тёплый экземпляр
+_gist_available: Dict[str, bool] = {}
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    '''
+    Прямоугольник, гарантированно содержащий круг радиуса radius_km.
+    У полюсов и через 180-й меридиан долгота не ограничивается
+    '''
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    delta_lng = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def parse_search_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    def number(name: str, default: Optional[float] = None) -> float:
+        value = params.get(name)
+        if value in (None, ''):
+            if default is None:
+                raise HttpError(400, f'{name} is required')
+            return default
+        try:
+            result = float(value)
+        except (TypeError, ValueError):
+            raise HttpError(400, f'{name} must be a number')
+        if not math.isfinite(result):
+            raise HttpError(400, f'{name} must be a number')
+        return result
+
+    lat, lng = number('lat'), number('lng')
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise HttpError(400, 'lat/lng out of range')
+
+    radius_km = number('radius_km', DEFAULT_RADIUS_KM)
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise HttpError(400, f'radius_km must be between 0 and {MAX_RADIUS_KM:.0f}')
+
+    need = {}
+    for name in ('boxes', 'pallets'):
+        if params.get(name) not in (None, ''):
+            value = number(name)
+            if value < 0 or value != int(value):
+                raise HttpError(400, f'{name} must be a non-negative integer')
+            need[name] = int(value)
+
+    limit = int(number('limit', DEFAULT_LIMIT))
+    if not 1 <= limit <= MAX_LIMIT:
+        raise HttpError(400, f'limit must be between 1 and {MAX_LIMIT}')
+
+    after = None
+    cursor = params.get('cursor')
+    if cursor:
+        distance, _, order_id = str(cursor).partition('_')
+        try:
+            after = (float(distance), str(uuid.UUID(order_id)))
+        except ValueError:
+            raise HttpError(400, 'Invalid cursor')
+
+    return {
+        'lat': lat,
+        'lng': lng,
+        'radius_km': radius_km,
+        'limit': limit,
+        'marketplace': params.get('marketplace') or None,
+        'need': need,
+        'after': after,
+    }
+
+
+def gist_available(cur, target: Dict[str, Any]) -> bool:
+    index_name = target['gist_index']
+    if index_name not in _gist_available:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{SCHEMA}.{index_name}",))
+        _gist_available[index_name] = cur.fetchone()[0]
+    return _gist_available[index_name]
+
+
+def build_query(target: Dict[str, Any], search: Dict[str, Any], use_gist: bool) -> Tuple[str, Dict[str, Any]]:
+    min_lat, max_lat, min_lng, max_lng = bounding_box(search['lat'], search['lng'], search['radius_km'])
+    params = {
+        'lat': search['lat'],
+        'lng': search['lng'],
+        'radius_km': search['radius_km'],
+        'radius_m': search['radius_km'] * 1000,
+        'min_lat': min_lat,
+        'max_lat': max_lat,
+        'min_lng': min_lng,
+        'max_lng': max_lng,
+        'marketplace': search['marketplace'],
+        'limit': search['limit'],
+    }
+
+    if use_gist:
+        distance = f"ST_Distance({GEOGRAPHY}, {ORIGIN}) / 1000"
+        area = f"ST_DWithin({GEOGRAPHY}, {ORIGIN}, %(radius_m)s)"
+    else:
+        distance = HAVERSINE_KM
+        area = ("latitude BETWEEN %(min_lat)s AND %(max_lat)s "
+                "AND longitude BETWEEN %(min_lng)s AND %(max_lng)s")
+
+    conditions = [target['statuses'], 'latitude IS NOT NULL', 'longitude IS NOT NULL', area]
+    if search['marketplace']:
+        conditions.append('warehouse_marketplace = %(marketplace)s')
+    for name, column in target.get('remaining', {}).items():
+        if name in search['need']:
+            params[f'need_{name}'] = search['need'][name]
+            conditions.append(f'{column} >= %(need_{name})s')
+
+    page = ''
+    if search['after']:
+        params['after_distance'], params['after_id'] = search['after']
+        page = 'AND (distance_km, id) > (%(after_distance)s, %(after_id)s::uuid)'
+
+    sql = f"""
+        SELECT * FROM (
+            SELECT {', '.join(target['columns'])}, {distance} AS distance_km
+            FROM {target['table']}
+            WHERE {' AND '.join(conditions)}
+        ) found
+        WHERE distance_km <= %(radius_km)s {page}
+        ORDER BY distance_km, id
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def search_orders(conn, role: str, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Открытые заявки другой стороны в радиусе radius_km от (lat, lng), ближайшие первыми.
+    Перевозчик по умолчанию ищет заявки отправителей, отправитель — перевозчиков (kind)
+    '''
+    kind = query_params.get('kind') or ('shipper' if role == 'carrier' else 'carrier')
+    target = TARGETS.get(kind)
+    if target is None:
+        raise HttpError(400, f"kind must be one of: {', '.join(TARGETS)}")
+
+    search = parse_search_params(query_params)
+    cur = conn.cursor()
+    try:
+        sql, params = build_query(target, search, gist_available(cur, target))
+        cur.execute(sql, params)
+        names = [column.name for column in cur.description]
+        rows = [dict(zip(names, row)) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+    next_cursor = None
+    if len(rows) == search['limit']:
+        last = rows[-1]
+        next_cursor = f"{last['distance_km']!r}_{last['id']}"
+
+    for row in rows:
+        row['id'] = str(row['id'])
+        row['distance_km'] = round(row['distance_km'], 3)
+
+    return {
+        'success': True,
+        'kind': kind,
+        'orders': rows,
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,45 @@
+'''
+Геозоны назначенного груза: забор — вокруг координат заявки отправителя, склад — вокруг
+координат заявки перевозчика. Создаются при назначении (capacity.reserve) и выключаются,
+когда груз снят с заявки или заявка удалена. Входы и выходы считает map-data (geofence.py)
+'''
+
+from typing import List
+
+# Радиус зоны по виду, метры: у склада больше — машина ждёт у ворот или на соседней стоянке
+RADIUS_M = {
+    'pickup': 150,
+    'warehouse': 300,
+}
+
+
+def create(cur, carrier_order_id, shipper_order_id):
+    '''
+    Зоны для пары заявок; у заявки без координат зона не создаётся
+    '''
+    cur.execute('''
+        INSERT INTO geofences (driver_id, kind, shipper_order_id, carrier_order_id, latitude, longitude, radius_m)
+        SELECT c.user_id, zone.kind, s.id, c.id, zone.latitude, zone.longitude, zone.radius_m
+        FROM orders_shipper s
+        JOIN orders_carrier c ON c.id = %(carrier_order_id)s
+        CROSS JOIN LATERAL (VALUES
+            ('pickup', s.latitude, s.longitude, %(pickup_radius)s::real),
+            ('warehouse', c.latitude, c.longitude, %(warehouse_radius)s::real)
+        ) AS zone(kind, latitude, longitude, radius_m)
+        WHERE s.id = %(shipper_order_id)s AND zone.latitude IS NOT NULL AND zone.longitude IS NOT NULL
+        ON CONFLICT (shipper_order_id, kind) WHERE active DO NOTHING
+    ''', {
+        'carrier_order_id': carrier_order_id,
+        'shipper_order_id': shipper_order_id,
+        'pickup_radius': RADIUS_M['pickup'],
+        'warehouse_radius': RADIUS_M['warehouse'],
+    })
+
+
+def deactivate(cur, shipper_order_ids: List):
+    if not shipper_order_ids:
+        return
+    cur.execute('''
+        UPDATE geofences SET active = FALSE
+        WHERE shipper_order_id = ANY(%s::uuid[]) AND active
+    ''', ([str(order_id) for order_id in shipper_order_ids],))
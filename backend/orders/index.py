@@ -1,55 +1,84 @@
 '''
 Единая функция управления заявками перевозчиков и грузоотправителей
-Поддерживает создание, получение и удаление заявок
+Поддерживает создание, получение и удаление заявок, поиск открытых заявок рядом с точкой,
+назначение грузов на заявку перевозчика с учётом оставшегося места
 '''
-import json
 import os
 import psycopg2
-from typing import Dict, Any, List
+from typing import Dict, Any
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, exception_response, get_header, HttpError
+from geo_search import search_orders
+from capacity import close, detach, remove, reserve, release
+from validators import Schema, Field, ValidationError, raise_errors, string, integer, number, one_of, iso_date, time_of_day, validate_uuid
+
+COORDINATES = dict(
+    latitude=Field(number(-90, 90)),
+    longitude=Field(number(-180, 180)),
+)
+
+CARRIER_ORDER_SCHEMA = Schema(
+    vehicle_id=Field(validate_uuid, required=False),
+    warehouse_marketplace=Field(string(max_length=255)),
+    warehouse_city=Field(string(max_length=255), required=False, default=''),
+    warehouse_address=Field(string(max_length=500), required=False, default=''),
+    capacity_boxes=Field(integer(0, 100000), required=False, default=0),
+    capacity_pallets=Field(integer(0, 1000), required=False, default=0),
+    **COORDINATES
+)
+
+SHIPPER_ORDER_SCHEMA = Schema(**COORDINATES)
+
+CARGO_ITEM_SCHEMA = Schema(
+    sender_name=Field(string(max_length=255)),
+    cargo_type=Field(one_of('box', 'pallet'), required=False, default='box'),
+    quantity=Field(integer(1, 100000), required=False, default=1),
+    warehouse_marketplace=Field(string(max_length=255)),
+    warehouse_city=Field(string(max_length=255)),
+    warehouse_address=Field(string(max_length=500)),
+    pickup_address=Field(string(max_length=500)),
+    pickup_date=Field(iso_date),
+    pickup_time=Field(time_of_day),
+    contact_phone=Field(string(max_length=32)),
+)
+
+ASSIGNMENT_SCHEMAS = {
+    'assign': Schema(shipper_order_id=Field(validate_uuid), carrier_order_id=Field(validate_uuid)),
+    'release': Schema(shipper_order_id=Field(validate_uuid)),
+}
+
+CORS_HEADERS = cors_headers('GET, POST, DELETE, OPTIONS', 'Content-Type, X-User-Id, X-Role')
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Role',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
-    user_id = event.get('headers', {}).get('X-User-Id')
-    role = event.get('headers', {}).get('X-Role', 'shipper')
+    user_id = get_header(event, 'X-User-Id')
+    role = get_header(event, 'X-Role', 'shipper')
     
     if not user_id:
-        return {
-            'statusCode': 401,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'X-User-Id header required'}),
-            'isBase64Encoded': False
-        }
+        return error_response(401, 'X-User-Id header required')
     
     conn = psycopg2.connect(os.environ['DATABASE_URL'])
     
     try:
         if method == 'GET':
+            query_params = event.get('queryStringParameters') or {}
+            if 'lat' in query_params or 'lng' in query_params:
+                return json_response(200, search_orders(conn, role, query_params))
             return get_orders(conn, user_id, role)
         elif method == 'POST':
+            action = parse_body(event).get('action')
+            if action in ASSIGNMENT_SCHEMAS:
+                return update_assignment(conn, user_id, action, event)
             return create_order(conn, user_id, role, event)
         elif method == 'DELETE':
             return delete_order(conn, user_id, role, event)
         else:
-            return {
-                'statusCode': 405,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Method not allowed'}),
-                'isBase64Encoded': False
-            }
+            return error_response(405, 'Method not allowed')
+    except HttpError as e:
+        return exception_response(e)
     finally:
         conn.close()
 
@@ -61,7 +90,8 @@ def get_orders(conn, user_id: str, role: str) -> Dict[str, Any]:
     if role == 'carrier':
         cur.execute('''
             SELECT id, vehicle_id, warehouse_marketplace, warehouse_city, warehouse_address,
-                   capacity_boxes, capacity_pallets, latitude, longitude, status, created_at
+                   capacity_boxes, capacity_pallets, latitude, longitude, status, created_at,
+                   remaining_boxes, remaining_pallets
             FROM orders_carrier
             WHERE user_id = %s AND status = 'active'
             ORDER BY created_at DESC
@@ -72,12 +102,7 @@ def get_orders(conn, user_id: str, role: str) -> Dict[str, Any]:
         cur.close()
         
         if not result:
-            return {
-                'statusCode': 200,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'success': True, 'order': None})
-            }
+            return json_response(200, {'success': True, 'order': None})
         
         order = {
             'id': str(result[0]),
@@ -87,18 +112,15 @@ def get_orders(conn, user_id: str, role: str) -> Dict[str, Any]:
             'warehouse_address': result[4],
             'capacity_boxes': result[5],
             'capacity_pallets': result[6],
-            'latitude': float(result[7]),
-            'longitude': float(result[8]),
+            'latitude': result[7],
+            'longitude': result[8],
             'status': result[9],
-            'created_at': result[10].isoformat()
+            'created_at': result[10],
+            'remaining_boxes': result[11],
+            'remaining_pallets': result[12]
         }
         
-        return {
-            'statusCode': 200,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({'success': True, 'order': order})
-        }
+        return json_response(200, {'success': True, 'order': order})
     
     else:  # shipper
         cur.execute('''
@@ -122,55 +144,38 @@ def get_orders(conn, user_id: str, role: str) -> Dict[str, Any]:
                 'quantity': row[3],
                 'warehouse_marketplace': row[4],
                 'pickup_address': row[5],
-                'pickup_date': row[6].isoformat() if row[6] else None,
+                'pickup_date': row[6],
                 'pickup_time': str(row[7]) if row[7] else None,
                 'contact_phone': row[8],
-                'latitude': float(row[9]),
-                'longitude': float(row[10]),
+                'latitude': row[9],
+                'longitude': row[10],
                 'status': row[11],
-                'created_at': row[12].isoformat()
+                'created_at': row[12]
             })
         
-        return {
-            'statusCode': 200,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({'success': True, 'orders': orders})
-        }
+        return json_response(200, {'success': True, 'orders': orders})
 
 
 def create_order(conn, user_id: str, role: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Создать заявку перевозчика или грузоотправителя'''
-    body_data = json.loads(event.get('body', '{}'))
-    cur = conn.cursor()
-    
+    body_data = parse_body(event)
+
     if role == 'carrier':
-        vehicle_id = body_data.get('vehicle_id')
-        warehouse_marketplace = body_data.get('warehouse_marketplace', '')
-        warehouse_city = body_data.get('warehouse_city', '')
-        warehouse_address = body_data.get('warehouse_address', '')
-        capacity_boxes = body_data.get('capacity_boxes', 0)
-        capacity_pallets = body_data.get('capacity_pallets', 0)
-        latitude = body_data.get('latitude')
-        longitude = body_data.get('longitude')
-        
-        if not warehouse_marketplace or latitude is None or longitude is None:
-            cur.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'warehouse_marketplace, latitude, longitude are required'}),
-                'isBase64Encoded': False
-            }
-        
+        try:
+            order = CARRIER_ORDER_SCHEMA.check(body_data)
+        except ValidationError as e:
+            return error_response(400, str(e), errors=e.errors)
+
+        cur = conn.cursor()
         cur.execute('''
             INSERT INTO orders_carrier 
             (user_id, vehicle_id, warehouse_marketplace, warehouse_city, warehouse_address, 
-             capacity_boxes, capacity_pallets, latitude, longitude, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'active')
+             capacity_boxes, capacity_pallets, remaining_boxes, remaining_pallets, latitude, longitude, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'active')
             RETURNING id, created_at
-        ''', (user_id, vehicle_id, warehouse_marketplace, warehouse_city, warehouse_address,
-              capacity_boxes, capacity_pallets, latitude, longitude))
+        ''', (user_id, order['vehicle_id'], order['warehouse_marketplace'], order['warehouse_city'],
+              order['warehouse_address'], order['capacity_boxes'], order['capacity_pallets'],
+              order['capacity_boxes'], order['capacity_pallets'], order['latitude'], order['longitude']))
         
         result = cur.fetchone()
         order_id, created_at = result
@@ -178,124 +183,93 @@ def create_order(conn, user_id: str, role: str, event: Dict[str, Any]) -> Dict[s
         conn.commit()
         cur.close()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'success': True,
-                'order_id': str(order_id),
-                'created_at': created_at.isoformat()
-            })
-        }
+        return json_response(200, {
+            'success': True,
+            'order_id': str(order_id),
+            'created_at': created_at
+        })
     
     else:  # shipper
-        cargo_items: List[Dict] = body_data.get('cargo_items', [])
-        latitude = body_data.get('latitude')
-        longitude = body_data.get('longitude')
-        
-        if not cargo_items or latitude is None or longitude is None:
-            cur.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'cargo_items, latitude, longitude are required'}),
-                'isBase64Encoded': False
-            }
+        # Все позиции проверяются за один проход: ошибки возвращаются списком cargo_items[i].field
+        location, errors = SHIPPER_ORDER_SCHEMA.validate(body_data)
+        cargo_items, item_errors = CARGO_ITEM_SCHEMA.validate_many(body_data.get('cargo_items'), 'cargo_items')
+        errors.update(item_errors)
+        try:
+            raise_errors(errors)
+        except ValidationError as e:
+            return error_response(400, str(e), errors=e.errors)
         
+        cur = conn.cursor()
         created_orders = []
         
         for item in cargo_items:
-            sender_name = item.get('sender_name', '')
-            cargo_type = item.get('cargo_type', 'box')
-            quantity = item.get('quantity', 1)
-            warehouse_marketplace = item.get('warehouse_marketplace', '')
-            warehouse_city = item.get('warehouse_city', '')
-            warehouse_address = item.get('warehouse_address', '')
-            pickup_address = item.get('pickup_address', '')
-            pickup_date = item.get('pickup_date')
-            pickup_time = item.get('pickup_time')
-            contact_phone = item.get('contact_phone', '')
-            
-            if not all([sender_name, warehouse_marketplace, warehouse_city, warehouse_address, 
-                       pickup_address, pickup_date, pickup_time, contact_phone]):
-                continue
-            
             cur.execute('''
                 INSERT INTO orders_shipper 
                 (user_id, sender_name, cargo_type, quantity, warehouse_marketplace, warehouse_city, warehouse_address,
                  pickup_address, pickup_date, pickup_time, contact_phone, latitude, longitude, status)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending')
                 RETURNING id, created_at
-            ''', (user_id, sender_name, cargo_type, quantity, warehouse_marketplace, warehouse_city, warehouse_address,
-                  pickup_address, pickup_date, pickup_time, contact_phone, latitude, longitude))
+            ''', (user_id, item['sender_name'], item['cargo_type'], item['quantity'], item['warehouse_marketplace'],
+                  item['warehouse_city'], item['warehouse_address'], item['pickup_address'], item['pickup_date'],
+                  item['pickup_time'], item['contact_phone'], location['latitude'], location['longitude']))
             
             result = cur.fetchone()
             order_id, created_at = result
             
             created_orders.append({
                 'order_id': str(order_id),
-                'created_at': created_at.isoformat()
+                'created_at': created_at
             })
         
         conn.commit()
         cur.close()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'success': True,
-                'created_count': len(created_orders),
-                'orders': created_orders
-            })
-        }
+        return json_response(200, {
+            'success': True,
+            'created_count': len(created_orders),
+            'orders': created_orders
+        })
 
 
 def delete_order(conn, user_id: str, role: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Удалить заявку пользователя'''
-    body = json.loads(event.get('body', '{}'))
+    body = parse_body(event)
     order_id = body.get('order_id')
     
     if not order_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'order_id required'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'order_id required')
     
     cur = conn.cursor()
     
     if role == 'carrier':
-        cur.execute("""
-            DELETE FROM orders_carrier 
-            WHERE id = %s AND user_id = %s
-            RETURNING id
-        """, (order_id, user_id))
+        # Заявка закрывается до возврата грузов в ожидание, иначе параллельное
+        # назначение оставило бы груз на удалённой заявке
+        deleted = close(cur, user_id, order_id)
+        if deleted:
+            detach(cur, user_id, order_id)
+            cur.execute("""
+                DELETE FROM orders_carrier 
+                WHERE id = %s AND user_id = %s
+            """, (order_id, user_id))
     else:
-        cur.execute("""
-            DELETE FROM orders_shipper 
-            WHERE id = %s AND user_id = %s
-            RETURNING id
-        """, (order_id, user_id))
+        deleted = remove(cur, user_id, order_id)
     
-    deleted = cur.fetchone()
     conn.commit()
     cur.close()
     
     if not deleted:
-        return {
-            'statusCode': 404,
-            'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Order not found or access denied'}),
-            'isBase64Encoded': False
-        }
+        return error_response(404, 'Order not found or access denied')
     
-    return {
-        'statusCode': 200,
-        'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
-        'body': json.dumps({'success': True, 'order_id': order_id}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True, 'order_id': order_id})
+
+
+def update_assignment(conn, user_id: str, action: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    '''Назначить груз отправителя на заявку перевозчика или снять его'''
+    try:
+        assignment = ASSIGNMENT_SCHEMAS[action].check(parse_body(event))
+    except ValidationError as e:
+        return error_response(400, str(e), errors=e.errors)
+
+    if action == 'assign':
+        return json_response(200, reserve(conn, user_id, assignment['carrier_order_id'], assignment['shipper_order_id']))
+    return json_response(200, release(conn, user_id, assignment['shipper_order_id']))
@@ -1,9 +1,11 @@
-import json
 import os
 import secrets
 from datetime import datetime, timedelta
 import psycopg2
 from typing import Dict, Any
+from http_helpers import cors_headers, preflight_response, json_response, error_response, exception_response
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type')
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -15,25 +17,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     try:
         # Генерируем уникальный токен сессии
@@ -42,12 +29,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Сохраняем токен в базу (истекает через 5 минут)
         dsn = os.environ.get('DATABASE_URL')
         if not dsn:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Database not configured'}),
-                'isBase64Encoded': False
-            }
+            return error_response(500, 'Database not configured')
         
         conn = psycopg2.connect(dsn)
         cur = conn.cursor()
@@ -70,26 +52,12 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         print(f"[DEBUG] Created auth session: {session_token}")
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'session_token': session_token,
-                'bot_link': bot_link,
-                'expires_in': 300
-            }),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'success': True,
+            'session_token': session_token,
+            'bot_link': bot_link,
+            'expires_in': 300
+        })
         
     except Exception as e:
-        print(f"[ERROR] Init error: {e}")
-        import traceback
-        print(traceback.format_exc())
-        
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+        return exception_response(e, 'Init error')
@@ -1,9 +1,119 @@
-import json
+import math
 import os
+import select
+import time
 from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+import db
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, exception_response
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type')
+
+# Канал, в который telegram-webhook шлёт NOTIFY при подтверждении входа
+AUTH_NOTIFY_CHANNEL = 'telegram_auth_confirmed'
+
+# Максимальное время удержания запроса в режиме long-poll
+MAX_WAIT_SECONDS = 25
+
+# Забирает подтверждённую сессию одним UPDATE: из двух параллельных запросов
+# used = TRUE выставит только один. Если забрать нельзя, возвращает строку как есть,
+# чтобы отличить «не найдена», «истекла», «использована» и «ждёт подтверждения»
+db.register('consume_session', """
+    WITH consumed AS (
+        UPDATE t_p93479485_cargo_map_integratio.telegram_auth_sessions
+        SET used = TRUE
+        WHERE session_token = $1
+          AND used = FALSE
+          AND telegram_user_id <> 0
+          AND expires_at > (NOW() AT TIME ZONE 'UTC')
+        RETURNING session_token, telegram_user_id, telegram_username, telegram_first_name,
+                  telegram_last_name, telegram_photo_url, expires_at, used
+    )
+    SELECT c.*, TRUE AS consumed FROM consumed c
+    UNION ALL
+    SELECT s.session_token, s.telegram_user_id, s.telegram_username, s.telegram_first_name,
+           s.telegram_last_name, s.telegram_photo_url, s.expires_at, s.used, FALSE AS consumed
+    FROM t_p93479485_cargo_map_integratio.telegram_auth_sessions s
+    WHERE s.session_token = $1 AND NOT EXISTS (SELECT 1 FROM consumed)
+""")
+
+# Обновляет Telegram-данные уже зарегистрированного пользователя в той же транзакции
+# (пустой username из сессии не затирает сохранённый).
+# Новых пользователей создаёт telegram-complete-reg: для них нужны телефон и роль
+db.register('link_user', """
+    UPDATE t_p93479485_cargo_map_integratio.users
+    SET telegram = COALESCE(NULLIF($2, ''), telegram),
+        telegram_id = $1,
+        telegram_verified = TRUE,
+        updated_at = NOW()
+    WHERE telegram_chat_id = $1
+    RETURNING user_id, telegram_id, telegram, full_name, phone, phone_number,
+              company, inn, avatar, role
+""")
+
+def is_pending(session: Dict[str, Any]) -> bool:
+    return (
+        session['telegram_user_id'] == 0
+        and not session['used']
+        and datetime.utcnow() <= session['expires_at']
+    )
+
+def wait_for_notify(conn, session_token: str, session: Dict[str, Any], wait: float) -> bool:
+    '''
+    Ждёт NOTIFY от webhook по этой сессии, не дольше wait секунд и срока жизни сессии.
+    Соединение должно быть вне транзакции, иначе уведомления не доставляются
+    '''
+    remaining_lifetime = (session['expires_at'] - datetime.utcnow()).total_seconds()
+    deadline = time.monotonic() + min(wait, max(remaining_lifetime, 0))
+    
+    while True:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return False
+        
+        if select.select([conn], [], [], timeout) == ([], [], []):
+            return False
+        
+        conn.poll()
+        confirmed = any(notify.payload == session_token for notify in conn.notifies)
+        conn.notifies.clear()
+        
+        if confirmed:
+            return True
+
+def parse_wait(value: Any) -> Optional[float]:
+    '''
+    Секунды long-poll из тела запроса, прижатые к [0, MAX_WAIT_SECONDS]; None — не число
+    '''
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, bool):
+        return None
+    try:
+        wait = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(wait):
+        return None
+    return min(max(wait, 0), MAX_WAIT_SECONDS)
+
+def stop_listening(conn):
+    '''
+    Снимает LISTEN перед возвратом соединения в пул: следующий запрос на нём
+    не должен получать уведомления чужих сессий
+    '''
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"UNLISTEN {AUTH_NOTIFY_CHANNEL}")
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"[ERROR] UNLISTEN failed, dropping connection: {e}")
+        db.discard_connection()
+        return
+    conn.notifies.clear()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -15,134 +125,73 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     try:
-        body_data = json.loads(event.get('body', '{}'))
+        body_data = parse_body(event)
         session_token = body_data.get('session_token', '').strip()
         
         if not session_token:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Session token required'}),
-                'isBase64Encoded': False
-            }
+            return error_response(400, 'Session token required')
         
         # Проверяем токен в базе
-        dsn = os.environ.get('DATABASE_URL')
-        if not dsn:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Database not configured'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(dsn)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        session_token_escaped = session_token.replace("'", "''")
-        
-        cur.execute(f"""
-            SELECT 
-                session_token,
-                telegram_user_id,
-                telegram_username,
-                telegram_first_name,
-                telegram_last_name,
-                telegram_photo_url,
-                expires_at,
-                used
-            FROM t_p93479485_cargo_map_integratio.telegram_auth_sessions
-            WHERE session_token = '{session_token_escaped}'
-        """)
+        if not os.environ.get('DATABASE_URL'):
+            return error_response(500, 'Database not configured')
         
-        session = cur.fetchone()
+        wait = parse_wait(body_data.get('wait'))
+        if wait is None:
+            return error_response(400, 'wait must be a number of seconds')
         
-        if not session:
-            cur.close()
-            conn.close()
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Session not found or expired'}),
-                'isBase64Encoded': False
-            }
-        
-        # Проверяем срок действия
-        expires_at = session['expires_at']
-        if datetime.utcnow() > expires_at:
-            cur.close()
-            conn.close()
-            return {
-                'statusCode': 403,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Session expired'}),
-                'isBase64Encoded': False
-            }
-        
-        # Проверяем, не использован ли токен
-        if session['used']:
-            cur.close()
-            conn.close()
-            return {
-                'statusCode': 403,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Session already used'}),
-                'isBase64Encoded': False
-            }
+        conn = db.get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        # Проверяем, подтвердил ли пользователь вход (telegram_user_id != 0)
-        if session['telegram_user_id'] == 0:
+        try:
+            if wait:
+                # LISTEN до первой проверки, чтобы не пропустить подтверждение между ними.
+                # Соединение переиспользуется, поэтому старые уведомления отбрасываем
+                cur.execute(f"LISTEN {AUTH_NOTIFY_CHANNEL}")
+                conn.commit()
+                conn.notifies.clear()
+            
+            session = db.fetch_one(cur, 'consume_session', (session_token,))
+            
+            if wait and session and not session['consumed'] and is_pending(session):
+                conn.commit()
+                if wait_for_notify(conn, session_token, session, wait):
+                    session = db.fetch_one(cur, 'consume_session', (session_token,))
+            
+            existing_user = None
+            if session and session['consumed']:
+                existing_user = db.fetch_one(
+                    cur, 'link_user', (session['telegram_user_id'], session['telegram_username'])
+                )
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
             cur.close()
-            conn.close()
-            return {
-                'statusCode': 202,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'pending': True, 'message': 'Waiting for user confirmation'}),
-                'isBase64Encoded': False
-            }
-        
-        # Отмечаем токен как использованный
-        cur.execute(f"""
-            UPDATE t_p93479485_cargo_map_integratio.telegram_auth_sessions
-            SET used = TRUE
-            WHERE session_token = '{session_token_escaped}'
-        """)
-        conn.commit()
-        
-        # Проверяем, существует ли пользователь с таким telegram_chat_id
-        cur.execute(f"""
-            SELECT user_id, telegram_id, telegram, full_name, phone, phone_number, 
-                   company, inn, avatar, role
-            FROM t_p93479485_cargo_map_integratio.users
-            WHERE telegram_chat_id = {session['telegram_user_id']}
-            LIMIT 1
-        """)
-        
-        existing_user = cur.fetchone()
+            if wait:
+                stop_listening(conn)
         
-        cur.close()
-        conn.close()
+        if not session:
+            return error_response(404, 'Session not found or expired')
+        
+        if not session['consumed']:
+            # Проверяем срок действия
+            if datetime.utcnow() > session['expires_at']:
+                return error_response(403, 'Session expired')
+            
+            # Проверяем, подтвердил ли пользователь вход (telegram_user_id != 0)
+            if session['telegram_user_id'] == 0 and not session['used']:
+                return json_response(202, {'pending': True, 'message': 'Waiting for user confirmation'})
+            
+            # Токен уже забрал другой запрос
+            return error_response(403, 'Session already used')
         
         result = {
             'success': True,
@@ -171,21 +220,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         print(f"[DEBUG] Verified session: {session_token}, user_exists: {existing_user is not None}")
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(result),
-            'isBase64Encoded': False
-        }
+        return json_response(200, result)
         
     except Exception as e:
-        print(f"[ERROR] Verify error: {e}")
-        import traceback
-        print(traceback.format_exc())
-        
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
\ No newline at end of file
+        if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            db.discard_connection()
+        
+        return exception_response(e, 'Verify error')
\ No newline at end of file
@@ -1,8 +1,10 @@
-import json
 import os
 import psycopg2
 from typing import Dict, Any
-import requests
+from telegram_api import get_client
+from http_helpers import cors_headers, preflight_response, json_response, error_response, exception_response, parse_body
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type, X-User-Id')
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -14,44 +16,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return preflight_response(CORS_HEADERS)
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return error_response(405, 'Method not allowed')
     
     try:
-        body_data = json.loads(event.get('body', '{}'))
+        body_data = parse_body(event)
         message = body_data.get('message', '')
         audience = body_data.get('audience', 'all')
         image_url = body_data.get('imageUrl', '')
         
         if not message:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Message is required'})
-            }
+            return error_response(400, 'Message is required')
         
         bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
         if not bot_token:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Bot token not configured'})
-            }
+            return error_response(500, 'Bot token not configured')
         
         database_url = os.environ.get('DATABASE_URL')
         conn = psycopg2.connect(database_url)
@@ -77,26 +58,19 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         sent_count = 0
         failed_count = 0
+        client = get_client(bot_token)
         
         for telegram_chat_id, _ in users:
             try:
                 if image_url:
-                    url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-                    payload = {
+                    response = client.request('sendPhoto', {
                         'chat_id': telegram_chat_id,
                         'photo': image_url,
                         'caption': message,
                         'parse_mode': 'Markdown'
-                    }
+                    })
                 else:
-                    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-                    payload = {
-                        'chat_id': telegram_chat_id,
-                        'text': message,
-                        'parse_mode': 'Markdown'
-                    }
-                
-                response = requests.post(url, json=payload, timeout=10)
+                    response = client.send_message(telegram_chat_id, message, parse_mode='Markdown')
                 
                 if response.status_code == 200:
                     sent_count += 1
@@ -105,24 +79,17 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             except Exception:
                 failed_count += 1
         
+        client.log_metrics()
+        
         cur.close()
         conn.close()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'success': True,
-                'sent': sent_count,
-                'failed': failed_count,
-                'total': len(users)
-            })
-        }
+        return json_response(200, {
+            'success': True,
+            'sent': sent_count,
+            'failed': failed_count,
+            'total': len(users)
+        })
         
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        return exception_response(e, 'Broadcast error')
\ No newline at end of file
@@ -0,0 +1,95 @@
+'''
+Соединение с БД, которое переживает тёплые вызовы функции, и именованные
+prepared statements: PREPARE выполняется один раз на соединение, дальше только EXECUTE.
+'''
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import psycopg2
+from psycopg2 import extensions
+
+_local = threading.local()
+
+# Имя -> текст запроса с параметрами $1, $2, ...
+STATEMENTS: Dict[str, str] = {}
+
+
+def register(name: str, sql: str):
+    STATEMENTS[name] = sql
+
+
+def get_connection():
+    '''
+    Возвращает соединение потока, открывая новое, если старого нет или оно сломано
+    '''
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and not conn.closed and \
+            conn.get_transaction_status() != extensions.TRANSACTION_STATUS_UNKNOWN:
+        return conn
+
+    discard_connection()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    _local.conn = conn
+    _local.prepared = set()
+    return conn
+
+
+def discard_connection():
+    '''
+    Закрывает соединение после сетевой ошибки, следующий вызов откроет новое
+    '''
+    conn = getattr(_local, 'conn', None)
+    _local.conn = None
+    _local.prepared = set()
+    if conn is not None and not conn.closed:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+def release(conn):
+    '''
+    Возвращает соединение в исходное состояние после обработки запроса:
+    незавершённая транзакция откатывается, сломанное соединение закрывается
+    '''
+    if conn.closed:
+        discard_connection()
+        return
+
+    status = conn.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        discard_connection()
+    elif status != extensions.TRANSACTION_STATUS_IDLE:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard_connection()
+
+
+def execute(cur, name: str, params: Sequence[Any] = ()):
+    '''
+    Выполняет зарегистрированный запрос по имени, при первом обращении готовит его
+    '''
+    prepared = _local.prepared
+    if name not in prepared:
+        cur.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+        prepared.add(name)
+
+    if params:
+        placeholders = ', '.join(['%s'] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", tuple(params))
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+
+def fetch_one(cur, name: str, params: Sequence[Any] = ()) -> Optional[Any]:
+    execute(cur, name, params)
+    return cur.fetchone()
+
+
+def fetch_all(cur, name: str, params: Sequence[Any] = ()) -> List[Any]:
+    execute(cur, name, params)
+    return cur.fetchall()
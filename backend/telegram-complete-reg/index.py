@@ -1,10 +1,44 @@
-import json
 import os
 import psycopg2
 
 from typing import Dict, Any
 import uuid
 
+import db
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, exception_response
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type')
+
+# Регистрация одним запросом: новый пользователь создаётся, существующий с тем же
+# telegram_chat_id обновляется, повторная отправка формы даёт тот же результат.
+# email, password_hash и user_id при конфликте не меняются
+db.register('upsert_telegram_user', """
+    INSERT INTO t_p93479485_cargo_map_integratio.users
+    (user_id, email, password_hash, telegram, telegram_id, telegram_verified, telegram_chat_id,
+     phone, phone_number, full_name, user_type, role,
+     entity_type, inn, organization_name, avatar, role_status_set, email_verified, created_at, updated_at)
+    VALUES ($1, $2, 'TELEGRAM_AUTH', $3, $4, TRUE, $4,
+            $5, $5, $6, $7, $7,
+            $8, $9, $10, $11, TRUE, FALSE, NOW(), NOW())
+    ON CONFLICT (telegram_chat_id) DO UPDATE
+    SET full_name = EXCLUDED.full_name,
+        phone = EXCLUDED.phone,
+        phone_number = EXCLUDED.phone_number,
+        telegram_id = EXCLUDED.telegram_id,
+        user_type = EXCLUDED.user_type,
+        role = EXCLUDED.role,
+        telegram = EXCLUDED.telegram,
+        telegram_verified = TRUE,
+        entity_type = EXCLUDED.entity_type,
+        inn = EXCLUDED.inn,
+        organization_name = EXCLUDED.organization_name,
+        avatar = EXCLUDED.avatar,
+        role_status_set = TRUE,
+        updated_at = NOW()
+    RETURNING user_id, telegram_id, telegram, full_name, phone_number,
+              company, inn, avatar, role, (xmax = 0) AS inserted
+""")
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Завершение регистрации пользователя после Telegram авторизации
@@ -15,28 +49,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     try:
-        body_data = json.loads(event.get('body', '{}'))
+        body_data = parse_body(event)
         
         telegram_user_id = body_data.get('telegram_user_id')
         telegram_username = body_data.get('telegram_username', '').strip()
@@ -49,191 +68,73 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         photo_url = body_data.get('photo_url')
         
         if not telegram_user_id or not full_name or not phone:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'telegram_user_id, full_name и phone обязательны'}),
-                'isBase64Encoded': False
-            }
+            return error_response(400, 'telegram_user_id, full_name и phone обязательны')
         
         if user_type not in ['client', 'carrier', 'logist']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Неверный тип пользователя'}),
-                'isBase64Encoded': False
-            }
-        
-        dsn = os.environ.get('DATABASE_URL')
-        if not dsn:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Database not configured'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(dsn)
-        cur = conn.cursor()
+            return error_response(400, 'Неверный тип пользователя')
         
-        print(f"[DEBUG] Looking for user with telegram_chat_id={telegram_user_id}")
+        if not os.environ.get('DATABASE_URL'):
+            return error_response(500, 'Database not configured')
         
         telegram_user_id_int = int(telegram_user_id)
         
-        # Проверяем, существует ли пользователь с таким telegram_chat_id
-        cur.execute(f"""
-            SELECT user_id, telegram, full_name, phone, user_type
-            FROM t_p93479485_cargo_map_integratio.users
-            WHERE telegram_chat_id = {telegram_user_id_int}
-            LIMIT 1
-        """)
+        # Генерируем placeholder email для Telegram-пользователей (нужен только при создании)
+        new_user_id = str(uuid.uuid4())
+        email_placeholder = f"{new_user_id}@telegram.gruzclick.temp"
         
-        row = cur.fetchone()
-        existing_user = None
-        if row:
-            existing_user = {
-                'user_id': row[0],
-                'telegram': row[1],
-                'full_name': row[2],
-                'phone': row[3],
-                'user_type': row[4]
-            }
+        print(f"[DEBUG] Upserting user with telegram_chat_id={telegram_user_id_int}, user_type={user_type}, entity_type={entity_type}")
         
-        # Экранируем данные
-        full_name_escaped = full_name.replace("'", "''")
-        phone_escaped = phone.replace("'", "''")
-        telegram_username_escaped = telegram_username.replace("'", "''") if telegram_username else ''
-        organization_name_escaped = organization_name.replace("'", "''") if organization_name else ''
-        photo_url_escaped = photo_url.replace("'", "''") if photo_url else ''
+        conn = db.get_connection()
+        cur = conn.cursor()
         
-        if existing_user:
-            # Обновляем существующего пользователя
-            user_id = existing_user['user_id']
-            
-            cur.execute(f"""
-                UPDATE t_p93479485_cargo_map_integratio.users
-                SET 
-                    full_name = '{full_name_escaped}',
-                    phone = '{phone_escaped}',
-                    phone_number = '{phone_escaped}',
-                    telegram_id = {telegram_user_id_int},
-                    user_type = '{user_type}',
-                    role = '{user_type}',
-                    telegram = {f"'{telegram_username_escaped}'" if telegram_username else 'NULL'},
-                    telegram_verified = TRUE,
-                    entity_type = '{entity_type}',
-                    inn = {f"'{inn}'" if inn else 'NULL'},
-                    organization_name = {f"'{organization_name_escaped}'" if organization_name else 'NULL'},
-                    avatar = {f"'{photo_url_escaped}'" if photo_url else 'NULL'},
-                    role_status_set = TRUE,
-                    updated_at = NOW()
-                WHERE user_id = '{user_id}'
-                RETURNING user_id, telegram_id, telegram, full_name, phone_number, 
-                          company, inn, avatar, role
-            """)
-            
-            row = cur.fetchone()
-            updated_user = {
-                'user_id': str(row[0]),
-                'telegram_id': row[1],
-                'telegram': row[2],
-                'full_name': row[3],
-                'phone_number': row[4],
-                'company': row[5],
-                'inn': row[6],
-                'avatar': row[7],
-                'role': row[8]
-            }
-            conn.commit()
-            
-            print(f"[DEBUG] Updated existing user {user_id} with role {user_type}")
-            
-            result = {
-                'success': True,
-                'message': 'Регистрация завершена успешно!',
-                'user': updated_user
-            }
-            
-        else:
-            # Создаём нового пользователя
-            new_user_id = str(uuid.uuid4())
-            
-            # Генерируем placeholder email и password_hash для Telegram-пользователей
-            email_placeholder = f"{new_user_id}@telegram.gruzclick.temp"
-            password_hash_placeholder = "TELEGRAM_AUTH"
-            
-            print(f"[DEBUG] Attempting INSERT with: user_type={user_type}, entity_type={entity_type}, phone={phone}, full_name={full_name}")
-            
-            cur.execute(f"""
-                INSERT INTO t_p93479485_cargo_map_integratio.users 
-                (user_id, email, password_hash, telegram, telegram_id, telegram_verified, telegram_chat_id, 
-                 phone, phone_number, full_name, user_type, role, 
-                 entity_type, inn, organization_name, avatar, role_status_set, email_verified, created_at, updated_at)
-                VALUES (
-                    '{new_user_id}',
-                    '{email_placeholder}',
-                    '{password_hash_placeholder}',
-                    {f"'{telegram_username_escaped}'" if telegram_username else 'NULL'},
-                    {telegram_user_id_int},
-                    TRUE,
-                    {telegram_user_id_int},
-                    '{phone_escaped}',
-                    '{phone_escaped}',
-                    '{full_name_escaped}',
-                    '{user_type}',
-                    '{user_type}',
-                    '{entity_type}',
-                    {f"'{inn}'" if inn else 'NULL'},
-                    {f"'{organization_name_escaped}'" if organization_name else 'NULL'},
-                    {f"'{photo_url_escaped}'" if photo_url else 'NULL'},
-                    TRUE,
-                    FALSE,
-                    NOW(),
-                    NOW()
-                )
-                RETURNING user_id, telegram_id, telegram, phone_number, full_name, company, inn, avatar, role
-            """)
-            
-            row = cur.fetchone()
-            new_user = {
-                'user_id': str(row[0]),
-                'telegram_id': row[1],
-                'telegram': row[2],
-                'phone_number': row[3],
-                'full_name': row[4],
-                'company': row[5],
-                'inn': row[6],
-                'avatar': row[7],
-                'role': row[8]
-            }
+        try:
+            row = db.fetch_one(cur, 'upsert_telegram_user', (
+                new_user_id,
+                email_placeholder,
+                telegram_username or None,
+                telegram_user_id_int,
+                phone,
+                full_name,
+                user_type,
+                entity_type,
+                inn or None,
+                organization_name or None,
+                photo_url or None
+            ))
             conn.commit()
-            
-            print(f"[DEBUG] Created new user {new_user_id} with role {user_type}")
-            
-            result = {
-                'success': True,
-                'message': 'Регистрация завершена успешно!',
-                'user': new_user
-            }
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
         
-        cur.close()
-        conn.close()
+        user = {
+            'user_id': str(row[0]),
+            'telegram_id': row[1],
+            'telegram': row[2],
+            'full_name': row[3],
+            'phone_number': row[4],
+            'company': row[5],
+            'inn': row[6],
+            'avatar': row[7],
+            'role': row[8]
+        }
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(result),
-            'isBase64Encoded': False
+        if row[9]:
+            print(f"[DEBUG] Created new user {user['user_id']} with role {user_type}")
+        else:
+            print(f"[DEBUG] Updated existing user {user['user_id']} with role {user_type}")
+        
+        result = {
+            'success': True,
+            'message': 'Регистрация завершена успешно!',
+            'user': user
         }
         
+        return json_response(200, result)
+    
     except Exception as e:
-        print(f"[ERROR] Complete registration error: {e}")
-        import traceback
-        print(traceback.format_exc())
+        if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            db.discard_connection()
         
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
\ No newline at end of file
+        return exception_response(e, 'Complete registration error')
@@ -0,0 +1,128 @@
+'''
+Общие HTTP-помощники функций: CORS, JSON-ответы, разбор тела запроса и ошибки.
+JSON кодируется через orjson, если он установлен (Decimal, datetime, date, time, UUID
+сериализуются без ручных преобразований). Одинаковая копия лежит в каждой функции.
+'''
+
+import json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+
+class HttpError(Exception):
+    '''
+    Ошибка, которая превращается в ответ {'error': message} с заданным статусом
+    '''
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(raw):
+        return orjson.loads(raw)
+else:
+    def dumps(value: Any) -> str:
+        return json.dumps(value, default=_default, ensure_ascii=False)
+
+    def loads(raw):
+        return json.loads(raw)
+
+
+def cors_headers(methods: str, allow_headers: str = 'Content-Type') -> Dict[str, str]:
+    '''
+    Заголовки preflight-ответа; вызывается один раз при импорте функции
+    '''
+    return {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': methods,
+        'Access-Control-Allow-Headers': allow_headers,
+        'Access-Control-Max-Age': '86400'
+    }
+
+
+def preflight_response(headers: Dict[str, str]) -> Dict[str, Any]:
+    return {'statusCode': 200, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+
+
+def json_response(status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    if headers:
+        headers = {**JSON_HEADERS, **headers}
+    return {
+        'statusCode': status,
+        'headers': headers or JSON_HEADERS,
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+def error_response(status: int, message: str, **extra) -> Dict[str, Any]:
+    payload = {'error': message}
+    payload.update(extra)
+    return json_response(status, payload)
+
+
+def exception_response(error: Exception, context: str = 'Handler error') -> Dict[str, Any]:
+    '''
+    HttpError отдаёт свой статус, любая другая ошибка логируется и становится 500
+    '''
+    if isinstance(error, HttpError):
+        return error_response(error.status, error.message)
+
+    import traceback
+
+    print(f"[ERROR] {context}: {error}")
+    print(traceback.format_exc())
+    return error_response(500, str(error))
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    raw = event.get('body') or '{}'
+    try:
+        body = loads(raw)
+    except ValueError:
+        raise HttpError(400, 'Invalid JSON')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'JSON object expected')
+    return body
+
+
+def get_header(event: Dict[str, Any], name: str, default: Optional[str] = None) -> Optional[str]:
+    '''
+    Заголовок без учёта регистра: шлюз передаёт их то как X-User-Id, то как x-user-id
+    '''
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    if value is None:
+        lowered = name.lower()
+        for key, candidate in headers.items():
+            if key.lower() == lowered:
+                return candidate
+    return default if value is None else value
@@ -1,57 +1,23 @@
-import json
 import os
 import psycopg2
-import requests
 from psycopg2.extras import RealDictCursor
 from typing import Dict, Any
+from telegram_api import get_client
+from photo_cache import (
+    build_photo_url,
+    fetch_profile_photo_async,
+    get_cached_photo,
+    store_photo,
+)
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body
 
-def get_user_profile_photo(user_id: int, bot_token: str) -> str:
-    '''
-    Получает URL фото профиля пользователя
-    '''
-    try:
-        # Получаем список фото профиля
-        response = requests.get(
-            f'https://api.telegram.org/bot{bot_token}/getUserProfilePhotos',
-            params={'user_id': user_id, 'limit': 1},
-            timeout=5
-        )
-        
-        if not response.ok:
-            return ''
-        
-        data = response.json()
-        photos = data.get('result', {}).get('photos', [])
-        
-        if not photos or not photos[0]:
-            return ''
-        
-        # Берём самое большое фото (последнее в массиве)
-        file_id = photos[0][-1]['file_id']
-        
-        # Получаем путь к файлу
-        file_response = requests.get(
-            f'https://api.telegram.org/bot{bot_token}/getFile',
-            params={'file_id': file_id},
-            timeout=5
-        )
-        
-        if not file_response.ok:
-            return ''
-        
-        file_data = file_response.json()
-        file_path = file_data.get('result', {}).get('file_path', '')
-        
-        if not file_path:
-            return ''
-        
-        # Формируем URL для загрузки
-        photo_url = f'https://api.telegram.org/file/bot{bot_token}/{file_path}'
-        return photo_url
-        
-    except Exception as e:
-        print(f"[ERROR] Failed to get profile photo: {e}")
-        return ''
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type')
+
+# Сколько ждём фоновую загрузку фото после ответа пользователю
+PHOTO_FETCH_TIMEOUT = 12
+
+# telegram-auth-verify слушает этот канал в режиме long-poll
+AUTH_NOTIFY_CHANNEL = 'telegram_auth_confirmed'
 
 def handle_auth_request(chat_id: int, username: str, first_name: str, last_name: str, session_token: str, bot_token: str):
     '''
@@ -76,9 +42,9 @@ def handle_auth_request(chat_id: int, username: str, first_name: str, last_name:
             ]]
         }
         
-        response = requests.post(
-            f'https://api.telegram.org/bot{bot_token}/sendMessage',
-            json={
+        response = get_client(bot_token).request(
+            'sendMessage',
+            {
                 'chat_id': chat_id,
                 'text': response_text,
                 'parse_mode': 'Markdown',
@@ -116,56 +82,50 @@ def handle_callback_query(callback_query: Dict[str, Any]) -> Dict[str, Any]:
         bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
         
         if not bot_token:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'ok': True}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {'ok': True})
         
         # Парсим callback_data
         if ':' in callback_data:
             action, session_token = callback_data.split(':', 1)
             
             if action == 'auth_confirm':
-                # Получаем URL фото профиля
-                photo_url = get_user_profile_photo(chat_id, bot_token)
-                
-                # Сохраняем данные в сессию
+                # Сохраняем подтверждение сразу, фото берём из кэша или догружаем в фоне
                 dsn = os.environ.get('DATABASE_URL')
-                if dsn:
-                    conn = psycopg2.connect(dsn)
-                    cur = conn.cursor()
-                    
-                    session_token_escaped = session_token.replace("'", "''")
-                    username_escaped = username.replace("'", "''")
-                    first_name_escaped = first_name.replace("'", "''")
-                    last_name_escaped = last_name.replace("'", "''")
-                    photo_url_escaped = photo_url.replace("'", "''") if photo_url else ''
+                conn = psycopg2.connect(dsn) if dsn else None
+                cur = conn.cursor() if conn else None
+                photo_future = None
+                
+                if conn:
+                    photo = get_cached_photo(cur, chat_id)
+                    photo_url = build_photo_url(bot_token, photo) if photo else ''
                     
-                    cur.execute(f"""
+                    cur.execute("""
                         UPDATE t_p93479485_cargo_map_integratio.telegram_auth_sessions
                         SET 
-                            telegram_user_id = {chat_id},
-                            telegram_username = '{username_escaped}',
-                            telegram_first_name = '{first_name_escaped}',
-                            telegram_last_name = '{last_name_escaped}',
-                            telegram_photo_url = '{photo_url_escaped}'
-                        WHERE session_token = '{session_token_escaped}'
-                    """)
+                            telegram_user_id = %s,
+                            telegram_username = %s,
+                            telegram_first_name = %s,
+                            telegram_last_name = %s,
+                            telegram_photo_url = %s
+                        WHERE session_token = %s
+                    """, (chat_id, username, first_name, last_name, photo_url, session_token))
+                    
+                    # NOTIFY доставляется слушателям при коммите вместе с UPDATE
+                    cur.execute("SELECT pg_notify(%s, %s)", (AUTH_NOTIFY_CHANNEL, session_token))
                     
                     conn.commit()
-                    cur.close()
-                    conn.close()
                     
-                    print(f"[DEBUG] Auth confirmed for session {session_token}, photo: {bool(photo_url)}")
+                    if photo is None:
+                        photo_future = fetch_profile_photo_async(chat_id, bot_token)
+                    
+                    print(f"[DEBUG] Auth confirmed for session {session_token}, photo cached: {photo is not None}")
                 
                 # Обновляем сообщение
                 success_text = "✅ *Вход подтверждён!*\n\nВозвращайтесь на сайт GruzClick для продолжения."
                 
-                requests.post(
-                    f'https://api.telegram.org/bot{bot_token}/editMessageText',
-                    json={
+                get_client(bot_token).request(
+                    'editMessageText',
+                    {
                         'chat_id': chat_id,
                         'message_id': message_id,
                         'text': success_text,
@@ -175,22 +135,42 @@ def handle_callback_query(callback_query: Dict[str, Any]) -> Dict[str, Any]:
                 )
                 
                 # Отвечаем на callback
-                requests.post(
-                    f'https://api.telegram.org/bot{bot_token}/answerCallbackQuery',
-                    json={
+                get_client(bot_token).request(
+                    'answerCallbackQuery',
+                    {
                         'callback_query_id': callback_id,
                         'text': '✅ Вход подтверждён!'
                     },
                     timeout=5
                 )
                 
+                if photo_future:
+                    try:
+                        photo = photo_future.result(timeout=PHOTO_FETCH_TIMEOUT)
+                        if photo:
+                            store_photo(cur, chat_id, photo)
+                            photo_url = build_photo_url(bot_token, photo)
+                            if photo_url:
+                                cur.execute("""
+                                    UPDATE t_p93479485_cargo_map_integratio.telegram_auth_sessions
+                                    SET telegram_photo_url = %s
+                                    WHERE session_token = %s
+                                """, (photo_url, session_token))
+                            conn.commit()
+                    except Exception as e:
+                        print(f"[ERROR] Failed to store profile photo: {e}")
+                
+                if conn:
+                    cur.close()
+                    conn.close()
+                
             elif action == 'auth_cancel':
                 # Отменяем вход
                 cancel_text = "❌ Вход отменён.\n\nВы можете закрыть это окно."
                 
-                requests.post(
-                    f'https://api.telegram.org/bot{bot_token}/editMessageText',
-                    json={
+                get_client(bot_token).request(
+                    'editMessageText',
+                    {
                         'chat_id': chat_id,
                         'message_id': message_id,
                         'text': cancel_text
@@ -199,33 +179,23 @@ def handle_callback_query(callback_query: Dict[str, Any]) -> Dict[str, Any]:
                 )
                 
                 # Отвечаем на callback
-                requests.post(
-                    f'https://api.telegram.org/bot{bot_token}/answerCallbackQuery',
-                    json={
+                get_client(bot_token).request(
+                    'answerCallbackQuery',
+                    {
                         'callback_query_id': callback_id,
                         'text': 'Вход отменён'
                     },
                     timeout=5
                 )
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'ok': True}),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {'ok': True})
         
     except Exception as e:
         print(f"[ERROR] Callback error: {e}")
         import traceback
         print(traceback.format_exc())
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'ok': True}),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {'ok': True})
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -237,28 +207,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     try:
-        body_data = json.loads(event.get('body', '{}'))
+        body_data = parse_body(event)
         
         # Обработка callback query (нажатие на inline кнопки)
         callback_query = body_data.get('callback_query')
@@ -276,12 +231,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         if not chat_id:
             print(f"[DEBUG] Webhook received but no chat_id found")
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'ok': True}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {'ok': True})
         
         print(f"[DEBUG] Webhook received from @{username} (ID: {chat_id})")
         
@@ -302,19 +252,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 print(f"[DEBUG] Sent auth confirmation request to {chat_id}")
                 
                 # Завершаем обработку - не нужно сохранять в базу
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json'},
-                    'body': json.dumps({'ok': True}),
-                    'isBase64Encoded': False
-                }
+                return json_response(200, {'ok': True})
             else:
                 # Обычный /start без параметров
                 response_text = "👋 Добро пожаловать в GruzClick!\n\n✅ Бот активирован! Теперь вы будете получать коды для входа в приложение."
                 try:
-                    requests.post(
-                        f'https://api.telegram.org/bot{bot_token}/sendMessage',
-                        json={
+                    get_client(bot_token).request(
+                        'sendMessage',
+                        {
                             'chat_id': chat_id,
                             'text': response_text
                         },
@@ -331,38 +276,40 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 conn = psycopg2.connect(dsn)
                 cur = conn.cursor(cursor_factory=RealDictCursor)
                 
-                username_escaped = username.lower().replace("'", "''")
-                
-                # Обновляем chat_id для пользователя с таким username
-                cur.execute(f"""
-                    UPDATE t_p93479485_cargo_map_integratio.users 
-                    SET telegram_chat_id = {chat_id}
-                    WHERE LOWER(telegram) = '{username_escaped}'
-                """)
-                
-                rows_updated = cur.rowcount
-                conn.commit()
+                # chat_id уникален: привязываем его к одной (последней) записи с этим username
+                # и только если этот Telegram ещё не привязан к другому пользователю
+                try:
+                    cur.execute("""
+                        UPDATE t_p93479485_cargo_map_integratio.users
+                        SET telegram_chat_id = %s
+                        WHERE user_id = (
+                            SELECT user_id FROM t_p93479485_cargo_map_integratio.users
+                            WHERE LOWER(telegram) = %s
+                            ORDER BY updated_at DESC NULLS LAST
+                            LIMIT 1
+                        )
+                        AND NOT EXISTS (
+                            SELECT 1 FROM t_p93479485_cargo_map_integratio.users
+                            WHERE telegram_chat_id = %s
+                        )
+                    """, (chat_id, username.lower(), chat_id))
+                    rows_updated = cur.rowcount
+                    conn.commit()
+                except psycopg2.errors.UniqueViolation:
+                    # Параллельный запрос успел привязать этот chat_id
+                    conn.rollback()
+                    rows_updated = 0
                 
                 print(f"[DEBUG] Updated {rows_updated} users with chat_id={chat_id} for @{username}")
                 
                 cur.close()
                 conn.close()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'ok': True}),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {'ok': True})
         
     except Exception as e:
         print(f"[ERROR] Webhook error: {e}")
         import traceback
         print(traceback.format_exc())
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'ok': True}),
-            'isBase64Encoded': False
-        }
\ No newline at end of file
+        return json_response(200, {'ok': True})
\ No newline at end of file
@@ -0,0 +1,144 @@
+'''
+Кэш фото профиля Telegram: LRU в памяти процесса + таблица telegram_profile_photos
+'''
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from telegram_api import get_client
+
+PHOTOS_TABLE = 't_p93479485_cargo_map_integratio.telegram_profile_photos'
+
+# Ссылка на файл Bot API действует не меньше часа — обновляем с запасом
+PHOTO_TTL = timedelta(minutes=50)
+
+# (file_id, file_path, fetched_at); file_id = None — у пользователя нет фото
+PhotoEntry = Tuple[Optional[str], Optional[str], datetime]
+
+
+class PhotoLRU:
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._items: 'OrderedDict[int, PhotoEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[PhotoEntry]:
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is not None:
+                self._items.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id: int, entry: PhotoEntry):
+        with self._lock:
+            self._items[user_id] = entry
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+photo_lru = PhotoLRU()
+
+_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def is_fresh(entry: PhotoEntry) -> bool:
+    return datetime.utcnow() - entry[2] < PHOTO_TTL
+
+
+def build_photo_url(bot_token: str, entry: PhotoEntry) -> str:
+    file_path = entry[1]
+    if not file_path:
+        return ''
+    return get_client(bot_token).file_url(file_path)
+
+
+def get_cached_photo(cur, user_id: int) -> Optional[PhotoEntry]:
+    '''
+    Возвращает свежую запись из LRU или из БД, None — запись нужно обновить
+    '''
+    entry = photo_lru.get(user_id)
+    if entry is not None and is_fresh(entry):
+        return entry
+
+    cur.execute(
+        f"SELECT file_id, file_path, fetched_at FROM {PHOTOS_TABLE} WHERE telegram_user_id = %s",
+        (user_id,)
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+
+    entry = (row[0], row[1], row[2])
+    if not is_fresh(entry):
+        return None
+
+    photo_lru.put(user_id, entry)
+    return entry
+
+
+def store_photo(cur, user_id: int, entry: PhotoEntry):
+    cur.execute(
+        f"""
+        INSERT INTO {PHOTOS_TABLE} (telegram_user_id, file_id, file_path, fetched_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (telegram_user_id) DO UPDATE
+        SET file_id = EXCLUDED.file_id,
+            file_path = EXCLUDED.file_path,
+            fetched_at = EXCLUDED.fetched_at
+        """,
+        (user_id, entry[0], entry[1], entry[2])
+    )
+    photo_lru.put(user_id, entry)
+
+
+def fetch_profile_photo(user_id: int, bot_token: str) -> Optional[PhotoEntry]:
+    '''
+    Запрашивает фото профиля у Bot API (getUserProfilePhotos + getFile), None при ошибке
+    '''
+    try:
+        client = get_client(bot_token)
+        response = client.request(
+            'getUserProfilePhotos',
+            {'user_id': user_id, 'limit': 1},
+            http_method='GET',
+            timeout=5
+        )
+
+        if not response.ok:
+            return None
+
+        photos = response.json().get('result', {}).get('photos', [])
+
+        if not photos or not photos[0]:
+            return (None, None, datetime.utcnow())
+
+        # Берём самое большое фото (последнее в массиве)
+        file_id = photos[0][-1]['file_id']
+
+        file_response = client.request(
+            'getFile',
+            {'file_id': file_id},
+            http_method='GET',
+            timeout=5
+        )
+
+        if not file_response.ok:
+            return None
+
+        file_path = file_response.json().get('result', {}).get('file_path', '')
+
+        if not file_path:
+            return None
+
+        return (file_id, file_path, datetime.utcnow())
+
+    except Exception as e:
+        print(f"[ERROR] Failed to get profile photo: {e}")
+        return None
+
+
+def fetch_profile_photo_async(user_id: int, bot_token: str) -> 'Future[Optional[PhotoEntry]]':
+    return _executor.submit(fetch_profile_photo, user_id, bot_token)
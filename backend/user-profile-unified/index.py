@@ -2,39 +2,25 @@
 Единая функция управления профилем пользователя
 Включает личные данные, адреса, транспорт и паспортные данные
 '''
-import json
 import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Dict, Any
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, exception_response, get_header
+
+CORS_HEADERS = cors_headers('GET, POST, PUT, DELETE, OPTIONS', 'Content-Type, X-User-Id')
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     path = event.get('path', '/')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
-    headers = event.get('headers', {})
-    user_id = headers.get('x-user-id') or headers.get('X-User-Id')
+    user_id = get_header(event, 'X-User-Id')
     
     if not user_id:
-        return {
-            'statusCode': 401,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'X-User-Id header required'}),
-            'isBase64Encoded': False
-        }
+        return error_response(401, 'X-User-Id header required')
     
     try:
         dsn = os.environ.get('DATABASE_URL')
@@ -53,20 +39,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             return delete_profile_item(conn, user_id, event)
         else:
             conn.close()
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}),
-                'isBase64Encoded': False
-            }
+            return error_response(405, 'Method not allowed')
     except Exception as e:
-        print(f"Error in user-profile-unified: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+        return exception_response(e, 'Error in user-profile-unified')
 
 
 def get_profile(conn, user_id: str, section: str) -> Dict[str, Any]:
@@ -152,24 +127,14 @@ def get_profile(conn, user_id: str, section: str) -> Dict[str, Any]:
     conn.close()
     
     if not result:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Profile not found'}),
-            'isBase64Encoded': False
-        }
+        return error_response(404, 'Profile not found')
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'profile': result}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True, 'profile': result})
 
 
 def update_profile(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Обновить личные данные пользователя'''
-    body_data = json.loads(event.get('body', '{}'))
+    body_data = parse_body(event)
     cur = conn.cursor()
     
     updates = []
@@ -186,12 +151,7 @@ def update_profile(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     if not updates:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'No fields to update'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'No fields to update')
     
     updates.append('updated_at = CURRENT_TIMESTAMP')
     params.append(user_id)
@@ -210,33 +170,23 @@ def update_profile(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     conn.close()
     
     if not updated_user:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'User not found'}),
-            'isBase64Encoded': False
-        }
+        return error_response(404, 'User not found')
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({
-            'success': True,
-            'user': {
-                'user_id': updated_user[0],
-                'full_name': updated_user[1],
-                'phone_number': updated_user[2],
-                'company': updated_user[3],
-                'inn': updated_user[4]
-            }
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {
+        'success': True,
+        'user': {
+            'user_id': updated_user[0],
+            'full_name': updated_user[1],
+            'phone_number': updated_user[2],
+            'company': updated_user[3],
+            'inn': updated_user[4]
+        }
+    })
 
 
 def create_profile_item(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Создать адрес или транспорт'''
-    body_data = json.loads(event.get('body', '{}'))
+    body_data = parse_body(event)
     item_type = body_data.get('type')
     cur = conn.cursor()
     
@@ -262,12 +212,7 @@ def create_profile_item(conn, user_id: str, event: Dict[str, Any]) -> Dict[str,
         cur.close()
         conn.close()
         
-        return {
-            'statusCode': 201,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': True, 'id': str(item_id)}),
-            'isBase64Encoded': False
-        }
+        return json_response(201, {'success': True, 'id': str(item_id)})
     
     elif item_type == 'vehicle':
         vehicle_type = body_data.get('vehicle_type')
@@ -291,27 +236,17 @@ def create_profile_item(conn, user_id: str, event: Dict[str, Any]) -> Dict[str,
         cur.close()
         conn.close()
         
-        return {
-            'statusCode': 201,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': True, 'id': str(item_id)}),
-            'isBase64Encoded': False
-        }
+        return json_response(201, {'success': True, 'id': str(item_id)})
     
     else:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid type. Use "address" or "vehicle"'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'Invalid type. Use "address" or "vehicle"')
 
 
 def delete_profile_item(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Удалить адрес или транспорт'''
-    body_data = json.loads(event.get('body', '{}'))
+    body_data = parse_body(event)
     item_type = body_data.get('type')
     item_id = body_data.get('id')
     cur = conn.cursor()
@@ -329,20 +264,10 @@ def delete_profile_item(conn, user_id: str, event: Dict[str, Any]) -> Dict[str,
     else:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid type'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'Invalid type')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
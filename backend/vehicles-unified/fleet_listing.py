@@ -0,0 +1,166 @@
+'''
+Список машин перевозчика: keyset-страницы по (created_at DESC, id DESC) через индекс
+idx_vehicles_user_created, фильтры по марке и вместимости и сводка по всему отфильтрованному
+парку (вместимость, машины на активной заявке и свободные), посчитанная в SQL.
+Сводка отдаётся только с первой страницей, следующие страницы её не пересчитывают
+'''
+
+import math
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from http_helpers import HttpError
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+STATUSES = ('on_order', 'idle')
+
+# Машина «на заявке», если на неё ссылается активная заявка перевозчика этого же пользователя.
+# Запрос идёт по idx_orders_carrier_active_lookup (user_id, INCLUDE vehicle_id)
+ACTIVE_ORDERS = '''
+    active_orders AS (
+        SELECT DISTINCT ON (vehicle_id) vehicle_id, id AS order_id
+        FROM orders_carrier
+        WHERE user_id = %(user_id)s AND status = 'active' AND vehicle_id IS NOT NULL
+        ORDER BY vehicle_id, created_at DESC
+    )
+'''
+
+
+def _integer(params: Dict[str, Any], name: str) -> Optional[int]:
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f'{name} must be an integer')
+    if not math.isfinite(result) or result != int(result) or result < 0:
+        raise HttpError(400, f'{name} must be a non-negative integer')
+    return int(result)
+
+
+def parse_listing_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    limit = _integer(params, 'limit')
+    limit = DEFAULT_LIMIT if limit is None else limit
+    if not 1 <= limit <= MAX_LIMIT:
+        raise HttpError(400, f'limit must be between 1 and {MAX_LIMIT}')
+
+    status = params.get('status') or None
+    if status is not None and status not in STATUSES:
+        raise HttpError(400, f"status must be one of: {', '.join(STATUSES)}")
+
+    after: Optional[Tuple[datetime, str]] = None
+    cursor = params.get('cursor')
+    if cursor:
+        created_at, _, vehicle_id = str(cursor).rpartition('_')
+        try:
+            after = (datetime.fromisoformat(created_at), str(uuid.UUID(vehicle_id)))
+        except ValueError:
+            raise HttpError(400, 'Invalid cursor')
+
+    return {
+        'limit': limit,
+        'after': after,
+        'brand': (params.get('brand') or '').strip() or None,
+        'status': status,
+        'min_boxes': _integer(params, 'min_boxes'),
+        'max_boxes': _integer(params, 'max_boxes'),
+        'min_pallets': _integer(params, 'min_pallets'),
+        'max_pallets': _integer(params, 'max_pallets'),
+    }
+
+
+def _filters(listing: Dict[str, Any]) -> List[str]:
+    conditions = ['v.user_id = %(user_id)s']
+    if listing['brand']:
+        conditions.append('LOWER(v.car_brand) = LOWER(%(brand)s)')
+    for column, bound in (('capacity_boxes', 'boxes'), ('capacity_pallets', 'pallets')):
+        if listing[f'min_{bound}'] is not None:
+            conditions.append(f'COALESCE(v.{column}, 0) >= %(min_{bound})s')
+        if listing[f'max_{bound}'] is not None:
+            conditions.append(f'COALESCE(v.{column}, 0) <= %(max_{bound})s')
+    if listing['status'] == 'on_order':
+        conditions.append('a.order_id IS NOT NULL')
+    elif listing['status'] == 'idle':
+        conditions.append('a.order_id IS NULL')
+    return conditions
+
+
+def list_vehicles(conn, user_id: str, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    listing = parse_listing_params(query_params)
+    params = {'user_id': user_id, **listing}
+    conditions = _filters(listing)
+
+    page_conditions = list(conditions)
+    if listing['after']:
+        params['after_created_at'], params['after_id'] = listing['after']
+        page_conditions.append('(v.created_at, v.id) < (%(after_created_at)s, %(after_id)s::uuid)')
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f'''
+            WITH {ACTIVE_ORDERS}
+            SELECT v.id, v.driver_name, v.driver_phone, v.driver_license_number,
+                   v.car_brand, v.car_model, v.car_number, v.car_number_photo_url,
+                   v.capacity_boxes, v.capacity_pallets, v.created_at, a.order_id
+            FROM vehicles v
+            LEFT JOIN active_orders a ON a.vehicle_id = v.id
+            WHERE {' AND '.join(page_conditions)}
+            ORDER BY v.created_at DESC, v.id DESC
+            LIMIT %(limit)s
+        ''', params)
+        rows = cur.fetchall()
+
+        summary = None
+        if not listing['after']:
+            cur.execute(f'''
+                WITH {ACTIVE_ORDERS}
+                SELECT COUNT(*),
+                       COALESCE(SUM(v.capacity_boxes), 0),
+                       COALESCE(SUM(v.capacity_pallets), 0),
+                       COUNT(a.order_id)
+                FROM vehicles v
+                LEFT JOIN active_orders a ON a.vehicle_id = v.id
+                WHERE {' AND '.join(conditions)}
+            ''', params)
+            total, boxes, pallets, on_order = cur.fetchone()
+            summary = {
+                'total': total,
+                'capacity_boxes': boxes,
+                'capacity_pallets': pallets,
+                'by_status': {'on_order': on_order, 'idle': total - on_order},
+            }
+    finally:
+        cur.close()
+
+    vehicles = [{
+        'id': str(row[0]),
+        'driver_name': row[1],
+        'driver_phone': row[2],
+        'driver_license_number': row[3],
+        'car_brand': row[4],
+        'car_model': row[5],
+        'car_number': row[6],
+        'car_number_photo_url': row[7],
+        'capacity_boxes': row[8],
+        'capacity_pallets': row[9],
+        'created_at': row[10],
+        'status': 'on_order' if row[11] else 'idle',
+        'active_order_id': str(row[11]) if row[11] else None,
+    } for row in rows]
+
+    next_cursor = None
+    if len(rows) == listing['limit']:
+        next_cursor = f"{rows[-1][10].isoformat()}_{rows[-1][0]}"
+
+    result = {
+        'success': True,
+        'vehicles': vehicles,
+        'next_cursor': next_cursor,
+    }
+    if summary is not None:
+        result['summary'] = summary
+    return result
@@ -1,143 +1,92 @@
 '''
 Единая функция управления транспортом перевозчиков
-Поддерживает получение списка, сохранение и удаление автомобилей
+Поддерживает постраничный список со сводкой по парку, сохранение и удаление автомобилей, импорт парка из CSV/NDJSON
 '''
-import json
 import os
 import psycopg2
-from typing import Dict, Any, List
+from typing import Dict, Any
+from http_helpers import cors_headers, preflight_response, json_response, parse_body, get_header, HttpError
+from validators import Schema, Field, string, integer
+from vehicle_import import import_format, import_vehicles, lock_vehicles, validate_car_number
+from fleet_listing import list_vehicles
+
+VEHICLE_SCHEMA = Schema(
+    driver_name=Field(string(max_length=255)),
+    driver_phone=Field(string(max_length=20)),
+    driver_license_number=Field(string(max_length=20)),
+    car_brand=Field(string(max_length=100)),
+    car_model=Field(string(max_length=100)),
+    car_number=Field(validate_car_number),
+    car_number_photo_url=Field(string(max_length=1000), required=False),
+    capacity_boxes=Field(integer(0, 100000), required=False, default=0),
+    capacity_pallets=Field(integer(0, 1000), required=False, default=0),
+)
+
+CORS_HEADERS = cors_headers('GET, POST, DELETE, OPTIONS', 'Content-Type, X-User-Id')
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight_response(CORS_HEADERS)
     
-    user_id = event.get('headers', {}).get('X-User-Id') or event.get('headers', {}).get('x-user-id')
+    user_id = get_header(event, 'X-User-Id')
     if not user_id:
-        return {
-            'statusCode': 401,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': False, 'error': 'Missing X-User-Id header'}),
-            'isBase64Encoded': False
-        }
+        return json_response(401, {'success': False, 'error': 'Missing X-User-Id header'})
     
     try:
+        fmt = import_format(event) if method == 'POST' else None
         conn = psycopg2.connect(os.environ['DATABASE_URL'])
         
         if method == 'GET':
-            return get_vehicles(conn, user_id)
+            return get_vehicles(conn, user_id, event)
         elif method == 'POST':
+            if fmt:
+                try:
+                    return json_response(200, import_vehicles(conn, user_id, event, fmt, VEHICLE_SCHEMA))
+                finally:
+                    conn.close()
             return save_vehicles(conn, user_id, event)
         elif method == 'DELETE':
             return delete_vehicle(conn, user_id, event)
         else:
             conn.close()
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': False, 'error': 'Method not allowed'}),
-                'isBase64Encoded': False
-            }
+            return json_response(405, {'success': False, 'error': 'Method not allowed'})
+    except HttpError as e:
+        return json_response(e.status, {'success': False, 'error': e.message})
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': False, 'error': str(e)}),
-            'isBase64Encoded': False
-        }
+        print(f"[ERROR] Vehicles error: {e}")
+        return json_response(500, {'success': False, 'error': str(e)})
 
 
-def get_vehicles(conn, user_id: str) -> Dict[str, Any]:
-    '''Получить список автомобилей пользователя'''
-    cur = conn.cursor()
-    
-    cur.execute('''
-        SELECT id, driver_name, driver_phone, driver_license_number,
-               car_brand, car_model, car_number, car_number_photo_url,
-               capacity_boxes, capacity_pallets, created_at
-        FROM vehicles
-        WHERE user_id = %s
-        ORDER BY created_at DESC
-    ''', (user_id,))
-    
-    rows = cur.fetchall()
-    vehicles = []
-    
-    for row in rows:
-        vehicles.append({
-            'id': str(row[0]),
-            'driver_name': row[1],
-            'driver_phone': row[2],
-            'driver_license_number': row[3],
-            'car_brand': row[4],
-            'car_model': row[5],
-            'car_number': row[6],
-            'car_number_photo_url': row[7],
-            'capacity_boxes': row[8],
-            'capacity_pallets': row[9],
-            'created_at': row[10].isoformat()
-        })
-    
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({
-            'success': True,
-            'vehicles': vehicles
-        }),
-        'isBase64Encoded': False
-    }
+def get_vehicles(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    '''Получить страницу автомобилей пользователя со сводкой по парку'''
+    try:
+        return json_response(200, list_vehicles(conn, user_id, event.get('queryStringParameters') or {}))
+    finally:
+        conn.close()
 
 
 def save_vehicles(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Сохранить новые автомобили'''
-    body_data = json.loads(event.get('body', '{}'))
-    vehicles: List[Dict] = body_data.get('vehicles', [])
+    body_data = parse_body(event)
+    # Весь пакет проверяется за один проход: ошибки адресуются как vehicles[i].field
+    vehicles, errors = VEHICLE_SCHEMA.validate_many(body_data.get('vehicles'), 'vehicles')
     
-    if not vehicles:
+    if errors:
         conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': False, 'error': 'No vehicles provided'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {
+            'success': False,
+            'error': next(iter(errors.values())),
+            'errors': errors
+        })
     
     cur = conn.cursor()
     saved_vehicles = []
+    # Тот же замок, что у импорта: иначе он не увидит номера, которые сохраняются сейчас
+    lock_vehicles(cur)
     
     for vehicle in vehicles:
-        required_fields = ['driver_name', 'driver_phone', 'driver_license_number', 
-                         'car_brand', 'car_model', 'car_number']
-        
-        missing = [f for f in required_fields if not vehicle.get(f)]
-        if missing:
-            cur.close()
-            conn.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': False, 
-                    'error': f'Missing required fields: {", ".join(missing)}'
-                }),
-                'isBase64Encoded': False
-            }
-        
         cur.execute('''
             INSERT INTO vehicles 
             (user_id, driver_name, driver_phone, driver_license_number, 
@@ -153,9 +102,9 @@ def save_vehicles(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
             vehicle['car_brand'],
             vehicle['car_model'],
             vehicle['car_number'],
-            vehicle.get('car_number_photo_url'),
-            vehicle.get('capacity_boxes', 0),
-            vehicle.get('capacity_pallets', 0)
+            vehicle['car_number_photo_url'],
+            vehicle['capacity_boxes'],
+            vehicle['capacity_pallets']
         ))
         
         row = cur.fetchone()
@@ -164,37 +113,27 @@ def save_vehicles(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
             'driver_name': row[1],
             'car_brand': row[2],
             'car_number': row[3],
-            'created_at': row[4].isoformat()
+            'created_at': row[4]
         })
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({
-            'success': True,
-            'saved_vehicles': saved_vehicles
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {
+        'success': True,
+        'saved_vehicles': saved_vehicles
+    })
 
 
 def delete_vehicle(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Удалить автомобиль'''
-    body_data = json.loads(event.get('body', '{}'))
+    body_data = parse_body(event)
     vehicle_id = body_data.get('id')
     
     if not vehicle_id:
         conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': False, 'error': 'Vehicle ID required'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'success': False, 'error': 'Vehicle ID required'})
     
     cur = conn.cursor()
     
@@ -210,16 +149,6 @@ def delete_vehicle(conn, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
     conn.close()
     
     if not deleted:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': False, 'error': 'Vehicle not found'}),
-            'isBase64Encoded': False
-        }
+        return json_response(404, {'success': False, 'error': 'Vehicle not found'})
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'vehicle_id': vehicle_id}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True, 'vehicle_id': vehicle_id})
@@ -0,0 +1,228 @@
+'''
+Импорт парка из CSV или NDJSON. Тело разбирается построчно, каждая строка проверяется
+VEHICLE_SCHEMA (номер нормализуется validate_car_number, как и в save_vehicles); повторы
+car_number внутри файла отбрасываются. Прошедшие проверку строки
+загружаются через COPY во временную таблицу и сливаются с vehicles тремя запросами
+(по индексу idx_vehicles_car_number): свои машины обновляются, новые вставляются,
+номера, занятые другим перевозчиком, попадают в отчёт как конфликт
+'''
+
+import base64
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from http_helpers import HttpError, get_header
+from validators import Schema, string
+
+MAX_IMPORT_ROWS = 20000
+
+# Одна запись в vehicles за раз (импорт или save_vehicles): параллельная загрузка
+# тех же номеров иначе создаст дубли
+IMPORT_LOCK_NAMESPACE = 45001
+
+COLUMNS = ('driver_name', 'driver_phone', 'driver_license_number', 'car_brand', 'car_model',
+           'car_number', 'car_number_photo_url', 'capacity_boxes', 'capacity_pallets')
+
+FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+}
+
+
+def import_format(event: Dict[str, Any]) -> Optional[str]:
+    '''
+    csv / ndjson по ?format= или Content-Type; None — обычный JSON для save_vehicles
+    '''
+    query_params = event.get('queryStringParameters') or {}
+    requested = query_params.get('format')
+    if requested:
+        if requested not in ('csv', 'ndjson'):
+            raise HttpError(400, 'format must be csv or ndjson')
+        return requested
+    content_type = (get_header(event, 'Content-Type') or '').split(';', 1)[0].strip().lower()
+    return FORMATS.get(content_type)
+
+
+def _body_text(event: Dict[str, Any]) -> str:
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8-sig')
+    return body.lstrip('\ufeff')
+
+
+def _csv_rows(text: str) -> Iterator[Tuple[int, Any]]:
+    stream = io.StringIO(text, newline='')
+    header = stream.readline()
+    # Excel в русской локали сохраняет CSV через точку с запятой
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fields = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter), [])]
+    for line, values in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+        if not any(value.strip() for value in values):
+            continue
+        yield line, dict(zip(fields, values))
+
+
+def _ndjson_rows(text: str) -> Iterator[Tuple[int, Any]]:
+    for line, raw in enumerate(io.StringIO(text), start=1):
+        if not raw.strip():
+            continue
+        try:
+            yield line, json.loads(raw)
+        except ValueError:
+            yield line, None
+
+
+def normalize_car_number(value: str) -> str:
+    return ''.join(value.split()).upper()
+
+
+_car_number_string = string(max_length=20)
+
+
+def validate_car_number(value: Any) -> str:
+    '''
+    Номер без пробелов в верхнем регистре: «а123вс 77» и «А123ВС77» — одна машина
+    '''
+    if isinstance(value, str):
+        value = normalize_car_number(value)
+    return _car_number_string(value)
+
+
+def lock_vehicles(cur):
+    cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (IMPORT_LOCK_NAMESPACE, 'vehicles'))
+
+
+def _tsv(value: Any) -> str:
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def parse_rows(fmt: str, text: str, schema: Schema) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    '''
+    (строки для загрузки с номером line, отчёт по отброшенным строкам)
+    '''
+    rows = _csv_rows(text) if fmt == 'csv' else _ndjson_rows(text)
+    valid: List[Dict[str, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+
+    for count, (line, data) in enumerate(rows, start=1):
+        if count > MAX_IMPORT_ROWS:
+            raise HttpError(400, f'Не больше {MAX_IMPORT_ROWS} машин за один импорт')
+        if data is None:
+            rejected.append({'line': line, 'status': 'invalid', 'errors': {'row': 'Invalid JSON'}})
+            continue
+
+        clean, errors = schema.validate(data)
+        if errors:
+            rejected.append({'line': line, 'car_number': data.get('car_number') if isinstance(data, dict) else None,
+                             'status': 'invalid', 'errors': errors})
+            continue
+
+        first = seen.get(clean['car_number'])
+        if first is not None:
+            rejected.append({'line': line, 'car_number': clean['car_number'], 'status': 'duplicate', 'first_line': first})
+            continue
+        seen[clean['car_number']] = line
+        clean['line'] = line
+        valid.append(clean)
+
+    return valid, rejected
+
+
+def merge(cur, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+
+    lock_vehicles(cur)
+    cur.execute('''
+        CREATE TEMP TABLE vehicles_import (
+            line INTEGER NOT NULL,
+            driver_name VARCHAR(255), driver_phone VARCHAR(32), driver_license_number VARCHAR(64),
+            car_brand VARCHAR(100), car_model VARCHAR(100), car_number VARCHAR(20) PRIMARY KEY,
+            car_number_photo_url TEXT, capacity_boxes INTEGER, capacity_pallets INTEGER
+        ) ON COMMIT DROP
+    ''')
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_tsv(row[column]) for column in ('line',) + COLUMNS))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY vehicles_import (line, {', '.join(COLUMNS)}) FROM STDIN", buffer)
+    cur.execute('ANALYZE vehicles_import')
+
+    report: List[Dict[str, Any]] = []
+
+    cur.execute('''
+        SELECT s.line, s.car_number FROM vehicles_import s
+        WHERE EXISTS (SELECT 1 FROM vehicles v WHERE v.car_number = s.car_number AND v.user_id <> %s)
+    ''', (user_id,))
+    conflicts = cur.fetchall()
+    report.extend({'line': line, 'car_number': number, 'status': 'conflict',
+                   'error': 'Номер уже зарегистрирован другим перевозчиком'} for line, number in conflicts)
+    if conflicts:
+        cur.execute('DELETE FROM vehicles_import WHERE line = ANY(%s)', ([line for line, _ in conflicts],))
+
+    cur.execute('''
+        UPDATE vehicles v
+        SET driver_name = s.driver_name, driver_phone = s.driver_phone,
+            driver_license_number = s.driver_license_number, car_brand = s.car_brand,
+            car_model = s.car_model, car_number_photo_url = COALESCE(s.car_number_photo_url, v.car_number_photo_url),
+            capacity_boxes = s.capacity_boxes, capacity_pallets = s.capacity_pallets, updated_at = NOW()
+        FROM vehicles_import s
+        WHERE v.car_number = s.car_number AND v.user_id = %s
+        RETURNING s.line, s.car_number, v.id
+    ''', (user_id,))
+    report.extend({'line': line, 'car_number': number, 'status': 'updated', 'id': str(vehicle_id)}
+                  for line, number, vehicle_id in cur.fetchall())
+
+    cur.execute(f'''
+        WITH inserted AS (
+            INSERT INTO vehicles (user_id, {', '.join(COLUMNS)})
+            SELECT %s, {', '.join('s.' + column for column in COLUMNS)}
+            FROM vehicles_import s
+            WHERE NOT EXISTS (SELECT 1 FROM vehicles v WHERE v.car_number = s.car_number)
+            RETURNING id, car_number
+        )
+        SELECT s.line, s.car_number, i.id FROM inserted i JOIN vehicles_import s USING (car_number)
+    ''', (user_id,))
+    report.extend({'line': line, 'car_number': number, 'status': 'inserted', 'id': str(vehicle_id)}
+                  for line, number, vehicle_id in cur.fetchall())
+
+    return report
+
+
+def import_vehicles(conn, user_id: str, event: Dict[str, Any], fmt: str, schema: Schema) -> Dict[str, Any]:
+    '''
+    Отчёт по каждой строке файла: inserted / updated / invalid / duplicate / conflict.
+    С ?dry_run=1 изменения откатываются, отчёт тот же
+    '''
+    rows, rejected = parse_rows(fmt, _body_text(event), schema)
+    if not rows and not rejected:
+        raise HttpError(400, 'Файл импорта пуст')
+
+    dry_run = (event.get('queryStringParameters') or {}).get('dry_run') in ('1', 'true')
+    with conn.cursor() as cur:
+        merged = merge(cur, user_id, rows)
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+
+    report = sorted(merged + rejected, key=lambda row: row['line'])
+    summary: Dict[str, int] = {}
+    for row in report:
+        summary[row['status']] = summary.get(row['status'], 0) + 1
+
+    print(f"[DEBUG] Vehicle import for {user_id}: {len(report)} rows, {summary}{' (dry run)' if dry_run else ''}")
+    return {
+        'success': True,
+        'dry_run': dry_run,
+        'total': len(report),
+        'summary': summary,
+        'rows': report,
+    }
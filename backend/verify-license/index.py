@@ -1,96 +1,206 @@
-import json
+import os
 import re
-from typing import Dict, Any
+import time
+from datetime import date
+from typing import Dict, Any, List, Tuple
+import db
+from http_helpers import cors_headers, preflight_response, json_response, error_response, parse_body, exception_response, get_header, HttpError
+from verification import TIME_BUDGET_SECONDS, verify, verify_many, lookup_latest
+from providers import get_provider
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type, X-User-Id')
+
+# ВУ: 10 цифр (серия 4 цифры + номер 6 цифр), пробелы между серией и номером допускаются
+LICENSE_RE = re.compile(r'^\d{10}$')
+LICENSE_SEPARATORS_RE = re.compile(r'[\s\-]')
+
+MESSAGES = {
+    'valid': 'ВУ действительно',
+    'invalid': 'ВУ недействительно',
+    'not_found': 'ВУ не найдено',
+}
+
+# Сколько удостоверений можно проверить одним запросом bulk
+MAX_BULK_LICENSES = 500
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Проверка водительского удостоверения через базу ГИБДД
-    Args: event - dict с httpMethod, body (license_number, birth_date)
+    Проверка водительского удостоверения через провайдера (ГИБДД или локальный fake) с кешем в БД
+    Args: event - dict с httpMethod, body (license_number, birth_date) или
+          body {action: 'bulk', licenses: [{license_number, birth_date}]} / {action: 'bulk'}
+          с X-User-Id — весь парк перевозчика (birth_dates: {license_number: birth_date})
           context - объект с атрибутами request_id, function_name
     Returns: HTTP response dict с результатом проверки
     '''
     method: str = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
+        return preflight_response(CORS_HEADERS)
+
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    body_data = json.loads(event.get('body', '{}'))
-    license_number = body_data.get('license_number', '').strip()
-    birth_date = body_data.get('birth_date', '').strip()
-    
+        return error_response(405, 'Method not allowed')
+
+    try:
+        body_data = parse_body(event)
+    except HttpError as e:
+        return exception_response(e)
+
+    if body_data.get('action') == 'bulk':
+        return run_with_connection(lambda conn: verify_bulk(conn, body_data, event))
+
+    license_number = normalize_license(body_data.get('license_number'))
+    birth_date = body_data.get('birth_date') or ''
+
     if not license_number or not birth_date:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
+        return json_response(400, {
+            'valid': False,
+            'error': 'Требуются поля: license_number и birth_date'
+        })
+
+    if not LICENSE_RE.match(license_number):
+        return json_response(400, {
+            'valid': False,
+            'error': 'Неверный формат ВУ. Должно быть 10 цифр (например: 7711123456)'
+        })
+
+    try:
+        parsed_birth_date = parse_birth_date(birth_date)
+    except HttpError as e:
+        return json_response(e.status, {'valid': False, 'error': e.message})
+
+    def check(conn):
+        result = verify(conn, license_number, parsed_birth_date)
+        if result['status'] == 'pending':
+            return json_response(202, {
                 'valid': False,
-                'error': 'Требуются поля: license_number и birth_date'
-            }),
-            'isBase64Encoded': False
-        }
-    
-    # Валидация формата ВУ (10 цифр: серия 4 цифры + номер 6 цифр)
-    license_pattern = r'^\d{10}$'
-    if not re.match(license_pattern, license_number):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
+                'status': 'pending',
+                'license_number': license_number,
+                'message': 'Проверка ещё идёт, повторите запрос позже'
+            })
+
+        if result['status'] == 'error':
+            return json_response(502, {
                 'valid': False,
-                'error': 'Неверный формат ВУ. Должно быть 10 цифр (например: 7711123456)'
-            }),
-            'isBase64Encoded': False
-        }
-    
-    # ВАЖНО: Реальный API ГИБДД требует регистрации на https://гибдд.рф/opendata
-    # Для продакшена необходимо:
-    # 1. Зарегистрироваться на портале opendata ГИБДД
-    # 2. Получить API ключ
-    # 3. Добавить секрет GIBDD_API_KEY через put_secret
-    # 4. Использовать реальный endpoint: https://xn--90adear.xn--p1ai/api/check_driver
-    
-    # Пример заглушки (для демонстрации логики):
-    # В продакшене замените на реальный запрос к API ГИБДД
-    is_valid = check_license_format_valid(license_number)
-    
-    result = {
-        'valid': is_valid,
-        'license_number': license_number,
-        'message': 'ВУ прошло форматную проверку' if is_valid else 'ВУ не прошло проверку',
-        'note': 'Для полной проверки требуется API-ключ ГИБДД',
-        'request_id': context.request_id
-    }
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(result),
-        'isBase64Encoded': False
-    }
-
-def check_license_format_valid(license_number: str) -> bool:
-    """Базовая проверка формата ВУ"""
-    if len(license_number) != 10:
-        return False
-    if not license_number.isdigit():
-        return False
-    # Дополнительные проверки контрольной суммы могут быть добавлены
-    return True
+                'license_number': license_number,
+                'error': 'Сервис проверки ВУ недоступен, повторите позже'
+            })
+
+        return json_response(200, {
+            **result,
+            'message': MESSAGES[result['status']],
+            'request_id': context.request_id
+        })
+
+    return run_with_connection(check)
+
+def normalize_license(value: Any) -> str:
+    if not isinstance(value, str):
+        return ''
+    return LICENSE_SEPARATORS_RE.sub('', value)
+
+def parse_birth_date(value: Any) -> date:
+    try:
+        parsed = date.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        parsed = None
+    if parsed is None or not date(1900, 1, 1) <= parsed <= date.today():
+        raise HttpError(400, 'birth_date должна быть датой в формате YYYY-MM-DD')
+    return parsed
+
+def run_with_connection(action) -> Dict[str, Any]:
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        return error_response(500, 'Database not configured')
+
+    conn = None
+    try:
+        conn = db.get_connection()
+        return action(conn)
+    except Exception as e:
+        if not isinstance(e, HttpError):
+            # Сессионные advisory lock из verify_many не должны остаться на общем соединении
+            db.discard_connection()
+        return exception_response(e, 'License check error')
+    finally:
+        if conn is not None:
+            db.release(conn)
+
+def fleet_licenses(conn, user_id: str) -> List[str]:
+    with conn.cursor() as cur:
+        cur.execute('''
+            SELECT DISTINCT driver_license_number FROM vehicles
+            WHERE user_id = %s
+        ''', (user_id,))
+        return [row[0] for row in cur.fetchall()]
+
+def verify_bulk(conn, body_data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Пакетная проверка: явный список licenses или все машины перевозчика из X-User-Id.
+    Для машин без переданной даты рождения отдаётся последний результат из кеша,
+    иначе status='birth_date_required'. Не проверенные за TIME_BUDGET_SECONDS
+    удостоверения приходят со status='pending' — клиент повторяет запрос
+    '''
+    deadline = time.monotonic() + TIME_BUDGET_SECONDS
+    licenses = body_data.get('licenses')
+    birth_dates: Dict[str, Any] = {}
+
+    if licenses is None:
+        user_id = get_header(event, 'X-User-Id')
+        if not user_id:
+            raise HttpError(401, 'Missing X-User-Id header')
+        raw_birth_dates = body_data.get('birth_dates') or {}
+        if not isinstance(raw_birth_dates, dict):
+            raise HttpError(400, 'birth_dates must be an object')
+        birth_dates = {normalize_license(number): value for number, value in raw_birth_dates.items()}
+        licenses = [{'license_number': number, 'birth_date': birth_dates.get(number)}
+                    for number in fleet_licenses(conn, user_id)]
+    elif not isinstance(licenses, list) or not all(isinstance(item, dict) for item in licenses):
+        raise HttpError(400, 'licenses must be a list of objects')
+
+    if len(licenses) > MAX_BULK_LICENSES:
+        raise HttpError(400, f'Не больше {MAX_BULK_LICENSES} удостоверений за запрос')
+
+    keys: List[Tuple[str, date]] = []
+    rows: List[Dict[str, Any]] = []
+    without_birth_date: List[str] = []
+
+    for item in licenses:
+        number = normalize_license(item.get('license_number'))
+        row = {'license_number': number}
+        rows.append(row)
+        if not LICENSE_RE.match(number):
+            row.update(status='error', valid=False, error='Неверный формат ВУ')
+        elif not item.get('birth_date'):
+            without_birth_date.append(number)
+        else:
+            try:
+                row['key'] = (number, parse_birth_date(item['birth_date']))
+                keys.append(row['key'])
+            except HttpError as e:
+                row.update(status='error', valid=False, error=e.message)
+
+    results = verify_many(conn, keys, deadline)
+    with conn.cursor() as cur:
+        latest = lookup_latest(cur, without_birth_date, get_provider().name)
+
+    for row in rows:
+        key = row.pop('key', None)
+        if key is not None:
+            row.update(results[key])
+        elif 'status' not in row:
+            row.update(latest.get(row['license_number']) or {
+                'status': 'birth_date_required', 'valid': False, 'cached': False
+            })
+
+    summary: Dict[str, int] = {}
+    for row in rows:
+        summary[row['status']] = summary.get(row['status'], 0) + 1
+
+    print(f"[DEBUG] Bulk license check: {len(rows)} licenses, {summary}, "
+          f"{sum(1 for row in rows if row.get('cached'))} from cache")
+
+    return json_response(200, {
+        'success': True,
+        'results': rows,
+        'summary': summary
+    })
@@ -0,0 +1,126 @@
+'''
+Источники проверки водительских удостоверений. Провайдер получает номер ВУ и дату рождения
+и возвращает {'status': 'valid' | 'invalid' | 'not_found', 'details': {...}}; сбой связи
+или ответа внешнего сервиса — ProviderError (такой результат не кешируется).
+Провайдер выбирается переменной LICENSE_PROVIDER: gibdd — внешний API (нужен GIBDD_API_KEY),
+fake — локальная детерминированная проверка для тестов и разработки
+'''
+
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Optional
+
+STATUSES = ('valid', 'invalid', 'not_found')
+
+
+class ProviderError(Exception):
+    pass
+
+
+class LicenseProvider:
+    name = 'base'
+
+    def check(self, license_number: str, birth_date: date) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class FakeProvider(LicenseProvider):
+    '''
+    Без внешних вызовов: номера из FAKE_LICENSE_INVALID — лишены права управления,
+    номера с серией 0000 — не найдены, остальные действительны. FAKE_LICENSE_DELAY_MS
+    имитирует задержку внешнего API; calls считает обращения (для проверки кеша)
+    '''
+    name = 'fake'
+
+    def __init__(self, invalid: Optional[set] = None, delay_ms: float = 0):
+        self.invalid = invalid or set()
+        self.delay_ms = delay_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def check(self, license_number: str, birth_date: date) -> Dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+
+        if license_number.startswith('0000'):
+            return {'status': 'not_found', 'details': {}}
+        if license_number in self.invalid:
+            return {'status': 'invalid', 'details': {'decisions': 1}}
+        return {'status': 'valid', 'details': {'category': 'B'}}
+
+
+class GibddProvider(LicenseProvider):
+    '''
+    Запрос к API проверки ВУ ГИБДД. Ответ с doc — удостоверение найдено; непустой decis —
+    действующие решения о лишении права управления
+    '''
+    name = 'gibdd'
+
+    def __init__(self, api_key: str, url: str, timeout: float = 10):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+
+    def _http(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def check(self, license_number: str, birth_date: date) -> Dict[str, Any]:
+        try:
+            response = self._http().post(
+                self.url,
+                data={'num': license_number, 'date': birth_date.strftime('%d.%m.%Y')},
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except Exception as e:
+            raise ProviderError(f'GIBDD request failed: {e}')
+
+        doc = payload.get('doc') if isinstance(payload, dict) else None
+        if not doc:
+            return {'status': 'not_found', 'details': {}}
+
+        details = {key: doc.get(key) for key in ('cat', 'date', 'srok', 'stag') if doc.get(key) is not None}
+        decisions = payload.get('decis') or []
+        if decisions:
+            details['decisions'] = len(decisions)
+            return {'status': 'invalid', 'details': details}
+        return {'status': 'valid', 'details': details}
+
+
+_provider: Optional[LicenseProvider] = None
+
+
+def get_provider() -> LicenseProvider:
+    '''
+    Провайдер создаётся один раз на тёплый экземпляр функции
+    '''
+    global _provider
+    if _provider is None:
+        name = os.environ.get('LICENSE_PROVIDER') or ('gibdd' if os.environ.get('GIBDD_API_KEY') else 'fake')
+        if name == 'gibdd':
+            _provider = GibddProvider(
+                os.environ['GIBDD_API_KEY'],
+                os.environ.get('GIBDD_API_URL', 'https://xn--90adear.xn--p1ai/api/check_driver'),
+            )
+        elif name == 'fake':
+            invalid = {value.strip() for value in os.environ.get('FAKE_LICENSE_INVALID', '').split(',') if value.strip()}
+            _provider = FakeProvider(invalid, float(os.environ.get('FAKE_LICENSE_DELAY_MS', 0)))
+        else:
+            raise ValueError(f'Unknown LICENSE_PROVIDER: {name}')
+        print(f"[DEBUG] License provider: {_provider.name}")
+    return _provider
+
+
+def set_provider(provider: Optional[LicenseProvider]):
+    global _provider
+    _provider = provider
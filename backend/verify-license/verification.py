@@ -0,0 +1,248 @@
+'''
+Проверка ВУ с кешем в Postgres. Результат провайдера хранится в license_checks по ключу
+(license_number, birth_date) до expires_at, поэтому повторные проверки и открытие списка
+машин не ходят во внешний API. Одинаковые проверки склеиваются: внутри экземпляра —
+общий Future на ключ, между экземплярами — advisory lock на ключ: кто не взял блокировку,
+дожидается её и читает результат из кеша. Весь вызов укладывается в один deadline:
+ключи, которые к нему не проверены, возвращаются со status='pending' и не кешируются
+'''
+
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2 import errors, extensions
+from psycopg2.extras import Json, execute_values
+
+from providers import LicenseProvider, ProviderError, get_provider
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+Key = Tuple[str, date]
+
+# Сколько хранить ответ: действительное ВУ перепроверяем раз в неделю, отказ — через сутки
+CACHE_TTL: Dict[str, timedelta] = {
+    'valid': timedelta(hours=int(os.environ.get('LICENSE_CACHE_TTL_HOURS', 168))),
+    'invalid': timedelta(hours=24),
+    'not_found': timedelta(hours=24),
+}
+
+# Параллельные запросы к провайдеру на экземпляр и ожидание одного ответа
+PROVIDER_CONCURRENCY = 4
+PROVIDER_TIMEOUT_SECONDS = 15
+
+# Пространство ключей advisory lock (purge.py использует 41001)
+LOCK_NAMESPACE = 44001
+LOCK_WAIT_MS = 15000
+
+# Бюджет одного вызова verify_many с запасом до таймаута функции
+TIME_BUDGET_SECONDS = 20
+
+_pool = ThreadPoolExecutor(max_workers=PROVIDER_CONCURRENCY, thread_name_prefix='license')
+_inflight: Dict[Key, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _lock_key(key: Key) -> str:
+    return f"{key[0]}:{key[1].isoformat()}"
+
+
+def _entry(key: Key, status: str, details: Any = None, checked_at=None, cached: bool = False,
+           provider: Optional[str] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    entry = {
+        'license_number': key[0],
+        'birth_date': key[1],
+        'status': status,
+        'valid': status == 'valid',
+        'details': details or {},
+        'checked_at': checked_at,
+        'cached': cached,
+        'provider': provider,
+    }
+    if error:
+        entry['error'] = error
+    return entry
+
+
+def lookup(cur, keys: List[Key], provider_name: str) -> Dict[Key, Dict[str, Any]]:
+    if not keys:
+        return {}
+    cur.execute(f"""
+        SELECT c.license_number, c.birth_date, c.status, c.details, c.checked_at
+        FROM {SCHEMA}.license_checks c
+        JOIN unnest(%s::varchar[], %s::date[]) AS k(license_number, birth_date)
+          ON c.license_number = k.license_number AND c.birth_date = k.birth_date
+        WHERE c.provider = %s AND c.expires_at > NOW()
+    """, ([key[0] for key in keys], [key[1] for key in keys], provider_name))
+    return {
+        (row[0], row[1]): _entry((row[0], row[1]), row[2], row[3], row[4], cached=True, provider=provider_name)
+        for row in cur.fetchall()
+    }
+
+
+def lookup_latest(cur, license_numbers: List[str], provider_name: str) -> Dict[str, Dict[str, Any]]:
+    '''
+    Последний непросроченный результат по номеру ВУ — для машин, у которых дата рождения
+    водителя не передана
+    '''
+    if not license_numbers:
+        return {}
+    cur.execute(f"""
+        SELECT DISTINCT ON (license_number) license_number, birth_date, status, details, checked_at
+        FROM {SCHEMA}.license_checks
+        WHERE license_number = ANY(%s) AND provider = %s AND expires_at > NOW()
+        ORDER BY license_number, checked_at DESC
+    """, (license_numbers, provider_name))
+    return {
+        row[0]: _entry((row[0], row[1]), row[2], row[3], row[4], cached=True, provider=provider_name)
+        for row in cur.fetchall()
+    }
+
+
+def store(cur, results: Dict[Key, Dict[str, Any]], provider_name: str) -> Dict[Key, Any]:
+    '''
+    Сохраняет ответы провайдера; возвращает checked_at по ключам
+    '''
+    if not results:
+        return {}
+    rows = execute_values(cur, f"""
+        INSERT INTO {SCHEMA}.license_checks
+            (license_number, birth_date, provider, status, details, checked_at, expires_at)
+        VALUES %s
+        ON CONFLICT (license_number, birth_date) DO UPDATE
+        SET provider = EXCLUDED.provider, status = EXCLUDED.status, details = EXCLUDED.details,
+            checked_at = EXCLUDED.checked_at, expires_at = EXCLUDED.expires_at
+        RETURNING license_number, birth_date, checked_at
+    """, [
+        (key[0], key[1], provider_name, result['status'], Json(result['details']), CACHE_TTL[result['status']])
+        for key, result in results.items()
+    ], template='(%s, %s, %s, %s, %s, NOW(), NOW() + %s)', fetch=True)
+    return {(row[0], row[1]): row[2] for row in rows}
+
+
+def _forget(key: Key, future: Future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _submit(provider: LicenseProvider, key: Key) -> Future:
+    '''
+    Один запрос к провайдеру на ключ: параллельный вызов с тем же ключом получает тот же Future
+    '''
+    with _inflight_lock:
+        future = _inflight.get(key)
+        created = future is None
+        if created:
+            future = _pool.submit(provider.check, key[0], key[1])
+            _inflight[key] = future
+    # Вне блокировки: у завершённого Future колбэк вызывается сразу и сам берёт _inflight_lock
+    if created:
+        future.add_done_callback(lambda done: _forget(key, done))
+    return future
+
+
+def _pending(key: Key, provider: LicenseProvider) -> Dict[str, Any]:
+    return _entry(key, 'pending', provider=provider.name, error='Check is still in progress, retry later')
+
+
+def _check(conn, cur, provider: LicenseProvider, keys: List[Key], deadline: float) -> Dict[Key, Dict[str, Any]]:
+    '''
+    Запрашивает провайдера по ключам, на которые у нас есть блокировка, и кеширует ответы.
+    После deadline собираются только готовые ответы, ещё не начатые запросы отменяются
+    '''
+    futures = {key: _submit(provider, key) for key in keys}
+    fresh: Dict[Key, Dict[str, Any]] = {}
+    results: Dict[Key, Dict[str, Any]] = {}
+
+    for key, future in futures.items():
+        remaining = deadline - time.monotonic()
+        try:
+            answer = future.result(timeout=max(0, min(PROVIDER_TIMEOUT_SECONDS, remaining)))
+        except FutureTimeout:
+            if remaining > PROVIDER_TIMEOUT_SECONDS:
+                results[key] = _entry(key, 'error', provider=provider.name, error='Provider timeout')
+            else:
+                future.cancel()
+                results[key] = _pending(key, provider)
+            continue
+        except CancelledError:
+            # Отменён параллельным вызовом, у которого истёк бюджет
+            results[key] = _pending(key, provider)
+            continue
+        except ProviderError as e:
+            print(f"[ERROR] License check {key[0]}: {e}")
+            results[key] = _entry(key, 'error', provider=provider.name, error=str(e))
+            continue
+        fresh[key] = answer
+
+    checked_at = store(cur, fresh, provider.name)
+    conn.commit()
+    for key, answer in fresh.items():
+        results[key] = _entry(key, answer['status'], answer.get('details'), checked_at.get(key), provider=provider.name)
+    return results
+
+
+def _unlock(conn, cur, keys: Iterable[Key]):
+    # Блокировки сессионные и переживают откат, но в прерванной транзакции запрос не выполнить
+    if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+        conn.rollback()
+    for key in keys:
+        cur.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (LOCK_NAMESPACE, _lock_key(key)))
+
+
+def verify_many(conn, keys: Iterable[Key], deadline: Optional[float] = None) -> Dict[Key, Dict[str, Any]]:
+    '''
+    Результаты по каждому ключу: из кеша, от провайдера или status='error' / 'pending'
+    (не кешируются). deadline — time.monotonic(), по умолчанию через TIME_BUDGET_SECONDS
+    '''
+    if deadline is None:
+        deadline = time.monotonic() + TIME_BUDGET_SECONDS
+    provider = get_provider()
+    keys = list(dict.fromkeys(keys))
+
+    with conn.cursor() as cur:
+        results = lookup(cur, keys, provider.name)
+        misses = [key for key in keys if key not in results]
+
+        owned, busy = [], []
+        for key in misses:
+            cur.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", (LOCK_NAMESPACE, _lock_key(key)))
+            (owned if cur.fetchone()[0] else busy).append(key)
+
+        try:
+            results.update(_check(conn, cur, provider, owned, deadline))
+        finally:
+            _unlock(conn, cur, owned)
+
+        if busy:
+            # Эти ключи сейчас проверяет другой экземпляр: ждём его блокировку и читаем кеш
+            waited = []
+            try:
+                for key in busy:
+                    wait_ms = min(LOCK_WAIT_MS, int((deadline - time.monotonic()) * 1000))
+                    if wait_ms <= 0:
+                        break
+                    cur.execute("SET LOCAL lock_timeout = %s", (wait_ms,))
+                    cur.execute("SELECT pg_advisory_lock(%s, hashtext(%s))", (LOCK_NAMESPACE, _lock_key(key)))
+                    waited.append(key)
+                results.update(lookup(cur, waited, provider.name))
+                results.update(_check(conn, cur, provider, [key for key in waited if key not in results], deadline))
+            except errors.LockNotAvailable:
+                conn.rollback()
+                results.update(lookup(cur, waited, provider.name))
+            finally:
+                _unlock(conn, cur, waited)
+            for key in busy:
+                results.setdefault(key, _pending(key, provider))
+        conn.commit()
+
+    return results
+
+
+def verify(conn, license_number: str, birth_date: date) -> Dict[str, Any]:
+    key = (license_number, birth_date)
+    return verify_many(conn, [key])[key]
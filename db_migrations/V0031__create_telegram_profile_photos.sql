@@ -0,0 +1,8 @@
+-- Кэш фото профиля Telegram, чтобы подтверждение входа не ждало два запроса к Bot API
+-- file_id = NULL означает, что у пользователя нет фото (тоже кэшируется)
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.telegram_profile_photos (
+    telegram_user_id BIGINT PRIMARY KEY,
+    file_id TEXT,
+    file_path TEXT,
+    fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,12 @@
+-- Частичный индекс по живым кодам сброса пароля: reset_password ищет
+-- неиспользованный код по email, использованные строки в индекс не попадают
+CREATE INDEX IF NOT EXISTS idx_reset_codes_live
+    ON t_p93479485_cargo_map_integratio.password_reset_codes(email, created_at DESC)
+    WHERE used = false;
+
+-- Проверка кода Telegram идёт по username + code, раньше был только индекс по user_id.
+-- Флага использования у кодов нет (их удаляют после проверки), живой код отличается
+-- только сроком: expires_at и user_id лежат в индексе, проверка не читает таблицу
+CREATE INDEX IF NOT EXISTS idx_telegram_verification_username
+    ON t_p93479485_cargo_map_integratio.telegram_verification_codes(telegram_username, code)
+    INCLUDE (expires_at, user_id);
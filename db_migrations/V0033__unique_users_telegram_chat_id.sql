@@ -0,0 +1,20 @@
+-- Один Telegram-аккаунт — один пользователь: нужно для INSERT ... ON CONFLICT (telegram_chat_id)
+-- в telegram-complete-reg. У дубликатов оставляем chat_id только у последней обновлённой записи
+UPDATE t_p93479485_cargo_map_integratio.users u
+SET telegram_chat_id = NULL
+FROM (
+    SELECT user_id,
+           ROW_NUMBER() OVER (
+               PARTITION BY telegram_chat_id
+               ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST
+           ) AS rn
+    FROM t_p93479485_cargo_map_integratio.users
+    WHERE telegram_chat_id IS NOT NULL
+) d
+WHERE u.user_id = d.user_id AND d.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_telegram_chat_id_unique
+    ON t_p93479485_cargo_map_integratio.users(telegram_chat_id);
+
+-- Обычный индекс по тому же столбцу больше не нужен
+DROP INDEX IF EXISTS t_p93479485_cargo_map_integratio.idx_users_telegram_chat_id;
@@ -0,0 +1,18 @@
+-- Индексы под запросы, которые scripts/check_query_plans.py находил как Seq Scan
+-- на больших таблицах
+
+-- telegram-auth-unified ищет пользователя по username как есть,
+-- telegram-webhook — без учёта регистра
+CREATE INDEX IF NOT EXISTS idx_users_telegram
+    ON t_p93479485_cargo_map_integratio.users(telegram);
+
+CREATE INDEX IF NOT EXISTS idx_users_telegram_lower
+    ON t_p93479485_cargo_map_integratio.users(LOWER(telegram));
+
+-- Карта показывает только ожидающие грузы: остальные статусы в индекс не попадают
+CREATE INDEX IF NOT EXISTS idx_cargo_waiting
+    ON t_p93479485_cargo_map_integratio.cargo(created_at DESC)
+    WHERE status = 'waiting';
+
+CREATE INDEX IF NOT EXISTS idx_drivers_coordinates
+    ON t_p93479485_cargo_map_integratio.drivers(lat, lng);
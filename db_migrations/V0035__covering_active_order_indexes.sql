@@ -0,0 +1,18 @@
+-- get_orders читает одну активную заявку перевозчика и открытые заявки отправителя.
+-- Частичные индексы хранят только такие строки, а INCLUDE — все выбираемые столбцы,
+-- поэтому запрос выполняется как Index Only Scan без чтения таблицы
+CREATE INDEX IF NOT EXISTS idx_orders_carrier_active_lookup
+    ON t_p93479485_cargo_map_integratio.orders_carrier(user_id, created_at DESC)
+    INCLUDE (id, vehicle_id, warehouse_marketplace, warehouse_city, warehouse_address,
+             capacity_boxes, capacity_pallets, latitude, longitude, status)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_orders_shipper_open_lookup
+    ON t_p93479485_cargo_map_integratio.orders_shipper(user_id, created_at DESC)
+    INCLUDE (id, sender_name, cargo_type, quantity, warehouse_marketplace, pickup_address,
+             pickup_date, pickup_time, contact_phone, latitude, longitude, status)
+    WHERE status IN ('pending', 'active');
+
+-- Других запросов по user_id к этим таблицам нет: индексы только по user_id из V0027 не нужны
+DROP INDEX IF EXISTS t_p93479485_cargo_map_integratio.idx_orders_carrier_user_id;
+DROP INDEX IF EXISTS t_p93479485_cargo_map_integratio.idx_orders_shipper_user_id;
@@ -0,0 +1,30 @@
+-- Поиск открытых заявок рядом с точкой (orders, geo_search.py): bounding box по
+-- latitude/longitude среди открытых заявок
+CREATE INDEX IF NOT EXISTS idx_orders_shipper_open_coordinates
+    ON t_p93479485_cargo_map_integratio.orders_shipper(latitude, longitude)
+    WHERE status IN ('pending', 'active');
+
+CREATE INDEX IF NOT EXISTS idx_orders_carrier_active_coordinates
+    ON t_p93479485_cargo_map_integratio.orders_carrier(latitude, longitude)
+    WHERE status = 'active';
+
+-- Если в базе установлен PostGIS, дополнительно строим GiST-индексы по geography:
+-- geo_search.py видит их по имени и переходит на ST_DWithin. Выражение индекса должно
+-- совпадать с GEOGRAPHY в geo_search.py
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'postgis') THEN
+        EXECUTE $sql$
+            CREATE INDEX IF NOT EXISTS idx_orders_shipper_open_geog
+                ON t_p93479485_cargo_map_integratio.orders_shipper
+                USING GIST ((ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326)::geography))
+                WHERE status IN ('pending', 'active')
+        $sql$;
+        EXECUTE $sql$
+            CREATE INDEX IF NOT EXISTS idx_orders_carrier_active_geog
+                ON t_p93479485_cargo_map_integratio.orders_carrier
+                USING GIST ((ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326)::geography))
+                WHERE status = 'active'
+        $sql$;
+    END IF;
+END $$;
@@ -0,0 +1,20 @@
+-- Задания на очистку таблиц из админки (purge.py в admin-auth и db-maintenance).
+-- Строки удаляются пачками, прогресс пишется в ту же транзакцию, что и пачка;
+-- незавершённые задания добирает задача run_purge_jobs в db-maintenance
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.purge_jobs (
+    id SERIAL PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    mode VARCHAR(16) NOT NULL DEFAULT 'delete' CHECK (mode IN ('delete', 'truncate')),
+    status VARCHAR(16) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed')),
+    requested_by INTEGER,
+    deleted_rows BIGINT NOT NULL DEFAULT 0,
+    batches INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_purge_jobs_open
+    ON t_p93479485_cargo_map_integratio.purge_jobs(created_at)
+    WHERE status IN ('pending', 'running');
@@ -0,0 +1,18 @@
+-- Кеш проверок водительских удостоверений (verify-license): ответ провайдера по ключу
+-- (license_number, birth_date) хранится до expires_at; истёкшие строки удаляет
+-- задача reap_expired_auth в db-maintenance (REAP_TARGETS)
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.license_checks (
+    id BIGSERIAL PRIMARY KEY,
+    license_number VARCHAR(20) NOT NULL,
+    birth_date DATE NOT NULL,
+    provider VARCHAR(32) NOT NULL,
+    status VARCHAR(16) NOT NULL CHECK (status IN ('valid', 'invalid', 'not_found')),
+    details JSONB NOT NULL DEFAULT '{}',
+    checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    UNIQUE (license_number, birth_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_license_checks_expires_at
+    ON t_p93479485_cargo_map_integratio.license_checks(expires_at);
+
@@ -0,0 +1,10 @@
+-- Список машин перевозчика (vehicles-unified get_vehicles) листается keyset-страницами
+-- по (created_at DESC, id DESC) внутри user_id. Составной индекс отдаёт страницу без сортировки
+-- и заменяет индекс только по user_id; курсору нужен created_at без NULL
+UPDATE t_p93479485_cargo_map_integratio.vehicles SET created_at = NOW() WHERE created_at IS NULL;
+ALTER TABLE t_p93479485_cargo_map_integratio.vehicles ALTER COLUMN created_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_vehicles_user_created
+    ON t_p93479485_cargo_map_integratio.vehicles(user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS t_p93479485_cargo_map_integratio.idx_vehicles_user_id;
@@ -0,0 +1,53 @@
+-- Остаток вместимости заявки перевозчика хранится в самой заявке и меняется в той же
+-- транзакции, что и назначение груза: поиск машин и карта читают готовое значение.
+-- Инвариант: remaining_* = capacity_* + сумма delta в capacity_ledger по этой заявке
+ALTER TABLE t_p93479485_cargo_map_integratio.orders_carrier
+    ADD COLUMN IF NOT EXISTS remaining_boxes INTEGER,
+    ADD COLUMN IF NOT EXISTS remaining_pallets INTEGER;
+
+UPDATE t_p93479485_cargo_map_integratio.orders_carrier
+SET remaining_boxes = COALESCE(capacity_boxes, 0), remaining_pallets = COALESCE(capacity_pallets, 0)
+WHERE remaining_boxes IS NULL OR remaining_pallets IS NULL;
+
+ALTER TABLE t_p93479485_cargo_map_integratio.orders_carrier
+    ALTER COLUMN remaining_boxes SET DEFAULT 0,
+    ALTER COLUMN remaining_boxes SET NOT NULL,
+    ALTER COLUMN remaining_pallets SET DEFAULT 0,
+    ALTER COLUMN remaining_pallets SET NOT NULL,
+    ADD CONSTRAINT orders_carrier_remaining_check CHECK (remaining_boxes >= 0 AND remaining_pallets >= 0);
+
+-- Назначение груза: заявка отправителя занята не более чем одной заявкой перевозчика
+ALTER TABLE t_p93479485_cargo_map_integratio.orders_shipper
+    ADD COLUMN IF NOT EXISTS carrier_order_id UUID;
+
+CREATE INDEX IF NOT EXISTS idx_orders_shipper_carrier_order
+    ON t_p93479485_cargo_map_integratio.orders_shipper(carrier_order_id)
+    WHERE carrier_order_id IS NOT NULL;
+
+-- Журнал движений: резерв пишется с отрицательной delta, освобождение — с положительной.
+-- Строки только добавляются и переживают удаление заявок
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.capacity_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    carrier_order_id UUID NOT NULL,
+    shipper_order_id UUID NOT NULL,
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('reserve', 'release')),
+    cargo_type VARCHAR(20) NOT NULL CHECK (cargo_type IN ('box', 'pallet')),
+    delta INTEGER NOT NULL,
+    user_id VARCHAR(255),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_capacity_ledger_carrier_order
+    ON t_p93479485_cargo_map_integratio.capacity_ledger(carrier_order_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_capacity_ledger_shipper_order
+    ON t_p93479485_cargo_map_integratio.capacity_ledger(shipper_order_id, created_at);
+
+-- get_orders и карта читают остаток вместе с активной заявкой: пересобираем покрывающий
+-- индекс из V0035, чтобы запрос оставался Index Only Scan
+DROP INDEX IF EXISTS t_p93479485_cargo_map_integratio.idx_orders_carrier_active_lookup;
+CREATE INDEX IF NOT EXISTS idx_orders_carrier_active_lookup
+    ON t_p93479485_cargo_map_integratio.orders_carrier(user_id, created_at DESC)
+    INCLUDE (id, vehicle_id, warehouse_marketplace, warehouse_city, warehouse_address,
+             capacity_boxes, capacity_pallets, remaining_boxes, remaining_pallets,
+             latitude, longitude, status)
+    WHERE status = 'active';
@@ -0,0 +1,32 @@
+-- История координат водителей (map-data, location_history.py). Таблица секционирована по
+-- суткам UTC: запись идёт в одну свежую секцию, трек за период читает только свои сутки,
+-- а удаление старой истории — DROP секции задачей rotate_driver_locations (db-maintenance).
+-- Секции по умолчанию нет: точка вне созданных суток — ошибка, на которую map-data
+-- отвечает созданием секции
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.driver_locations (
+    driver_id VARCHAR(50) NOT NULL,
+    recorded_at TIMESTAMP NOT NULL,
+    lat DOUBLE PRECISION NOT NULL,
+    lng DOUBLE PRECISION NOT NULL,
+    accuracy REAL,
+    speed REAL,
+    heading REAL
+) PARTITION BY RANGE (recorded_at);
+
+-- Индекс создаётся в каждой секции: трек водителя за период — один проход по индексу
+CREATE INDEX IF NOT EXISTS idx_driver_locations_driver_recorded
+    ON t_p93479485_cargo_map_integratio.driver_locations(driver_id, recorded_at);
+
+-- Секции на сегодня и двое суток вперёд; дальше их готовит rotate_driver_locations
+DO $$
+DECLARE
+    day DATE;
+BEGIN
+    FOR day IN SELECT generate_series((NOW() AT TIME ZONE 'UTC')::date, (NOW() AT TIME ZONE 'UTC')::date + 2, '1 day')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.%I PARTITION OF t_p93479485_cargo_map_integratio.driver_locations FOR VALUES FROM (%L) TO (%L)',
+            'driver_locations_' || to_char(day, 'YYYYMMDD'), day::timestamp, (day + 1)::timestamp
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,52 @@
+-- Геозоны назначенных грузов (orders, geofences.py): точка забора груза и склад заявки
+-- перевозчика. map-data проверяет каждую пачку координат водителя только по его активным
+-- геозонам (geofence.py) и пишет входы и выходы в geofence_events; по ним заявка отправителя
+-- получает picked_up_at и переходит в completed без ручной смены статуса.
+-- inside — текущее присутствие водителя в зоне, от него считаются переходы
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.geofences (
+    id BIGSERIAL PRIMARY KEY,
+    driver_id VARCHAR(255) NOT NULL,
+    kind VARCHAR(20) NOT NULL CHECK (kind IN ('pickup', 'warehouse')),
+    shipper_order_id UUID NOT NULL,
+    carrier_order_id UUID NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    radius_m REAL NOT NULL CHECK (radius_m > 0),
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    inside BOOLEAN NOT NULL DEFAULT FALSE,
+    changed_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Пачка координат ищет геозоны своего водителя в bounding box пачки; выключенные зоны
+-- (доставленные и снятые грузы) в индекс не попадают
+CREATE INDEX IF NOT EXISTS idx_geofences_driver_active
+    ON t_p93479485_cargo_map_integratio.geofences(driver_id, latitude, longitude)
+    WHERE active;
+
+-- У груза одна активная зона каждого вида; после снятия и повторного назначения создаётся новая
+CREATE UNIQUE INDEX IF NOT EXISTS idx_geofences_shipper_order_kind
+    ON t_p93479485_cargo_map_integratio.geofences(shipper_order_id, kind)
+    WHERE active;
+
+CREATE TABLE IF NOT EXISTS t_p93479485_cargo_map_integratio.geofence_events (
+    id BIGSERIAL PRIMARY KEY,
+    geofence_id BIGINT NOT NULL,
+    driver_id VARCHAR(255) NOT NULL,
+    shipper_order_id UUID NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    event VARCHAR(10) NOT NULL CHECK (event IN ('enter', 'exit')),
+    recorded_at TIMESTAMP NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_geofence_events_shipper_order
+    ON t_p93479485_cargo_map_integratio.geofence_events(shipper_order_id, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_geofence_events_driver
+    ON t_p93479485_cargo_map_integratio.geofence_events(driver_id, recorded_at);
+
+ALTER TABLE t_p93479485_cargo_map_integratio.orders_shipper
+    ADD COLUMN IF NOT EXISTS picked_up_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMP;
@@ -0,0 +1,7 @@
+-- Номер машины хранится без пробелов в верхнем регистре (vehicles-unified, validate_car_number):
+-- импорт парка сравнивает номера как есть, и «а123вс 77», сохранённый раньше, не совпадал
+-- с «А123ВС77» из файла. Приводим старые строки к тому же виду
+UPDATE t_p93479485_cargo_map_integratio.vehicles
+SET car_number = UPPER(regexp_replace(car_number, '[[:space:]]', '', 'g')),
+    updated_at = NOW()
+WHERE car_number <> UPPER(regexp_replace(car_number, '[[:space:]]', '', 'g'));
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Замер холодного старта backend-функций: каждая функция импортируется и вызывается
+в свежем интерпретаторе (python -X importtime) на локальных заглушках
+Использование: DATABASE_URL=postgresql://... python3 scripts/bench_cold_start.py
+               [--runs 5] [--budget-ms 200] [--top 4] [--json] [function ...]
+
+Для каждой функции печатает медиану по запускам: время `import index`, первый вызов
+handler (событие — первый тест из tests.json, иначе OPTIONS), повторный тёплый вызов
+и самые дорогие прямые импорты index (отдельный запуск под -X importtime, мс). Telegram подменяется локальным сервером
+(TELEGRAM_API_URL), база — DATABASE_URL из окружения.
+Код выхода 1, если импорт какой-либо функции дольше --budget-ms.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from harness import BACKEND, FakeTelegram, build_event, list_functions, load_tests, stand_in_env
+
+CHILD = r"""
+import json, sys, time, types
+event = json.loads(sys.argv[1])
+context = types.SimpleNamespace(request_id='cold-start', function_name=sys.argv[2])
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+response = index.handler(event, context)
+first = time.perf_counter()
+index.handler(event, context)
+warm = time.perf_counter()
+sys.__stdout__.write('\n@@' + json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_ms': (first - imported) * 1000,
+    'warm_ms': (warm - first) * 1000,
+    'status': response.get('statusCode'),
+}) + '\n')
+"""
+
+
+def parse_importtime(stderr):
+    '''
+    Прямые импорты модуля index: строки -X importtime на уровень глубже, идущие перед ним
+    '''
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative_us)))
+
+    direct = []
+    collecting = False
+    for depth, name, cumulative_us in reversed(entries):
+        if depth == 0:
+            if collecting:
+                break
+            collecting = name == 'index'
+        elif depth == 1 and collecting:
+            direct.append((name, cumulative_us / 1000))
+    return sorted(direct, key=lambda item: -item[1])
+
+
+def run_once(function, event, env, importtime=False):
+    flags = ['-X', 'importtime'] if importtime else []
+    proc = subprocess.run(
+        [sys.executable, *flags, '-c', CHILD, json.dumps(event), function],
+        cwd=os.path.join(BACKEND, function), env=env, capture_output=True, text=True, timeout=120
+    )
+    marker = proc.stdout.rfind('\n@@')
+    if proc.returncode != 0 or marker < 0:
+        tail = (proc.stderr.strip().splitlines() or ['no output'])[-1]
+        raise RuntimeError(f'{function}: {tail}')
+    result = json.loads(proc.stdout[marker + 3:].strip())
+    result['imports'] = parse_importtime(proc.stderr) if importtime else []
+    return result
+
+
+def pick_event(function):
+    tests = load_tests(function)
+    if tests:
+        return tests[0].get('name', 'test'), build_event(tests[0])
+    return 'OPTIONS', {'httpMethod': 'OPTIONS', 'headers': {}, 'body': ''}
+
+
+def measure(function, runs, env):
+    label, event = pick_event(function)
+    # -X importtime сам замедляет импорт, поэтому разбивка снимается отдельным запуском
+    profiled = run_once(function, event, env, importtime=True)
+    samples = [run_once(function, event, env) for _ in range(runs)]
+
+    return {
+        'function': function,
+        'event': label,
+        'status': samples[-1]['status'],
+        'import_ms': statistics.median(s['import_ms'] for s in samples),
+        'first_ms': statistics.median(s['first_ms'] for s in samples),
+        'warm_ms': statistics.median(s['warm_ms'] for s in samples),
+        'imports': profiled['imports'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('functions', nargs='*')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=200)
+    parser.add_argument('--top', type=int, default=4)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        print('DATABASE_URL is not set: handlers that touch the database will fail', file=sys.stderr)
+
+    results = []
+    with FakeTelegram() as telegram:
+        env = stand_in_env(telegram.url)
+        for function in list_functions(args.functions):
+            try:
+                results.append(measure(function, args.runs, env))
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                print(f"[ERROR] {e}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'function':<24} {'import':>9} {'first':>9} {'warm':>8} {'status':>6}  top imports")
+        for r in results:
+            top = ', '.join(f'{name} {ms:.0f}' for name, ms in r['imports'][:args.top])
+            flag = ' !' if r['import_ms'] > args.budget_ms else ''
+            print(f"{r['function']:<24} {r['import_ms']:>7.1f}ms {r['first_ms']:>7.1f}ms "
+                  f"{r['warm_ms']:>6.1f}ms {r['status']!s:>6}  {top}{flag}")
+
+    over = [r['function'] for r in results if r['import_ms'] > args.budget_ms]
+    if over:
+        print(f"\nimport budget {args.budget_ms:.0f}ms exceeded: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации ответов: json.dumps с ручными преобразованиями полей
+против http_helpers.dumps (orjson, если установлен, иначе json с default)
+Использование: python3 scripts/bench_json_responses.py [--markers 500] [--iterations 500]
+
+Полезная нагрузка повторяет ответ map-data: маркеры с Decimal-координатами,
+датами и UUID, как их возвращает psycopg2.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'admin-auth'))
+import http_helpers
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def build_rows(count):
+    started = datetime(2024, 1, 1, 9, 0)
+    return [
+        {
+            'id': uuid.uuid4(),
+            'type': 'cargo' if i % 2 else 'driver',
+            'lat': Decimal('55.755800') + Decimal(i) / 10000,
+            'lng': Decimal('37.617300') + Decimal(i) / 10000,
+            'name': f'Груз #КГ-{i:04d}',
+            'weight': Decimal('500.00') + i,
+            'readyTime': started + timedelta(minutes=i),
+            'clientRating': Decimal('4.8'),
+        }
+        for i in range(count)
+    ]
+
+
+def manual(rows):
+    markers = [
+        {
+            'id': str(row['id']),
+            'type': row['type'],
+            'lat': float(row['lat']),
+            'lng': float(row['lng']),
+            'name': row['name'],
+            'weight': float(row['weight']),
+            'readyTime': row['readyTime'].isoformat() if row['readyTime'] else None,
+            'clientRating': float(row['clientRating']),
+        }
+        for row in rows
+    ]
+    return json.dumps({'markers': markers})
+
+
+def helpers(rows):
+    return http_helpers.dumps({'markers': rows})
+
+
+def measure(func, rows, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func(rows)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--markers', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    rows = build_rows(args.markers)
+    assert json.loads(manual(rows)) == json.loads(helpers(rows))
+
+    encoder = 'orjson' if http_helpers.orjson is not None else 'json'
+    print(f"{'variant':<28} {'p50':>9} {'p95':>9}")
+    results = {}
+    for name, func in (('json.dumps + manual fields', manual), (f'http_helpers.dumps ({encoder})', helpers)):
+        samples = measure(func, rows, args.iterations)
+        results[name] = statistics.median(samples)
+        print(f"{name:<28} {results[name]:>7.3f}ms {percentile(samples, 95):>7.3f}ms")
+
+    baseline, fast = results.values()
+    print(f"\nspeedup: {baseline / fast:.2f}x on {args.markers} markers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк get_orders (backend/orders): активная заявка перевозчика и открытые заявки
+отправителя на больших orders_carrier / orders_shipper
+Использование: DATABASE_URL=postgresql://... python3 scripts/bench_order_lookup.py
+               [--iterations 2000] [--sample 200] [--compare [--compare-iterations 50]] [--no-vacuum]
+
+Данные — из scripts/generate_data.py (например --rows orders_carrier=10000000).
+Перед замером выполняется VACUUM ANALYZE: без карты видимости Index Only Scan всё равно
+ходит в таблицу. Печатает план (узел, индекс, Heap Fetches, буферы) и задержку
+p50/p95 вызова get_orders. С --compare то же самое повторяется без покрывающих индексов
+из V0035 — они удаляются в транзакции, которая затем откатывается; без них запрос
+на миллионах строк медленный, поэтому итераций меньше (--compare-iterations).
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'orders'))
+import index  # noqa: E402
+import psycopg2  # noqa: E402
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+COVERING_INDEXES = ['idx_orders_carrier_active_lookup', 'idx_orders_shipper_open_lookup']
+
+# Те же запросы, что в get_orders, — для EXPLAIN
+QUERIES = {
+    'carrier': """
+        SELECT id, vehicle_id, warehouse_marketplace, warehouse_city, warehouse_address,
+               capacity_boxes, capacity_pallets, latitude, longitude, status, created_at
+        FROM orders_carrier
+        WHERE user_id = %s AND status = 'active'
+        ORDER BY created_at DESC
+        LIMIT 1
+    """,
+    'shipper': """
+        SELECT id, sender_name, cargo_type, quantity, warehouse_marketplace,
+               pickup_address, pickup_date, pickup_time, contact_phone,
+               latitude, longitude, status, created_at
+        FROM orders_shipper
+        WHERE user_id = %s AND status IN ('pending', 'active')
+        ORDER BY created_at DESC
+    """,
+}
+
+TABLES = {'carrier': 'orders_carrier', 'shipper': 'orders_shipper'}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def sample_users(cur, role, size):
+    '''
+    Пользователи с открытыми заявками и случайные — у большинства запросов в бою ответ пустой
+    '''
+    table = TABLES[role]
+    cur.execute(f"""
+        SELECT user_id FROM {SCHEMA}.{table}
+        WHERE status IN ('pending', 'active')
+        GROUP BY user_id LIMIT %s
+    """, (size,))
+    users = [row[0] for row in cur.fetchall()]
+    cur.execute(f"SELECT user_id FROM {SCHEMA}.{table} TABLESAMPLE SYSTEM (1) LIMIT %s", (size,))
+    users.extend(row[0] for row in cur.fetchall())
+    return users or ['00000000-0000-0000-0000-000000000000']
+
+
+def plan_summary(cur, role, user_id):
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {QUERIES[role]}", (user_id,))
+    plan = cur.fetchone()[0]
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+
+    node = plan
+    while node.get('Plans') and node['Node Type'] in ('Limit', 'Sort', 'Result'):
+        node = node['Plans'][0]
+    return {
+        'node': node['Node Type'],
+        'index': node.get('Index Name', '-'),
+        'heap_fetches': node.get('Heap Fetches', '-'),
+        'buffers': plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0),
+    }
+
+
+def measure(conn, role, users, iterations):
+    latencies = []
+    for _ in range(iterations):
+        user_id = random.choice(users)
+        started = time.perf_counter()
+        index.get_orders(conn, user_id, role)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(label, conn, users, iterations):
+    with conn.cursor() as cur:
+        for role in QUERIES:
+            plan = plan_summary(cur, role, users[role][0])
+            latencies = measure(conn, role, users[role], iterations)
+            print(f"{label:<12} {role:<8} {plan['node']:<18} {plan['index']:<36} "
+                  f"{plan['heap_fetches']!s:>6} {plan['buffers']:>7} "
+                  f"{statistics.median(latencies):>7.3f}ms {percentile(latencies, 95):>7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--sample', type=int, default=200)
+    parser.add_argument('--compare', action='store_true', help='повторить без покрывающих индексов')
+    parser.add_argument('--compare-iterations', type=int, default=50)
+    parser.add_argument('--no-vacuum', action='store_true')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        if not args.no_vacuum:
+            for table in TABLES.values():
+                cur.execute(f"VACUUM ANALYZE {SCHEMA}.{table}")
+        for role, table in TABLES.items():
+            cur.execute(f"SELECT reltuples::bigint FROM pg_class WHERE oid = '{SCHEMA}.{table}'::regclass")
+            print(f"{table}: ~{cur.fetchone()[0]:,} rows")
+        users = {role: sample_users(cur, role, args.sample) for role in QUERIES}
+    print()
+
+    print(f"{'indexes':<12} {'role':<8} {'node':<18} {'index':<36} {'heap':>6} {'buffers':>7} "
+          f"{'p50':>9} {'p95':>9}")
+    report('covering', conn, users, args.iterations)
+
+    if args.compare:
+        conn.autocommit = False
+        with conn.cursor() as cur:
+            for name in COVERING_INDEXES:
+                cur.execute(f"DROP INDEX IF EXISTS {SCHEMA}.{name}")
+        try:
+            report('without', conn, users, args.compare_iterations)
+        finally:
+            conn.rollback()
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
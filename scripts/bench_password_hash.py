@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк стоимости scrypt для паролей администраторов (backend/admin-auth/passwords.py)
+Использование: python3 scripts/bench_password_hash.py [--budget-ms 500] [--burst 4] [--rounds 5]
+               [--min-log-n 12] [--max-log-n 17]
+
+Для каждого n считает p50/p99 одной проверки и p99 проверки в пачке из --burst
+одновременных входов через пул passwords.verify_password (с ожиданием в очереди).
+Рекомендует наибольшее n, при котором p99 пачки укладывается в бюджет входа, и завершается
+с кодом 1, если текущая стоимость (PASSWORD_SCRYPT_N) в бюджет не укладывается.
+База данных не нужна.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'admin-auth'))
+import passwords  # noqa: E402
+
+PASSWORD = 'correct-horse-42'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def single(stored, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        passwords.check_password(PASSWORD, stored)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def burst(stored, size, rounds):
+    '''
+    size клиентов одновременно вызывают verify_password; задержка включает ожидание в пуле
+    '''
+    latencies = []
+    lock = threading.Lock()
+
+    def login(barrier):
+        barrier.wait()
+        started = time.perf_counter()
+        passwords.verify_password(PASSWORD, stored, timeout=60)
+        with lock:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    for _ in range(rounds):
+        barrier = threading.Barrier(size)
+        clients = [threading.Thread(target=login, args=(barrier,)) for _ in range(size)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=500.0, help='бюджет p99 проверки пароля при входе')
+    parser.add_argument('--burst', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-log-n', type=int, default=12)
+    parser.add_argument('--max-log-n', type=int, default=17)
+    args = parser.parse_args()
+
+    print(f"cpus: {os.cpu_count()}, pool workers: {passwords.VERIFY_WORKERS}, "
+          f"r={passwords.SCRYPT_R}, p={passwords.SCRYPT_P}, budget p99: {args.budget_ms:.0f}ms\n")
+    print(f"{'n':>8} {'p50':>10} {'p99':>10} {'burst p99':>11}  fits")
+
+    fitting = None
+    results = {}
+    for log_n in range(args.min_log_n, args.max_log_n + 1):
+        n = 2 ** log_n
+        stored = passwords.hash_password(PASSWORD, n=n)
+        one = single(stored, args.rounds)
+        many = burst(stored, args.burst, args.rounds)
+        fits = percentile(many, 99) <= args.budget_ms
+        results[n] = fits
+        if fits:
+            fitting = n
+        print(f"{n:>8} {statistics.median(one):>8.1f}ms {percentile(one, 99):>8.1f}ms "
+              f"{percentile(many, 99):>9.1f}ms  {'yes' if fits else 'no'}")
+
+    print()
+    if fitting is None:
+        print(f"no n fits the budget with a burst of {args.burst}")
+    else:
+        print(f"largest n within budget: {fitting} (PASSWORD_SCRYPT_N={fitting})")
+
+    current = passwords.SCRYPT_N
+    if results.get(current) is False:
+        print(f"current PASSWORD_SCRYPT_N={current} exceeds the budget")
+        sys.exit(1)
+    print(f"current PASSWORD_SCRYPT_N={current}")
+
+
+if __name__ == '__main__':
+    main()
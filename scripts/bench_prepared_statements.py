@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк запросов admin-auth: f-string SQL против именованных prepared statements (db.py)
+Использование: DATABASE_URL=postgresql://... python3 scripts/bench_prepared_statements.py [--iterations 2000]
+
+Печатает задержку p50/p95 на запрос для обоих вариантов и статистику кэша планов
+из pg_prepared_statements (generic_plans / custom_plans, PostgreSQL 14+).
+Изменяющие запросы выполняются в транзакции, которая откатывается.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'admin-auth'))
+import db
+import queries  # noqa: F401 — регистрирует запросы admin-auth
+
+SCHEMA = queries.SCHEMA
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def pick_params(cur):
+    cur.execute(f"SELECT email, password_hash FROM {SCHEMA}.admins LIMIT 1")
+    admin = cur.fetchone() or ('bench@example.com', 'x')
+    cur.execute(f"SELECT user_id::text, phone FROM {SCHEMA}.users WHERE phone IS NOT NULL LIMIT 1")
+    user = cur.fetchone() or ('00000000-0000-0000-0000-000000000000', '+70000000000')
+    return admin, user
+
+
+def build_cases(admin, user):
+    email, _ = admin
+    user_id, phone = user
+    esc = lambda value: value.replace("'", "''")
+
+    return [
+        (
+            'admin_login',
+            (email,),
+            f"SELECT id, email, full_name, is_active, password_hash FROM {SCHEMA}.admins "
+            f"WHERE email = '{esc(email)}'"
+        ),
+        (
+            'user_id_by_phone',
+            (phone,),
+            f"SELECT user_id FROM {SCHEMA}.users WHERE phone = '{esc(phone)}'"
+        ),
+        (
+            'find_reset_code',
+            (email, '000000'),
+            f"SELECT id FROM {SCHEMA}.password_reset_codes "
+            f"WHERE email = '{esc(email)}' AND code = '000000' AND used = false AND expires_at > NOW() "
+            f"ORDER BY created_at DESC LIMIT 1"
+        ),
+        (
+            'update_profile',
+            (user_id, None, None, None, None, None, None, 55.75, 37.61),
+            f"UPDATE {SCHEMA}.users SET current_lat = 55.75, current_lng = 37.61, updated_at = NOW() "
+            f"WHERE user_id::text = '{esc(user_id)}'"
+        ),
+    ]
+
+
+def run_case(conn, cur, name, params, raw_sql, iterations):
+    fstring_ms, prepared_ms = [], []
+
+    for _ in range(iterations):
+        started = time.perf_counter()
+        cur.execute(raw_sql)
+        if cur.description:
+            cur.fetchall()
+        fstring_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        db.execute(cur, name, params)
+        if cur.description:
+            cur.fetchall()
+        prepared_ms.append((time.perf_counter() - started) * 1000)
+
+    conn.rollback()
+    return fstring_ms, prepared_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        sys.exit('DATABASE_URL is not set')
+
+    conn = db.get_connection()
+    cur = conn.cursor()
+    cases = build_cases(*pick_params(cur))
+    conn.rollback()
+
+    print(f"{'query':<20} {'f-string p50':>13} {'p95':>8} {'prepared p50':>13} {'p95':>8} {'speedup':>8}")
+    for name, params, raw_sql in cases:
+        fstring_ms, prepared_ms = run_case(conn, cur, name, params, raw_sql, args.iterations)
+        f50, p50 = statistics.median(fstring_ms), statistics.median(prepared_ms)
+        print(f"{name:<20} {f50:>11.3f}ms {percentile(fstring_ms, 95):>6.3f}ms "
+              f"{p50:>11.3f}ms {percentile(prepared_ms, 95):>6.3f}ms {f50 / p50:>7.2f}x")
+
+    cur.execute("SELECT name, generic_plans, custom_plans FROM pg_prepared_statements ORDER BY name")
+    print(f"\n{'statement':<20} {'generic':>8} {'custom':>8} {'plan cache hit':>15}")
+    for name, generic, custom in cur.fetchall():
+        total = generic + custom
+        print(f"{name:<20} {generic:>8} {custom:>8} {generic / total if total else 0:>14.1%}")
+
+    cur.close()
+    db.discard_connection()
+
+
+if __name__ == '__main__':
+    main()
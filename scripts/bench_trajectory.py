@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк упрощения и кодирования треков (backend/map-data/trajectory.py) на суточных треках.
+Использование: python3 scripts/bench_trajectory.py [--hours 24] [--interval 1] [--tracks 3]
+               [--tolerance-m 10] [--bucket-s 0] [--rounds 5] [--baseline]
+
+Генерирует трек водителя: городская езда с поворотами, GPS-шумом и стоянками, точка раз
+в --interval секунд. Для каждого трека печатает p50/p95 compact() (упрощение + polyline),
+число точек до и после, размер JSON-ответа raw и polyline и наибольшее отклонение
+исходных точек от упрощённой линии (не больше допуска; считается без --bucket-s).
+С --baseline для сравнения замеряет рекурсивный Дуглас — Пекер на чистом Python.
+База данных не нужна.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'map-data'))
+import trajectory  # noqa: E402
+
+METERS_PER_DEGREE = 111320.0
+
+
+def generate_track(hours, interval, seed):
+    rng = random.Random(seed)
+    count = int(hours * 3600 / interval)
+    lat, lng = 55.75 + rng.uniform(-0.1, 0.1), 37.62 + rng.uniform(-0.1, 0.1)
+    heading = rng.uniform(0, 2 * math.pi)
+    speed = 10.0
+    stop_left = 0
+    t, lats, lngs = [], [], []
+    for index in range(count):
+        if stop_left > 0:
+            stop_left -= 1
+            speed = 0.0
+        else:
+            if rng.random() < 0.0005:
+                stop_left = rng.randint(60, 1800) // interval
+            if rng.random() < 0.01:
+                heading += rng.choice((-1, 1)) * math.pi / 2
+            heading += rng.gauss(0, 0.02)
+            speed = min(25.0, max(0.0, speed + rng.gauss(0, 0.5)))
+        step = speed * interval
+        lat += step * math.cos(heading) / METERS_PER_DEGREE
+        lng += step * math.sin(heading) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        t.append(float(index * interval))
+        # GPS-шум около 3 м
+        lats.append(lat + rng.gauss(0, 3) / METERS_PER_DEGREE)
+        lngs.append(lng + rng.gauss(0, 3) / (METERS_PER_DEGREE * math.cos(math.radians(lat))))
+    return {'driver_id': 'bench', 'start': '2026-01-01T00:00:00', 'points': count,
+            'truncated': False, 't': t, 'lat': lats, 'lng': lngs}
+
+
+def baseline_douglas_peucker(points, tolerance_m):
+    '''
+    Рекурсивный вариант на списках — как его обычно пишут без NumPy
+    '''
+    origin = math.radians(sum(point[0] for point in points) / len(points))
+    xy = [(math.radians(lng) * math.cos(origin) * trajectory.EARTH_RADIUS_M,
+           math.radians(lat) * trajectory.EARTH_RADIUS_M) for lat, lng in points]
+    keep = [False] * len(xy)
+    keep[0] = keep[-1] = True
+
+    def visit(first, last):
+        if last - first < 2:
+            return
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        farthest, distance = first, -1.0
+        for index in range(first + 1, last):
+            x, y = xy[index]
+            d = math.hypot(x - x1, y - y1) if length == 0 else abs(dx * (y - y1) - dy * (x - x1)) / length
+            if d > distance:
+                farthest, distance = index, d
+        if distance > tolerance_m:
+            keep[farthest] = True
+            visit(first, farthest)
+            visit(farthest, last)
+
+    sys.setrecursionlimit(max(10000, len(points)))
+    visit(0, len(xy) - 1)
+    return [index for index, kept in enumerate(keep) if kept]
+
+
+def max_deviation(track, kept):
+    '''
+    Наибольшее расстояние (м) от исходной точки до отрезка упрощённой линии, которому она принадлежит
+    '''
+    points = trajectory._project(np.asarray(track['lat']), np.asarray(track['lng']))
+    worst = 0.0
+    for first, last in zip(kept[:-1], kept[1:]):
+        if last - first < 2:
+            continue
+        start, chord = points[first], points[last] - points[first]
+        offset = points[first + 1:last] - start
+        length = np.hypot(*chord)
+        if length == 0:
+            distances = np.hypot(offset[:, 0], offset[:, 1])
+        else:
+            distances = np.abs(chord[0] * offset[:, 1] - chord[1] * offset[:, 0]) / length
+        worst = max(worst, float(distances.max()))
+    return worst
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--interval', type=float, default=1, help='секунд между точками')
+    parser.add_argument('--tracks', type=int, default=3)
+    parser.add_argument('--tolerance-m', type=float, default=10)
+    parser.add_argument('--bucket-s', type=float, default=0)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--baseline', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{args.hours:g}h track, point every {args.interval:g}s, "
+          f"tolerance {args.tolerance_m:g}m, bucket {args.bucket_s:g}s\n")
+    print(f"{'track':>5} {'points':>8} {'kept':>7} {'p50':>9} {'p95':>9} {'raw':>10} {'polyline':>10} "
+          f"{'ratio':>7} {'max dev':>8}" + (f" {'python dp':>10}" if args.baseline else ''))
+
+    for seed in range(args.tracks):
+        track = generate_track(args.hours, args.interval, seed)
+        latencies = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            compact = trajectory.compact(track, args.tolerance_m, args.bucket_s)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        raw_size = len(json.dumps(track, separators=(',', ':')))
+        compact_size = len(json.dumps(compact, separators=(',', ':')))
+        kept = trajectory.simplify(track['t'], track['lat'], track['lng'], args.tolerance_m, args.bucket_s)
+        # С прореживанием по времени часть исходных точек отброшена до упрощения: отклонение не считаем
+        deviation = f"{max_deviation(track, kept.tolist()):.2f}m" if not args.bucket_s else '-'
+
+        line = (f"{seed:>5} {track['points']:>8} {compact['points']:>7} "
+                f"{statistics.median(latencies):>7.1f}ms {percentile(latencies, 95):>7.1f}ms "
+                f"{raw_size / 1024:>8.0f}KB {compact_size / 1024:>8.1f}KB "
+                f"{raw_size / compact_size:>6.0f}x {deviation:>8}")
+        if args.baseline:
+            started = time.perf_counter()
+            baseline = baseline_douglas_peucker(list(zip(track['lat'], track['lng'])), args.tolerance_m)
+            line += f" {(time.perf_counter() - started) * 1000:>8.0f}ms"
+            if not args.bucket_s and baseline != kept.tolist():
+                line += ' (differs)'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
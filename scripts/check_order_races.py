@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Проверка гонок назначения грузов (backend/orders, capacity.py) на живой базе
+Использование: DATABASE_URL=postgresql://... python3 scripts/check_order_races.py
+               [--iterations 50] [--workers 8]
+
+Сценарии с заданным порядком: вторая транзакция запускается, пока первая держит строки
+и ждёт разрешения на COMMIT, и проверяется, что вторая действительно ждала блокировку:
+  delete_during_reserve — заявку перевозчика удаляют, пока назначение на неё не закоммичено;
+  reserve_during_delete — груз назначают на заявку, удаление которой не закоммичено.
+Затем stress: назначения, снятия и удаления обеих сторон на одной заявке параллельно.
+После каждого сценария проверяются инварианты: нет грузов на несуществующих заявках,
+остаток заявки равен вместимости минус назначенные грузы, журнал capacity_ledger сходится.
+Взаимная блокировка (DeadlockDetected) — ошибка. Строки проверки удаляются в конце.
+Код выхода 1 при нарушении любого инварианта.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'orders'))
+import capacity  # noqa: E402
+import index  # noqa: E402
+import psycopg2  # noqa: E402
+from psycopg2 import errors, extensions  # noqa: E402
+from http_helpers import HttpError  # noqa: E402
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+RUN = uuid.uuid4().hex[:8]
+CARRIER_USER = f'race-carrier-{RUN}'
+SHIPPER_USER = f'race-shipper-{RUN}'
+
+LOCK_WAIT_SECONDS = 5
+
+
+class GatedConnection(extensions.connection):
+    '''
+    COMMIT ждёт gate: транзакция успевает взять все блокировки и стоит перед фиксацией
+    '''
+    gate = None
+
+    def commit(self):
+        if self.gate is not None:
+            self.gate.wait()
+        super().commit()
+
+
+def connect(dsn, gated=False):
+    return psycopg2.connect(dsn, connection_factory=GatedConnection if gated else None,
+                            options=f'-c search_path={SCHEMA},public')
+
+
+def create_carrier(cur, boxes=10):
+    cur.execute('''
+        INSERT INTO orders_carrier
+            (user_id, warehouse_marketplace, warehouse_city, warehouse_address,
+             capacity_boxes, capacity_pallets, remaining_boxes, remaining_pallets, status)
+        VALUES (%s, 'Wildberries', 'Москва', 'склад', %s, 0, %s, 0, 'active')
+        RETURNING id
+    ''', (CARRIER_USER, boxes, boxes))
+    return str(cur.fetchone()[0])
+
+
+def create_shipper(cur, quantity=3):
+    cur.execute('''
+        INSERT INTO orders_shipper
+            (user_id, sender_name, cargo_type, quantity, warehouse_marketplace, warehouse_city,
+             warehouse_address, pickup_address, pickup_date, pickup_time, contact_phone, status)
+        VALUES (%s, 'race', 'box', %s, 'Wildberries', 'Москва', 'склад', 'адрес',
+                CURRENT_DATE, '10:00', '+70000000000', 'pending')
+        RETURNING id
+    ''', (SHIPPER_USER, quantity))
+    return str(cur.fetchone()[0])
+
+
+def delete_event(order_id):
+    return {'body': json.dumps({'order_id': order_id})}
+
+
+def wait_for_lock(admin, conn):
+    '''
+    Ждёт, пока backend соединения conn встанет на блокировке строки
+    '''
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    with admin.cursor() as cur:
+        while time.monotonic() < deadline:
+            cur.execute("SELECT wait_event_type FROM pg_stat_activity WHERE pid = %s", (conn.get_backend_pid(),))
+            row = cur.fetchone()
+            if row and row[0] == 'Lock':
+                return True
+            time.sleep(0.01)
+    return False
+
+
+def run(target, *args):
+    '''
+    Поток с результатом: ответ, HttpError или исключение
+    '''
+    outcome = {}
+
+    def body():
+        try:
+            outcome['result'] = target(*args)
+        except HttpError as e:
+            outcome['http'] = e.status
+        except Exception as e:  # noqa: BLE001
+            outcome['error'] = e
+
+    thread = threading.Thread(target=body)
+    thread.start()
+    return thread, outcome
+
+
+def check_invariants(cur):
+    problems = []
+    cur.execute('''
+        SELECT s.id FROM orders_shipper s
+        WHERE s.user_id = %s AND s.carrier_order_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM orders_carrier c WHERE c.id = s.carrier_order_id)
+    ''', (SHIPPER_USER,))
+    problems += [f'shipper {row[0]} assigned to a deleted carrier order' for row in cur.fetchall()]
+
+    cur.execute('''
+        SELECT id FROM orders_shipper
+        WHERE user_id = %s AND (carrier_order_id IS NOT NULL) <> (status = 'active')
+    ''', (SHIPPER_USER,))
+    problems += [f'shipper {row[0]} status does not match its assignment' for row in cur.fetchall()]
+
+    cur.execute('''
+        SELECT c.id, c.remaining_boxes, c.capacity_boxes - COALESCE(SUM(s.quantity), 0)
+        FROM orders_carrier c
+        LEFT JOIN orders_shipper s ON s.carrier_order_id = c.id
+        WHERE c.user_id = %s
+        GROUP BY c.id
+        HAVING c.remaining_boxes <> c.capacity_boxes - COALESCE(SUM(s.quantity), 0)
+    ''', (CARRIER_USER,))
+    problems += [f'carrier {row[0]} remaining {row[1]}, expected {row[2]}' for row in cur.fetchall()]
+
+    # Журнал по каждому грузу: -quantity, пока груз назначен, иначе 0
+    cur.execute('''
+        SELECT l.shipper_order_id, SUM(l.delta), COALESCE(MAX(s.quantity) FILTER (WHERE s.carrier_order_id IS NOT NULL), 0)
+        FROM capacity_ledger l
+        LEFT JOIN orders_shipper s ON s.id = l.shipper_order_id
+        WHERE l.user_id IN (%s, %s)
+        GROUP BY l.shipper_order_id
+        HAVING SUM(l.delta) <> -COALESCE(MAX(s.quantity) FILTER (WHERE s.carrier_order_id IS NOT NULL), 0)
+    ''', (CARRIER_USER, SHIPPER_USER))
+    problems += [f'ledger for shipper {row[0]} sums to {row[1]}, assigned {row[2]}' for row in cur.fetchall()]
+    return problems
+
+
+def delete_during_reserve(dsn, admin):
+    with admin.cursor() as cur:
+        carrier_id, shipper_id = create_carrier(cur), create_shipper(cur)
+
+    reserving, deleting = connect(dsn, gated=True), connect(dsn)
+    reserving.gate = threading.Event()
+    try:
+        reserve_thread, reserved = run(capacity.reserve, reserving, CARRIER_USER, carrier_id, shipper_id)
+        time.sleep(0.2)
+        delete_thread, deleted = run(index.delete_order, deleting, CARRIER_USER, 'carrier', delete_event(carrier_id))
+        waited = wait_for_lock(admin, deleting)
+        reserving.gate.set()
+        reserve_thread.join()
+        delete_thread.join()
+    finally:
+        reserving.close()
+        deleting.close()
+
+    problems = [] if waited else ['delete did not wait for the uncommitted reserve']
+    if 'result' not in reserved:
+        problems.append(f'reserve failed: {reserved}')
+    if deleted.get('result', {}).get('statusCode') != 200:
+        problems.append(f'delete failed: {deleted}')
+    with admin.cursor() as cur:
+        cur.execute('SELECT status, carrier_order_id FROM orders_shipper WHERE id = %s', (shipper_id,))
+        if cur.fetchone() != ('pending', None):
+            problems.append('cargo was not returned to pending')
+    return problems
+
+
+def reserve_during_delete(dsn, admin):
+    with admin.cursor() as cur:
+        carrier_id, shipper_id = create_carrier(cur), create_shipper(cur)
+
+    deleting, reserving = connect(dsn, gated=True), connect(dsn)
+    deleting.gate = threading.Event()
+    try:
+        delete_thread, deleted = run(index.delete_order, deleting, CARRIER_USER, 'carrier', delete_event(carrier_id))
+        time.sleep(0.2)
+        reserve_thread, reserved = run(capacity.reserve, reserving, CARRIER_USER, carrier_id, shipper_id)
+        waited = wait_for_lock(admin, reserving)
+        deleting.gate.set()
+        delete_thread.join()
+        reserve_thread.join()
+    finally:
+        deleting.close()
+        reserving.close()
+
+    problems = [] if waited else ['reserve did not wait for the uncommitted delete']
+    if reserved.get('http') != 409:
+        problems.append(f'reserve on a deleted carrier order: {reserved}, expected 409')
+    if deleted.get('result', {}).get('statusCode') != 200:
+        problems.append(f'delete failed: {deleted}')
+    return problems
+
+
+def stress(dsn, admin, workers):
+    with admin.cursor() as cur:
+        carrier_id = create_carrier(cur)
+        shipper_ids = [create_shipper(cur, quantity=random.randint(1, 4)) for _ in range(workers)]
+
+    def operation(shipper_id):
+        conn = connect(dsn)
+        try:
+            choice = random.choice(('reserve', 'reserve', 'release', 'delete_shipper', 'delete_carrier'))
+            if choice == 'reserve':
+                return capacity.reserve(conn, CARRIER_USER, carrier_id, shipper_id)
+            if choice == 'release':
+                return capacity.release(conn, SHIPPER_USER, shipper_id)
+            if choice == 'delete_shipper':
+                return index.delete_order(conn, SHIPPER_USER, 'shipper', delete_event(shipper_id))
+            return index.delete_order(conn, CARRIER_USER, 'carrier', delete_event(carrier_id))
+        finally:
+            conn.close()
+
+    # Сначала часть грузов назначается, затем все операции стартуют одновременно
+    for shipper_id in shipper_ids[:workers // 2]:
+        conn = connect(dsn)
+        try:
+            capacity.reserve(conn, CARRIER_USER, carrier_id, shipper_id)
+        except HttpError:
+            pass
+        finally:
+            conn.close()
+
+    threads = [run(operation, shipper_id) for shipper_id in shipper_ids]
+    problems = []
+    for thread, outcome in threads:
+        thread.join()
+        if isinstance(outcome.get('error'), errors.DeadlockDetected):
+            problems.append('deadlock detected')
+        elif 'error' in outcome:
+            problems.append(f"unexpected error: {outcome['error']!r}")
+    return problems
+
+
+def cleanup(admin):
+    with admin.cursor() as cur:
+        cur.execute('''
+            DELETE FROM geofences WHERE shipper_order_id IN (SELECT id FROM orders_shipper WHERE user_id = %s)
+               OR carrier_order_id IN (SELECT id FROM orders_carrier WHERE user_id = %s)
+        ''', (SHIPPER_USER, CARRIER_USER))
+        cur.execute('DELETE FROM capacity_ledger WHERE user_id IN (%s, %s)', (CARRIER_USER, SHIPPER_USER))
+        cur.execute('DELETE FROM orders_shipper WHERE user_id = %s', (SHIPPER_USER,))
+        cur.execute('DELETE FROM orders_carrier WHERE user_id = %s', (CARRIER_USER,))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=50, help='повторов stress')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    admin = connect(dsn)
+    admin.autocommit = True
+    failed = 0
+    try:
+        scenarios = [('delete_during_reserve', lambda: delete_during_reserve(dsn, admin)),
+                     ('reserve_during_delete', lambda: reserve_during_delete(dsn, admin))]
+        scenarios += [(f'stress #{i + 1}', lambda: stress(dsn, admin, args.workers)) for i in range(args.iterations)]
+        for name, scenario in scenarios:
+            with admin.cursor() as cur:
+                problems = scenario() + check_invariants(cur)
+            if problems:
+                failed += 1
+                print(f"FAIL {name}")
+                for problem in problems:
+                    print(f"    {problem}")
+            elif not name.startswith('stress'):
+                print(f"ok   {name}")
+        print(f"\n{len(scenarios)} scenarios, {failed} failed")
+    finally:
+        cleanup(admin)
+        admin.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
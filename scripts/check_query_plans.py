@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Регрессионная проверка планов: каждый SQL-запрос backend-функций прогоняется через
+EXPLAIN (FORMAT JSON) на базе с большим объёмом данных (см. generate_data.py)
+Использование: DATABASE_URL=postgresql://... python3 scripts/check_query_plans.py
+               [--min-rows 10000] [--verbose] [--json] [function ...]
+
+Запросы собираются из исходников без их запуска: аргументы cur.execute(...) и
+db.register(...) — строки, f-строки с {SCHEMA} и переменные, которым строка присвоена в той
+же функции. Запросы с динамическими частями (собранные WHERE, имена таблиц из
+параметров) пропускаются и перечисляются с --verbose.
+Параметры %s / %(name)s заменяются на $n, план строится как generic (plan_cache_mode =
+force_generic_plan), т.е. без учёта конкретных значений — так же, как его выполняет
+prepared statement на тёплом соединении.
+
+Код выхода 1, если в плане есть Seq Scan по таблице больше --min-rows строк и он
+не перечислен в ALLOWED_SEQ_SCANS.
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+
+import psycopg2
+
+from harness import BACKEND, list_functions
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+# (файл относительно backend/, функция, таблица) -> почему полный проход допустим
+ALLOWED_SEQ_SCANS = {
+    ('map-data/index.py', 'handler', 'users'): 'GET /stats считает агрегаты по всей таблице',
+    ('admin-auth/actions/users.py', 'get_users', 'users'): 'полный список пользователей без пагинации',
+    ('admin-auth/actions/users.py', 'get_all_users', 'users'): 'полный список пользователей без пагинации',
+    ('admin-auth/actions/deliveries.py', 'get_deliveries', 'deliveries'): 'полный список доставок без пагинации',
+    ('admin-auth/actions/stats.py', 'get_stats', 'users'): 'счётчики панели — агрегаты по всей таблице',
+    ('admin-auth/actions/stats.py', 'get_stats', 'deliveries'): 'счётчики панели — агрегаты по всей таблице',
+    ('admin-auth/actions/stats.py', 'get_stats', 'carriers'): 'счётчик водителей панели — COUNT(*) по всей таблице',
+    ('admin-auth/actions/stats.py', 'get_user_analytics', 'users'): 'аналитика группирует всю таблицу',
+}
+
+SQL_START = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+NAMED_PARAM = re.compile(r'%\((\w+)\)s')
+
+
+# --- сбор запросов из исходников -------------------------------------------------------
+
+class Dynamic(Exception):
+    pass
+
+
+class StatementCollector(ast.NodeVisitor):
+    '''
+    Находит SQL в вызовах cur.execute / db.register и восстанавливает его текст
+    '''
+
+    def __init__(self, path, constants):
+        self.path = path
+        self.constants = constants
+        self.scopes = [{}]
+        self.functions = ['<module>']
+        self.statements = []
+        self.dynamic = []
+
+    def visit_FunctionDef(self, node):
+        self.scopes.append(collect_assignments(node, self.constants))
+        self.functions.append(node.name)
+        self.generic_visit(node)
+        self.functions.pop()
+        self.scopes.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+        arg, label = None, self.functions[-1]
+        if name == 'execute' and node.args and not _is_db_module(func):
+            arg = node.args[0]
+        elif name == 'register' and len(node.args) >= 2:
+            arg = node.args[1]
+            # именованный запрос подписывается своим именем, а не местом регистрации
+            if isinstance(node.args[0], ast.Constant):
+                label = node.args[0].value
+
+        if arg is not None:
+            try:
+                sql = render(arg, {**self.constants, **self.scopes[-1]})
+            except Dynamic as e:
+                self.dynamic.append((self.path, label, node.lineno, str(e)))
+            else:
+                if SQL_START.match(sql):
+                    self.statements.append({
+                        'path': self.path,
+                        'function': label,
+                        'line': node.lineno,
+                        'sql': sql,
+                    })
+        self.generic_visit(node)
+
+
+def _is_db_module(func):
+    # db.execute(cur, 'name', ...) исполняет уже зарегистрированный запрос
+    return isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'db'
+
+
+def render(node, names):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and value.value.id in names:
+                parts.append(names[value.value.id])
+            else:
+                raise Dynamic(ast.unparse(value.value))
+        return ''.join(parts)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return render(node.left, names) + render(node.right, names)
+    if isinstance(node, ast.Name) and node.id in names:
+        return names[node.id]
+    raise Dynamic(ast.unparse(node))
+
+
+def collect_assignments(scope, constants):
+    '''
+    Строковые переменные области видимости; переменная, которой присваивают разное, — динамическая
+    '''
+    values, seen = {}, set()
+    for node in ast.walk(scope):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            target = node.targets[0].id
+            try:
+                value = render(node.value, {**constants, **values})
+            except Dynamic:
+                values.pop(target, None)
+                seen.add(target)
+                continue
+            if target in seen and values.get(target) != value:
+                values.pop(target, None)
+            elif target not in seen:
+                values[target] = value
+            seen.add(target)
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            values.pop(node.target.id, None)
+            seen.add(node.target.id)
+    return values
+
+
+def collect_statements(functions):
+    statements, dynamic = [], []
+    for function in functions:
+        root = os.path.join(BACKEND, function)
+        for folder, _, files in os.walk(root):
+            for filename in sorted(files):
+                if not filename.endswith('.py') or filename == 'db.py':
+                    continue
+                path = os.path.join(folder, filename)
+                with open(path, encoding='utf-8') as f:
+                    tree = ast.parse(f.read(), filename=path)
+
+                module_constants = {'SCHEMA': SCHEMA}
+                module_constants.update(collect_assignments(
+                    ast.Module(body=[n for n in tree.body if isinstance(n, ast.Assign)], type_ignores=[]),
+                    module_constants
+                ))
+                collector = StatementCollector(os.path.relpath(path, BACKEND), module_constants)
+                collector.visit(tree)
+                statements.extend(collector.statements)
+                dynamic.extend(collector.dynamic)
+    return statements, dynamic
+
+
+def to_positional(sql):
+    '''
+    %s / %(name)s -> $1, $2, ...; %% -> %
+    '''
+    if '$1' in sql:
+        return sql
+    names = {}
+
+    def named(match):
+        return f'${names.setdefault(match.group(1), len(names) + 1)}'
+
+    sql = NAMED_PARAM.sub(named, sql)
+    counter = iter(range(len(names) + 1, 10000))
+    sql = re.sub(r'(?<!%)%s', lambda _: f'${next(counter)}', sql)
+    return sql.replace('%%', '%')
+
+
+# --- планы -----------------------------------------------------------------------------
+
+def explain(cur, sql):
+    cur.execute("SAVEPOINT plan_check")
+    try:
+        cur.execute(f"PREPARE plan_check AS {sql}")
+        cur.execute("SELECT cardinality(parameter_types) FROM pg_prepared_statements WHERE name = 'plan_check'")
+        params = cur.fetchone()[0] or 0
+        arguments = f"({', '.join(['NULL'] * params)})" if params else ''
+        cur.execute(f"EXPLAIN (FORMAT JSON) EXECUTE plan_check{arguments}")
+        plan = cur.fetchone()[0]
+        cur.execute("DEALLOCATE plan_check")
+        cur.execute("RELEASE SAVEPOINT plan_check")
+        return (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan'], None
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT plan_check")
+        cur.execute("DEALLOCATE ALL")
+        return None, str(e).strip().splitlines()[0]
+
+
+def seq_scans(plan, parent=None):
+    '''
+    Seq Scan без фильтра прямо под Limit читает только первые строки — такой не считается
+    '''
+    if plan.get('Node Type') == 'Seq Scan':
+        bounded = parent is not None and parent.get('Node Type') == 'Limit' and 'Filter' not in plan
+        if not bounded:
+            yield plan.get('Relation Name'), plan.get('Plan Rows')
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child, plan)
+
+
+def table_sizes(cur):
+    cur.execute("""
+        SELECT c.relname, GREATEST(c.reltuples, 0)::bigint
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
+    """, (SCHEMA,))
+    return dict(cur.fetchall())
+
+
+def allowed(statement, relation):
+    for key in ((statement['path'], statement['function'], relation), (statement['path'], statement['function'], '*')):
+        if key in ALLOWED_SEQ_SCANS:
+            return ALLOWED_SEQ_SCANS[key]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('functions', nargs='*')
+    parser.add_argument('--min-rows', type=int, default=10000, help='с какого размера таблица считается большой')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    statements, dynamic = collect_statements(list_functions(args.functions))
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    sizes = table_sizes(cur)
+    if not any(rows >= args.min_rows for rows in sizes.values()):
+        print(f"[ERROR] No table has {args.min_rows}+ rows: load data with scripts/generate_data.py first",
+              file=sys.stderr)
+    cur.execute("SET plan_cache_mode = force_generic_plan")
+
+    results = []
+    for statement in statements:
+        plan, error = explain(cur, to_positional(statement['sql']))
+        violations, waived = [], []
+        for relation, _ in (seq_scans(plan) if plan else ()):
+            if sizes.get(relation, 0) < args.min_rows:
+                continue
+            reason = allowed(statement, relation)
+            (waived if reason else violations).append(relation)
+        results.append({**statement, 'error': error, 'seq_scans': violations, 'waived': waived,
+                        'cost': plan['Total Cost'] if plan else None})
+
+    conn.rollback()
+    cur.close()
+    conn.close()
+
+    failures = [r for r in results if r['seq_scans']]
+    errors = [r for r in results if r['error']]
+
+    if args.json:
+        print(json.dumps({'statements': results, 'dynamic': dynamic}, ensure_ascii=False, indent=2))
+    else:
+        for r in results:
+            where = f"{r['path']}:{r['line']} {r['function']}"
+            if r['seq_scans']:
+                print(f"SEQ SCAN  {where}: {', '.join(r['seq_scans'])} "
+                      f"({', '.join(str(sizes[t]) for t in r['seq_scans'])} rows)")
+            elif r['error']:
+                print(f"ERROR     {where}: {r['error']}")
+            elif args.verbose:
+                note = f" [allowed: {', '.join(r['waived'])}]" if r['waived'] else ''
+                print(f"ok        {where} cost={r['cost']:.0f}{note}")
+        if args.verbose:
+            for path, function, line, expression in dynamic:
+                print(f"skipped   {path}:{line} {function}: dynamic SQL ({expression})")
+        print(f"\n{len(results)} statements checked, {len(failures)} with seq scans on large tables, "
+              f"{len(errors)} could not be planned, {len(dynamic)} dynamic skipped")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
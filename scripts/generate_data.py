@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических данных для нагрузочных замеров: пользователи, перевозчики,
+автомобили, заявки, доставки, маркеры карты и роли в объёмах, близких к боевым
+Использование: DATABASE_URL=postgresql://... python3 scripts/generate_data.py
+               [--users 1000000] [--seed 42] [--rows cargo=200000 ...] [--truncate] [--force]
+
+Строки пишутся потоком через COPY FROM STDIN (без промежуточных файлов и списков в памяти),
+координаты — вокруг крупных городов России с весом по населению, статусы — с
+распределениями, похожими на боевые. Размеры таблиц выводятся из --users, любой можно
+переопределить через --rows table=N. Все сгенерированные строки помечены: email
+@load.test, cargo_id/driver_id с префиксом GEN-, поэтому их можно найти и удалить.
+По умолчанию работает только с локальной базой; для удалённой нужен --force.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+
+# Город, широта, долгота, население (тыс.) — вес при выборе точки
+CITIES = [
+    ('Москва', 55.7558, 37.6173, 13100),
+    ('Санкт-Петербург', 59.9343, 30.3351, 5600),
+    ('Новосибирск', 55.0084, 82.9357, 1630),
+    ('Екатеринбург', 56.8389, 60.6057, 1540),
+    ('Казань', 55.7961, 49.1064, 1310),
+    ('Нижний Новгород', 56.2965, 43.9361, 1230),
+    ('Челябинск', 55.1644, 61.4368, 1180),
+    ('Красноярск', 56.0153, 92.8932, 1190),
+    ('Самара', 53.1959, 50.1002, 1160),
+    ('Уфа', 54.7388, 55.9721, 1160),
+    ('Ростов-на-Дону', 47.2357, 39.7015, 1140),
+    ('Омск', 54.9885, 73.3242, 1110),
+    ('Краснодар', 45.0355, 38.9753, 1100),
+    ('Воронеж', 51.6720, 39.1843, 1050),
+    ('Пермь', 58.0105, 56.2502, 1030),
+    ('Волгоград', 48.7080, 44.5133, 1020),
+    ('Тюмень', 57.1530, 65.5343, 850),
+    ('Саратов', 51.5331, 46.0342, 830),
+    ('Тольятти', 53.5078, 49.4204, 680),
+    ('Ижевск', 56.8526, 53.2045, 630),
+    ('Барнаул', 53.3548, 83.7698, 630),
+    ('Иркутск', 52.2870, 104.3050, 610),
+    ('Хабаровск', 48.4802, 135.0719, 620),
+    ('Владивосток', 43.1155, 131.8855, 600),
+    ('Ярославль', 57.6261, 39.8845, 570),
+    ('Тула', 54.1931, 37.6173, 470),
+    ('Коледино', 55.3700, 37.5400, 300),
+    ('Электросталь', 55.7842, 38.4447, 160),
+]
+
+MARKETPLACES = ['Wildberries', 'Ozon', 'Яндекс Маркет', 'СберМегаМаркет', 'Lamoda']
+FIRST_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Иван', 'Михаил',
+               'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Ирина', 'Екатерина']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+              'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров']
+STREETS = ['Ленина', 'Мира', 'Советская', 'Гагарина', 'Садовая', 'Центральная', 'Молодёжная',
+           'Школьная', 'Промышленная', 'Заводская', 'Складская', 'Логистическая']
+CAR_MODELS = [('ГАЗ', 'Газель Next'), ('ГАЗ', 'Газон Next'), ('Ford', 'Transit'), ('Mercedes-Benz', 'Sprinter'),
+              ('Hyundai', 'Porter'), ('Isuzu', 'ELF'), ('КАМАЗ', '5490'), ('Volvo', 'FH'), ('Fiat', 'Ducato')]
+PLATE_LETTERS = 'АВЕКМНОРСТУХ'
+PLATE_REGIONS = ['77', '97', '99', '177', '197', '199', '777', '50', '90', '150', '78', '98', '178', '16', '66', '54']
+
+USER_TYPES = [('client', 55), ('carrier', 40), ('logist', 5)]
+CARRIER_VEHICLE_TYPES = [('car', 55), ('truck', 35), ('semi', 10)]
+CARRIER_STATUSES = [('free', 45), ('has_space', 35), ('full', 20)]
+ORDER_CARRIER_STATUSES = [('active', 25), ('completed', 60), ('cancelled', 15)]
+ORDER_SHIPPER_STATUSES = [('pending', 15), ('active', 15), ('completed', 60), ('cancelled', 10)]
+DELIVERY_STATUSES = [('pending', 10), ('in_progress', 10), ('completed', 72), ('cancelled', 8)]
+CARGO_STATUSES = [('waiting', 30), ('accepted', 20), ('delivered', 50)]
+DRIVER_STATUSES = [('free', 50), ('has_space', 30), ('full', 20)]
+
+DEFAULT_RATIOS = {
+    'users': 1.0,
+    'carriers': None,        # одна запись на пользователя-перевозчика
+    'vehicles': 0.55,
+    'orders_carrier': 0.8,
+    'orders_shipper': 1.5,
+    'deliveries': 2.0,
+    'drivers': 0.05,
+    'cargo': 0.1,
+    'user_roles': 0.002,
+}
+
+LOCAL_HOSTS = {'', 'localhost', '127.0.0.1', '::1'}
+
+
+class Random(random.Random):
+    '''
+    random.Random с выборками, нужными генератору; весы готовятся один раз на список
+    '''
+
+    def weighted(self, options):
+        values, weights = options
+        return self.choices(values, cum_weights=weights)[0]
+
+    def uuid4(self) -> uuid.UUID:
+        return uuid.UUID(int=self.getrandbits(128), version=4)
+
+    def point(self, spread: float = 0.12):
+        city = self.weighted(CITY_CHOICES)
+        return city[0], round(city[1] + self.gauss(0, spread), 6), round(city[2] + self.gauss(0, spread * 1.6), 6)
+
+    def moment(self, days_back: int) -> datetime:
+        return NOW - timedelta(seconds=self.randrange(days_back * 86400))
+
+    def person(self) -> str:
+        return f'{self.choice(LAST_NAMES)} {self.choice(FIRST_NAMES)}'
+
+    def address(self, city: str) -> str:
+        return f'г. {city}, ул. {self.choice(STREETS)}, д. {self.randint(1, 180)}'
+
+    def plate(self) -> str:
+        letters = PLATE_LETTERS
+        return (f'{self.choice(letters)}{self.randint(1, 999):03d}{self.choice(letters)}{self.choice(letters)}'
+                f'{self.choice(PLATE_REGIONS)}')
+
+
+def cumulative(options):
+    values, total, weights = [], 0, []
+    for value, weight in options:
+        total += weight
+        values.append(value)
+        weights.append(total)
+    return values, weights
+
+
+CITY_CHOICES = cumulative((city, city[3]) for city in CITIES)
+NOW = datetime.now().replace(microsecond=0)
+
+
+def copy_value(value) -> str:
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return str(value)
+
+
+class RowStream:
+    '''
+    Файлоподобный объект для copy_expert: строки TSV формируются по мере чтения
+    '''
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ''
+        self.count = 0
+
+    def read(self, size: int = 65536) -> str:
+        chunks = [self.buffer]
+        length = len(self.buffer)
+        for row in self.rows:
+            line = '\t'.join(copy_value(value) for value in row) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+            if length >= size:
+                break
+        data = ''.join(chunks)
+        self.buffer = data[size:]
+        return data[:size]
+
+    readline = read
+
+
+# --- генераторы строк по таблицам ---------------------------------------------------
+
+class Fleet:
+    '''
+    Идентификаторы, которые нужны дочерним таблицам: клиенты, перевозчики и их машины
+    '''
+
+    def __init__(self):
+        self.clients = []
+        self.carrier_users = []
+        self.carrier_ids = []
+        self.vehicles = []
+
+
+USER_COLUMNS = ('user_id', 'email', 'password_hash', 'full_name', 'user_type', 'entity_type', 'phone',
+                'email_verified', 'phone_verified', 'created_at', 'updated_at', 'telegram', 'telegram_chat_id',
+                'telegram_verified', 'role', 'role_status_set', 'carrier_status', 'client_status',
+                'current_lat', 'current_lng', 'rating', 'reviews_count', 'company', 'inn')
+
+
+def users_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    user_types = cumulative(USER_TYPES)
+    for n in range(offset, offset + count):
+        user_id = rng.uuid4()
+        user_type = rng.weighted(user_types)
+        legal = rng.random() < 0.25
+        created_at = rng.moment(730)
+        _, lat, lng = rng.point()
+        on_map = rng.random() < 0.6
+        with_telegram = rng.random() < 0.45
+
+        if user_type == 'client':
+            fleet.clients.append(user_id)
+        elif user_type == 'carrier':
+            fleet.carrier_users.append(user_id)
+
+        yield (
+            user_id, f'gen-{n}@load.test', 'GENERATED', rng.person(), user_type,
+            'legal' if legal else 'individual', f'+79{n % 1000000000:09d}',
+            rng.random() < 0.7, rng.random() < 0.8, created_at, created_at + timedelta(days=rng.randint(0, 60)),
+            f'gen_user_{n}' if with_telegram else None, 9_000_000_000 + n if with_telegram else None,
+            with_telegram,
+            user_type if on_map else None, on_map,
+            rng.choice(('free', 'has_space')) if on_map and user_type == 'carrier' else None,
+            rng.choice(('ready_now', 'ready_later')) if on_map and user_type == 'client' else None,
+            lat if on_map else None, lng if on_map else None,
+            round(rng.uniform(3.5, 5.0), 2), rng.randint(0, 300),
+            f'ООО «Груз-{n % 5000}»' if legal else None, f'77{n % 100000000:08d}' if legal else None,
+        )
+
+
+CARRIER_COLUMNS = ('carrier_id', 'user_id', 'vehicle_type', 'vehicle_status', 'capacity',
+                   'current_lat', 'current_lng', 'created_at')
+
+
+def carriers_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    vehicle_types = cumulative(CARRIER_VEHICLE_TYPES)
+    statuses = cumulative(CARRIER_STATUSES)
+    for user_id in fleet.carrier_users[:count]:
+        carrier_id = rng.uuid4()
+        fleet.carrier_ids.append(carrier_id)
+        _, lat, lng = rng.point()
+        yield (carrier_id, user_id, rng.weighted(vehicle_types), rng.weighted(statuses),
+               rng.choice((1500, 3500, 5000, 10000, 20000)), lat, lng, rng.moment(700))
+
+
+VEHICLE_COLUMNS = ('id', 'user_id', 'driver_name', 'driver_phone', 'driver_license_number', 'car_brand',
+                   'car_model', 'car_number', 'capacity_boxes', 'capacity_pallets', 'created_at')
+
+
+def vehicles_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    owners = fleet.carrier_users
+    for n in range(offset, offset + count):
+        vehicle_id = rng.uuid4()
+        owner = owners[n % len(owners)]
+        fleet.vehicles.append((vehicle_id, owner))
+        brand, model = rng.choice(CAR_MODELS)
+        yield (vehicle_id, str(owner), rng.person(), f'+79{rng.randrange(10 ** 9):09d}',
+               f'{rng.randrange(10 ** 10):010d}', brand, model, rng.plate(),
+               rng.choice((50, 120, 200, 400)), rng.choice((0, 2, 6, 12, 33)), rng.moment(700))
+
+
+ORDER_CARRIER_COLUMNS = ('id', 'user_id', 'vehicle_id', 'warehouse_marketplace', 'warehouse_city',
+                         'warehouse_address', 'capacity_boxes', 'capacity_pallets', 'status', 'created_at',
+                         'updated_at', 'latitude', 'longitude')
+
+
+def orders_carrier_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    statuses = cumulative(ORDER_CARRIER_STATUSES)
+    for n in range(count):
+        vehicle_id, owner = fleet.vehicles[rng.randrange(len(fleet.vehicles))]
+        city, lat, lng = rng.point()
+        created_at = rng.moment(365)
+        yield (rng.uuid4(), str(owner), vehicle_id, rng.choice(MARKETPLACES), city, rng.address(city),
+               rng.randint(0, 400), rng.randint(0, 33), rng.weighted(statuses), created_at,
+               created_at + timedelta(hours=rng.randint(0, 72)), lat, lng)
+
+
+ORDER_SHIPPER_COLUMNS = ('id', 'user_id', 'sender_name', 'cargo_type', 'quantity', 'warehouse_marketplace',
+                         'warehouse_city', 'warehouse_address', 'pickup_address', 'pickup_date', 'pickup_time',
+                         'contact_phone', 'status', 'created_at', 'updated_at', 'latitude', 'longitude')
+
+
+def orders_shipper_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    statuses = cumulative(ORDER_SHIPPER_STATUSES)
+    for n in range(count):
+        city, lat, lng = rng.point()
+        created_at = rng.moment(365)
+        pickup = created_at.date() + timedelta(days=rng.randint(0, 14))
+        yield (rng.uuid4(), str(fleet.clients[rng.randrange(len(fleet.clients))]), rng.person(),
+               rng.choice(('box', 'pallet')), rng.randint(1, 120), rng.choice(MARKETPLACES),
+               rng.weighted(CITY_CHOICES)[0], rng.address(city), rng.address(city), pickup,
+               f'{rng.randint(8, 20):02d}:{rng.choice((0, 30)):02d}', f'+79{rng.randrange(10 ** 9):09d}',
+               rng.weighted(statuses), created_at, created_at + timedelta(hours=rng.randint(0, 72)), lat, lng)
+
+
+DELIVERY_COLUMNS = ('delivery_id', 'client_id', 'pickup_address', 'delivery_address', 'warehouse_address',
+                    'cargo_quantity', 'cargo_unit', 'weight', 'delivery_date', 'delivery_price',
+                    'contact_phone', 'status', 'carrier_id', 'created_at', 'updated_at')
+
+
+def deliveries_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    statuses = cumulative(DELIVERY_STATUSES)
+    for n in range(count):
+        city, _, _ = rng.point()
+        status = rng.weighted(statuses)
+        created_at = rng.moment(365)
+        carrier = fleet.carrier_ids[rng.randrange(len(fleet.carrier_ids))] if status != 'pending' and fleet.carrier_ids else None
+        yield (rng.uuid4(), fleet.clients[rng.randrange(len(fleet.clients))], rng.address(city), rng.address(city),
+               rng.address(city), rng.randint(1, 60), rng.choice(('boxes', 'pallets')),
+               round(rng.uniform(5, 8000), 2), created_at.date() + timedelta(days=rng.randint(0, 10)),
+               round(rng.uniform(800, 60000), 2), f'+79{rng.randrange(10 ** 9):09d}', status, carrier,
+               created_at, created_at + timedelta(hours=rng.randint(0, 240)))
+
+
+DRIVER_COLUMNS = ('driver_id', 'name', 'vehicle_type', 'capacity', 'lat', 'lng', 'status', 'vehicle_category',
+                  'rating', 'free_space', 'destination_warehouse', 'phone', 'created_at', 'updated_at')
+
+
+def drivers_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    statuses = cumulative(DRIVER_STATUSES)
+    for n in range(offset, offset + count):
+        _, lat, lng = rng.point()
+        brand, model = rng.choice(CAR_MODELS)
+        capacity = rng.choice((1500, 3500, 5000, 10000, 20000))
+        updated_at = rng.moment(3)
+        yield (f'GEN-D{n}', rng.person(), f'{brand} {model}', capacity, lat, lng, rng.weighted(statuses),
+               rng.choice(('car', 'truck')), round(rng.uniform(3.5, 5.0), 2), round(capacity * rng.random(), 2),
+               f'{rng.choice(MARKETPLACES)} {rng.weighted(CITY_CHOICES)[0]}', f'+79{rng.randrange(10 ** 9):09d}',
+               updated_at - timedelta(days=rng.randint(1, 700)), updated_at)
+
+
+CARGO_COLUMNS = ('cargo_id', 'name', 'details', 'weight', 'lat', 'lng', 'status', 'cargo_type', 'ready_status',
+                 'ready_time', 'quantity', 'destination_warehouse', 'client_address', 'client_rating', 'created_at')
+
+
+def cargo_rows(rng: Random, count: int, fleet: Fleet, offset: int):
+    statuses = cumulative(CARGO_STATUSES)
+    for n in range(offset, offset + count):
+        city, lat, lng = rng.point()
+        ready_now = rng.random() < 0.6
+        created_at = rng.moment(180)
+        yield (f'GEN-C{n}', f'Груз #GEN-C{n}', rng.choice(('Коробки', 'Паллеты', 'Стройматериалы', 'Мебель')),
+               round(rng.uniform(10, 5000), 2), lat, lng, rng.weighted(statuses), rng.choice(('box', 'pallet')),
+               'ready' if ready_now else 'scheduled',
+               None if ready_now else created_at + timedelta(hours=rng.randint(2, 96)), rng.randint(1, 40),
+               f'{rng.choice(MARKETPLACES)} {rng.weighted(CITY_CHOICES)[0]}', rng.address(city),
+               round(rng.uniform(3.5, 5.0), 2), created_at)
+
+
+USER_ROLE_COLUMNS = ('user_id', 'role_id', 'assigned_at')
+
+
+def user_roles_rows(rng: Random, count: int, fleet: Fleet, offset: int, role_ids=()):
+    pool = fleet.clients + fleet.carrier_users
+    for user_id in rng.sample(pool, min(count, len(pool))):
+        yield (user_id, rng.choice(role_ids), rng.moment(365))
+
+
+# Порядок важен: дочерние таблицы ссылаются на строки родительских
+TABLES = [
+    ('users', USER_COLUMNS, users_rows),
+    ('carriers', CARRIER_COLUMNS, carriers_rows),
+    ('vehicles', VEHICLE_COLUMNS, vehicles_rows),
+    ('orders_carrier', ORDER_CARRIER_COLUMNS, orders_carrier_rows),
+    ('orders_shipper', ORDER_SHIPPER_COLUMNS, orders_shipper_rows),
+    ('deliveries', DELIVERY_COLUMNS, deliveries_rows),
+    ('drivers', DRIVER_COLUMNS, drivers_rows),
+    ('cargo', CARGO_COLUMNS, cargo_rows),
+    ('user_roles', USER_ROLE_COLUMNS, user_roles_rows),
+]
+
+
+def plan_sizes(users: int, overrides):
+    sizes = {}
+    for table, ratio in DEFAULT_RATIOS.items():
+        sizes[table] = int(users * ratio) if ratio is not None else None
+    sizes.update(overrides)
+    return sizes
+
+
+def parse_overrides(values):
+    overrides = {}
+    for value in values or []:
+        table, _, count = value.partition('=')
+        if table not in DEFAULT_RATIOS or not count.isdigit():
+            raise SystemExit(f"--rows expects table=N with table in {', '.join(DEFAULT_RATIOS)}")
+        overrides[table] = int(count)
+    return overrides
+
+
+def next_offset(cur, table: str, column: str, prefix: str) -> int:
+    '''
+    Номер, с которого продолжать уникальные email/cargo_id при повторном запуске без --truncate
+    '''
+    cur.execute(f"""
+        SELECT COALESCE(MAX(substring({column} FROM %s)::bigint) + 1, 0)
+        FROM {SCHEMA}.{table} WHERE {column} LIKE %s
+    """, (f'^{prefix}(\\d+)', f'{prefix}%'))
+    return cur.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--rows', nargs='*', metavar='TABLE=N')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--truncate', action='store_true', help='очистить таблицы перед загрузкой')
+    parser.add_argument('--force', action='store_true', help='разрешить нелокальную базу')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    host = parse_dsn(dsn).get('host', '')
+    if host not in LOCAL_HOSTS and not host.startswith('/') and not args.force:
+        sys.exit(f'Refusing to load synthetic data into {host}; pass --force if this is intended')
+
+    sizes = plan_sizes(args.users, parse_overrides(args.rows))
+    fleet = Fleet()
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = False
+    cur = conn.cursor()
+    cur.execute("SET synchronous_commit = off")
+
+    if args.truncate:
+        tables = ', '.join(f'{SCHEMA}.{table}' for table, _, _ in TABLES)
+        cur.execute(f"TRUNCATE {tables} CASCADE")
+        conn.commit()
+        print(f"Truncated: {', '.join(table for table, _, _ in TABLES)}")
+
+    offsets = {
+        'users': next_offset(cur, 'users', 'email', 'gen-'),
+        'drivers': next_offset(cur, 'drivers', 'driver_id', 'GEN-D'),
+        'cargo': next_offset(cur, 'cargo', 'cargo_id', 'GEN-C'),
+    }
+    cur.execute(f"SELECT role_id FROM {SCHEMA}.roles ORDER BY role_id")
+    role_ids = [row[0] for row in cur.fetchall()]
+
+    # повторный запуск продолжает нумерацию — от неё же зависит зерно, иначе UUID совпадут с прошлыми
+    rng = Random(f"{args.seed}:{offsets['users']}")
+
+    started_total = time.perf_counter()
+    print(f"{'table':<16} {'rows':>10} {'seconds':>8} {'rows/s':>10}")
+
+    for table, columns, generate in TABLES:
+        count = sizes[table]
+        if count is None:
+            count = len(fleet.carrier_users)
+        if table == 'user_roles':
+            if not role_ids:
+                print(f"{table:<16} skipped: no roles")
+                continue
+            rows = generate(rng, count, fleet, 0, role_ids)
+        else:
+            rows = generate(rng, count, fleet, offsets.get(table, 0))
+
+        stream = RowStream(rows)
+        started = time.perf_counter()
+        cur.copy_expert(f"COPY {SCHEMA}.{table} ({', '.join(columns)}) FROM STDIN", stream, size=1 << 20)
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"{table:<16} {stream.count:>10} {elapsed:>8.1f} {stream.count / elapsed if elapsed else 0:>10.0f}")
+
+    print("Analyzing tables...")
+    conn.autocommit = True
+    for table, _, _ in TABLES:
+        cur.execute(f"ANALYZE {SCHEMA}.{table}")
+
+    cur.close()
+    conn.close()
+    print(f"Done in {time.perf_counter() - started_total:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Общие части локальных стендов для backend-функций: поиск функций, события из tests.json
+и фейковый Telegram Bot API (подставляется через TELEGRAM_API_URL)
+"""
+
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+FAKE_BOT_TOKEN = '123456:local-stand-in'
+# Совпадает с X-Maintenance-Token в backend/db-maintenance/tests.json
+FAKE_MAINTENANCE_SECRET = 'local-stand-in'
+
+
+def list_functions(names=None):
+    found = sorted(
+        name for name in os.listdir(BACKEND)
+        if os.path.isfile(os.path.join(BACKEND, name, 'index.py'))
+    )
+    if names:
+        unknown = set(names) - set(found)
+        if unknown:
+            raise SystemExit(f"Unknown functions: {', '.join(sorted(unknown))}")
+        return [name for name in found if name in names]
+    return found
+
+
+def load_tests(function):
+    path = os.path.join(BACKEND, function, 'tests.json')
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('tests', [])
+
+
+def build_event(test):
+    '''
+    Событие шлюза из записи tests.json (method, path, headers, body)
+    '''
+    body = test.get('body')
+    return {
+        'httpMethod': test.get('method', 'GET'),
+        'path': test.get('path', '/'),
+        'headers': dict(test.get('headers') or {}),
+        'queryStringParameters': dict(test.get('queryParams') or test.get('query') or {}),
+        'body': body if body is None or isinstance(body, str) else json.dumps(body),
+        'isBase64Encoded': False,
+        'requestContext': {'identity': {'sourceIp': '127.0.0.1'}},
+    }
+
+
+class _TelegramHandler(BaseHTTPRequestHandler):
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.calls += 1
+
+        method = self.path.rsplit('/', 1)[-1].split('?', 1)[0]
+        if method == 'getFile':
+            result = {'file_id': 'local', 'file_path': 'photos/local.jpg'}
+        elif method == 'getUserProfilePhotos':
+            result = {'total_count': 0, 'photos': []}
+        elif self.path.startswith('/file/'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        else:
+            result = {'message_id': self.server.calls, 'chat': {'id': 0}}
+
+        payload = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTelegram:
+    '''
+    Локальный Bot API: на любой метод отвечает {"ok": true}. Использование:
+        with FakeTelegram() as telegram:
+            env['TELEGRAM_API_URL'] = telegram.url
+    '''
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _TelegramHandler)
+        self.server.calls = 0
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def calls(self):
+        return self.server.calls
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def stand_in_env(telegram_url, extra=None):
+    '''
+    Окружение функции на локальных заглушках: DATABASE_URL берётся из текущего окружения
+    '''
+    env = dict(os.environ)
+    env.setdefault('TELEGRAM_BOT_TOKEN', FAKE_BOT_TOKEN)
+    env['TELEGRAM_API_URL'] = telegram_url
+    env['MAINTENANCE_SECRET'] = FAKE_MAINTENANCE_SECRET
+    env.setdefault('PGCLIENTENCODING', 'UTF8')
+    # байткод кэшируется вне дерева: так замер ближе к тёплому диску платформы и не мусорит в backend/
+    env['PYTHONPYCACHEPREFIX'] = os.path.join(tempfile.gettempdir(), 'cargo-map-pycache')
+    if extra:
+        env.update(extra)
+    return env
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Локальный прогон tests.json всех функций как функциональных и нагрузочных тестов
+Использование: DATABASE_URL=postgresql://... python3 scripts/run_tests.py
+               [--repeat 20] [--concurrency 4] [--keep-db | --no-migrate]
+               [--save results.json] [--baseline results.json --tolerance 0.25] [function ...]
+
+По умолчанию создаётся временная база рядом с DATABASE_URL, в неё накатываются все
+db_migrations, Telegram подменяется локальным сервером (TELEGRAM_API_URL). Каждая функция
+запускается в отдельном процессе (как отдельный инстанс), каждый кейс сначала
+проверяется на expectedStatus/expectedBody, затем повторяется --repeat раз в
+--concurrency потоков. Печатаются p50/p95/p99 и пропускная способность по функциям.
+С --baseline код выхода 1, если p95 функции вырос больше чем на --tolerance.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import BACKEND, ROOT, FakeTelegram, build_event, list_functions, load_tests, stand_in_env
+
+SCHEMA = 't_p93479485_cargo_map_integratio'
+MIGRATIONS = os.path.join(ROOT, 'db_migrations')
+
+TYPE_PLACEHOLDERS = {
+    'string': str,
+    'number': (int, float),
+    'boolean': bool,
+    'array': list,
+    'object': dict,
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def matches(expected, actual, partial):
+    '''
+    partial: сверяются только ключи из expectedBody; "string"/"number"/... — проверка типа,
+    пустой список — «любой список»
+    '''
+    if isinstance(expected, str) and expected in TYPE_PLACEHOLDERS and partial:
+        return isinstance(actual, TYPE_PLACEHOLDERS[expected])
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return False
+        if not partial and set(expected) != set(actual):
+            return False
+        return all(key in actual and matches(value, actual[key], partial) for key, value in expected.items())
+    if isinstance(expected, list) and partial and not expected:
+        return isinstance(actual, list)
+    return expected == actual
+
+
+def check(test, response):
+    expected_status = test.get('expectedStatus')
+    if expected_status is not None and response.get('statusCode') != expected_status:
+        return f"status {response.get('statusCode')} != {expected_status}: {str(response.get('body'))[:200]}"
+
+    if 'expectedBody' in test:
+        try:
+            body = json.loads(response.get('body') or 'null')
+        except ValueError:
+            return f"body is not JSON: {str(response.get('body'))[:200]}"
+        if not matches(test['expectedBody'], body, test.get('bodyMatcher') == 'partial'):
+            return f"body mismatch: {json.dumps(body, ensure_ascii=False)[:200]}"
+
+    return None
+
+
+# --- worker: выполняется внутри каталога функции ---------------------------------------
+
+def run_worker(function, repeat, concurrency):
+    sys.path.insert(0, os.getcwd())
+    import types
+    import index
+
+    context = types.SimpleNamespace(request_id='local-test', function_name=function)
+    results = []
+
+    for test in load_tests(function):
+        event = build_event(test)
+
+        try:
+            error = check(test, index.handler(dict(event), context))
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+
+        def call(_):
+            started = time.perf_counter()
+            try:
+                status = index.handler(dict(event), context).get('statusCode')
+            except Exception:
+                status = 'exception'
+            return (time.perf_counter() - started) * 1000, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(call, range(repeat)))
+        wall = time.perf_counter() - started
+
+        results.append({
+            'name': test.get('name', test.get('method')),
+            'error': error,
+            'latencies_ms': [ms for ms, _ in samples],
+            'statuses': sorted({str(status) for _, status in samples}),
+            'wall_s': wall,
+        })
+
+    sys.__stdout__.write('\n@@' + json.dumps(results) + '\n')
+
+
+# --- база с миграциями ---------------------------------------------------------------
+
+def migration_files():
+    files = [name for name in os.listdir(MIGRATIONS) if re.match(r'V\d+__.+\.sql$', name)]
+    return sorted(files, key=lambda name: int(name[1:name.index('__')]))
+
+
+def create_test_database(admin_dsn):
+    import psycopg2
+    from psycopg2.extensions import make_dsn
+
+    name = f'cargo_tests_{os.getpid()}'
+    admin = psycopg2.connect(admin_dsn)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {name} ENCODING 'UTF8' LC_COLLATE 'C' LC_CTYPE 'C' TEMPLATE template0")
+        cur.execute(f"ALTER DATABASE {name} SET search_path TO {SCHEMA}, public")
+    admin.close()
+
+    dsn = make_dsn(admin_dsn, dbname=name)
+
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        conn.commit()
+        for filename in migration_files():
+            with open(os.path.join(MIGRATIONS, filename), encoding='utf-8') as f:
+                try:
+                    cur.execute(f.read())
+                    conn.commit()
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    print(f"[ERROR] Migration {filename}: {str(e).strip()}", file=sys.stderr)
+    conn.close()
+    return name, dsn
+
+
+def drop_test_database(admin_dsn, name):
+    import psycopg2
+
+    admin = psycopg2.connect(admin_dsn)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+    admin.close()
+
+
+# --- отчёт ---------------------------------------------------------------------------
+
+def run_function(function, args, env):
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', function,
+             '--repeat', str(args.repeat), '--concurrency', str(args.concurrency)],
+            cwd=os.path.join(BACKEND, function), env=env, capture_output=True, text=True, timeout=args.timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {'function': function, 'crashed': f'timeout after {args.timeout:g}s', 'cases': []}
+    marker = proc.stdout.rfind('\n@@')
+    if marker < 0:
+        tail = (proc.stderr.strip().splitlines() or ['no output'])[-1]
+        return {'function': function, 'crashed': tail, 'cases': []}
+    return {'function': function, 'cases': json.loads(proc.stdout[marker + 3:])}
+
+
+def summarize(result):
+    latencies = [ms for case in result['cases'] for ms in case['latencies_ms']]
+    wall = sum(case['wall_s'] for case in result['cases'])
+    if not latencies:
+        return None
+    return {
+        'requests': len(latencies),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'rps': len(latencies) / wall if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('functions', nargs='*')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--keep-db', action='store_true')
+    parser.add_argument('--no-migrate', action='store_true', help='использовать DATABASE_URL как есть')
+    parser.add_argument('--save')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeat, args.concurrency)
+        return
+
+    admin_dsn = os.environ.get('DATABASE_URL')
+    if not admin_dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    functions = list_functions(args.functions)
+    db_name, dsn = (None, admin_dsn) if args.no_migrate else create_test_database(admin_dsn)
+
+    results = []
+    try:
+        with FakeTelegram() as telegram:
+            env = stand_in_env(telegram.url, {'DATABASE_URL': dsn})
+            for function in functions:
+                results.append(run_function(function, args, env))
+    finally:
+        if db_name and not args.keep_db:
+            drop_test_database(admin_dsn, db_name)
+        elif db_name:
+            print(f"Test database kept: {db_name}", file=sys.stderr)
+
+    failed = 0
+    print(f"{'function':<24} {'cases':>7} {'reqs':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8}")
+    summaries = {}
+    for result in results:
+        if result.get('crashed'):
+            failed += 1
+            print(f"{result['function']:<24} CRASHED: {result['crashed']}")
+            continue
+
+        passed = sum(1 for case in result['cases'] if not case['error'])
+        failed += len(result['cases']) - passed
+        summary = summarize(result)
+        if summary is None:
+            print(f"{result['function']:<24} {'0/0':>7}")
+            continue
+        summaries[result['function']] = summary
+        print(f"{result['function']:<24} {passed:>3}/{len(result['cases']):<3} {summary['requests']:>6} "
+              f"{summary['p50_ms']:>7.2f}ms {summary['p95_ms']:>7.2f}ms {summary['p99_ms']:>7.2f}ms "
+              f"{summary['rps']:>8.1f}")
+        for case in result['cases']:
+            if case['error']:
+                print(f"    FAIL {case['name']}: {case['error']}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for function, summary in summaries.items():
+            before = baseline.get(function)
+            if before and summary['p95_ms'] > before['p95_ms'] * (1 + args.tolerance):
+                regressions.append(f"{function}: p95 {before['p95_ms']:.2f}ms -> {summary['p95_ms']:.2f}ms")
+        for line in regressions:
+            print(f"REGRESSION {line}")
+
+    print(f"\n{failed} failed case(s)")
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,21 +4,23 @@
 Использование: python3 setup_telegram_bot.py <BOT_TOKEN>
 """
 
+import os
 import sys
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'telegram-webhook'))
+from telegram_api import get_client
 
 def setup_bot(bot_token):
     webhook_url = "https://functions.poehali.dev/8b815ea6-d517-4175-acb3-4e819045c985"
     
+    client = get_client(bot_token)
+    
     print("🤖 Настройка Telegram бота...")
     print(f"📍 Webhook URL: {webhook_url}")
     
     # Удаляем старый webhook
     print("\n1️⃣ Удаление старого webhook...")
-    delete_response = requests.post(
-        f'https://api.telegram.org/bot{bot_token}/deleteWebhook',
-        json={'drop_pending_updates': True}
-    )
+    delete_response = client.request('deleteWebhook', {'drop_pending_updates': True})
     
     if delete_response.ok:
         print("✅ Старый webhook удалён")
@@ -27,10 +29,7 @@ def setup_bot(bot_token):
     
     # Устанавливаем новый webhook
     print("\n2️⃣ Установка нового webhook...")
-    set_response = requests.post(
-        f'https://api.telegram.org/bot{bot_token}/setWebhook',
-        json={'url': webhook_url}
-    )
+    set_response = client.request('setWebhook', {'url': webhook_url})
     
     if set_response.ok:
         data = set_response.json()
@@ -43,9 +42,7 @@ def setup_bot(bot_token):
     
     # Проверяем статус
     print("\n3️⃣ Проверка статуса webhook...")
-    info_response = requests.get(
-        f'https://api.telegram.org/bot{bot_token}/getWebhookInfo'
-    )
+    info_response = client.request('getWebhookInfo', http_method='GET')
     
     if info_response.ok:
         info = info_response.json()['result']
@@ -62,7 +59,7 @@ def setup_bot(bot_token):
     
     # Получаем информацию о боте
     print("\n4️⃣ Информация о боте...")
-    me_response = requests.get(f'https://api.telegram.org/bot{bot_token}/getMe')
+    me_response = client.request('getMe', http_method='GET')
     
     if me_response.ok:
         bot_info = me_response.json()['result']
@@ -70,6 +67,7 @@ def setup_bot(bot_token):
         print(f"🤖 Username: @{bot_info.get('username')}")
         print(f"🤖 ID: {bot_info.get('id')}")
     
+    client.log_metrics()
     print("\n✅ Готово! Теперь отправьте /start боту для проверки")
 
 if __name__ == '__main__':
@@ -14,20 +14,24 @@ const TelegramLoginButton = ({ onSuccess, onPendingRegistration }: TelegramLogin
   const [polling, setPolling] = useState(false);
   const { toast } = useToast();
 
-  // Polling для проверки подтверждения
+  // Long-poll: сервер держит запрос до подтверждения в Telegram (до 25 секунд)
   useEffect(() => {
     if (!sessionToken || !polling) return;
 
-    const checkSession = async () => {
+    let cancelled = false;
+
+    const checkSession = async (): Promise<boolean> => {
       try {
         const response = await fetch('https://functions.poehali.dev/65fdf841-ac48-4f1e-aff3-1b6c810838cc', {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ session_token: sessionToken })
+          body: JSON.stringify({ session_token: sessionToken, wait: 25 })
         });
 
         const data = await response.json();
 
+        if (cancelled) return false;
+
         if (response.ok && data.success) {
           setPolling(false);
           
@@ -46,9 +50,11 @@ const TelegramLoginButton = ({ onSuccess, onPendingRegistration }: TelegramLogin
             });
             onPendingRegistration(data.telegram_data);
           }
+          return false;
         } else if (response.status === 202) {
           // Ждём подтверждения
           console.log('[DEBUG] Waiting for user confirmation...');
+          return true;
         } else {
           // Ошибка или истёк срок
           setPolling(false);
@@ -58,15 +64,27 @@ const TelegramLoginButton = ({ onSuccess, onPendingRegistration }: TelegramLogin
             title: 'Ошибка',
             description: data.error || 'Время ожидания истекло'
           });
+          return false;
         }
       } catch (error: any) {
         console.error('Polling error:', error);
+        // Пауза перед повтором после сетевой ошибки
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        return true;
+      }
+    };
+
+    const poll = async () => {
+      while (!cancelled && await checkSession()) {
+        // 202 — сразу открываем следующий ожидающий запрос
       }
     };
 
-    const interval = setInterval(checkSession, 2000); // Проверяем каждые 2 секунды
+    poll();
 
-    return () => clearInterval(interval);
+    return () => {
+      cancelled = true;
+    };
   }, [sessionToken, polling, onSuccess, onPendingRegistration, toast]);
 
   const handleTelegramLogin = async () => {
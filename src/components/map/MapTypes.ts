@@ -12,6 +12,8 @@ export interface MapMarker {
   rating?: number;
   capacity?: number;
   freeSpace?: number;
+  freeBoxes?: number | null;
+  freePallets?: number | null;
   destinationWarehouse?: string;
   readyStatus?: string;
   readyTime?: string;